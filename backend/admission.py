@@ -0,0 +1,188 @@
+import asyncio
+import collections
+import math
+import re
+import time
+
+from starlette.responses import JSONResponse
+
+
+class Overloaded(Exception):
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class ConcurrencyLimiter:
+    """Giới hạn số request xử lý đồng thời của một lớp route, phần dư chờ trong hàng đợi có hạn.
+
+    Hàng đợi đầy -> từ chối ngay; chờ quá `queue_timeout` -> từ chối. Slot được trao thẳng cho
+    request chờ lâu nhất (FIFO) khi có request xong.
+    """
+
+    def __init__(self, max_concurrency: int, max_queue: int, queue_timeout: float):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self._waiters = collections.deque()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    @property
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self.queue_timeout))
+
+    async def acquire(self):
+        if self.active < self.max_concurrency and not self._waiters:
+            self.active += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            raise Overloaded("queue_full", self.retry_after)
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as ex:
+            if waiter.done() and not waiter.cancelled():
+                # Slot vừa được trao đúng lúc hết giờ / bị huỷ: trả lại cho người kế tiếp
+                self.release()
+            else:
+                waiter.cancel()
+                self._waiters.remove(waiter)
+            if isinstance(ex, asyncio.CancelledError):
+                raise
+            raise Overloaded("queue_timeout", self.retry_after) from None
+
+    def release(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)  # chuyển slot, `active` giữ nguyên
+                return
+        self.active -= 1
+
+
+class TokenBucket:
+    """Giới hạn tần suất theo từng khoá (user / IP): `rate` token mỗi giây, tối đa `burst`."""
+
+    def __init__(self, rate: float, burst: int, max_keys: int = 100000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets = {}  # khoá -> (số token, thời điểm cập nhật)
+
+    def take(self, key):
+        """Trả về 0 nếu được phép, ngược lại số giây cần chờ đến khi có token."""
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        if tokens >= 1:
+            if len(self._buckets) >= self.max_keys and key not in self._buckets:
+                self._prune(now)
+            self._buckets[key] = (tokens - 1, now)
+            return 0.0
+        self._buckets[key] = (tokens, now)
+        return (1 - tokens) / self.rate
+
+    def _prune(self, now):
+        # Bỏ các bucket đã hồi đầy (không khác gì bucket mới)
+        full_after = self.burst / self.rate
+        self._buckets = {key: value for key, value in self._buckets.items() if now - value[1] < full_after}
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class AdmissionControl:
+    """Middleware HTTP: giới hạn tần suất theo người dùng rồi giới hạn đồng thời theo lớp route.
+
+    - `routes`: danh sách (method hoặc None, regex đường dẫn, lớp route hoặc None = không giới hạn);
+      luật đầu tiên khớp được dùng.
+    - `limits`: {lớp route: {"max_concurrency", "max_queue", "queue_timeout"}}.
+    - `rate_rules`: danh sách (method, regex, tên giới hạn); `rate_limits`: {tên: {"rate", "burst"}}.
+    - `identify(request)`: khoá người dùng cho token bucket (gán sau khi tạo, mặc định là IP).
+
+    Quá tải trả 503 + Retry-After ngay thay vì để request xếp hàng trong pool DB tới khi hết giờ;
+    vượt tần suất trả 429 + Retry-After.
+    """
+
+    def __init__(self, registry, routes, limits, rate_rules=(), rate_limits=None, identify=None):
+        self.routes = [(method, re.compile(pattern), route_class) for method, pattern, route_class in routes]
+        self.limiters = {name: ConcurrencyLimiter(**config) for name, config in limits.items()}
+        self.rate_rules = [(method, re.compile(pattern), name) for method, pattern, name in rate_rules]
+        self.buckets = {name: TokenBucket(**config) for name, config in (rate_limits or {}).items()}
+        self.identify = identify
+
+        self.rejections = registry.counter(
+            "admission_rejections_total", "Requests rejected by admission control.", ("limit", "reason"))
+        self.wait_time = registry.histogram(
+            "admission_queue_wait_seconds", "Time spent waiting for an admission slot.", ("route_class",))
+        for name, limiter in self.limiters.items():
+            registry.gauge(f"admission_{name}_in_flight", f"Admitted {name} requests in progress.",
+                           lambda limiter=limiter: limiter.active)
+            registry.gauge(f"admission_{name}_queued", f"{name.capitalize()} requests waiting for a slot.",
+                           lambda limiter=limiter: limiter.queued)
+
+    def route_class(self, method: str, path: str):
+        for route_method, pattern, route_class in self.routes:
+            if (route_method is None or route_method == method) and pattern.match(path):
+                return route_class
+        return None
+
+    def _client_key(self, request):
+        if self.identify is not None:
+            key = self.identify(request)
+            if key is not None:
+                return key
+        return ("ip", request.client.host if request.client else None)
+
+    def _rate_limited(self, request):
+        method, path = request.method, request.url.path
+        for rule_method, pattern, name in self.rate_rules:
+            if rule_method == method and pattern.match(path):
+                wait = self.buckets[name].take(self._client_key(request))
+                if wait:
+                    self.rejections.inc((name, "rate_limited"))
+                    return JSONResponse(
+                        {"detail": "Too many requests, slow down."}, status_code=429,
+                        headers={"Retry-After": str(max(1, math.ceil(wait)))})
+                return None
+        return None
+
+    async def __call__(self, request, call_next):
+        route_class = self.route_class(request.method, request.url.path)
+        if route_class is None:
+            return await call_next(request)
+
+        limited = self._rate_limited(request)
+        if limited is not None:
+            return limited
+
+        limiter = self.limiters[route_class]
+        started = time.perf_counter()
+        try:
+            await limiter.acquire()
+        except Overloaded as ex:
+            self.rejections.inc((route_class, ex.reason))
+            return JSONResponse(
+                {"detail": "Server is overloaded, please retry later."}, status_code=503,
+                headers={"Retry-After": str(ex.retry_after)})
+        self.wait_time.observe((route_class,), time.perf_counter() - started)
+        try:
+            return await call_next(request)
+        finally:
+            limiter.release()
+
+    def stats(self):
+        return {
+            "classes": {
+                name: {"in_flight": limiter.active, "queued": limiter.queued,
+                       "max_concurrency": limiter.max_concurrency, "max_queue": limiter.max_queue}
+                for name, limiter in self.limiters.items()
+            },
+            "rate_limited_keys": {name: len(bucket) for name, bucket in self.buckets.items()},
+        }
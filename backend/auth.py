@@ -0,0 +1,117 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+from typing import NamedTuple
+
+from fastapi import HTTPException
+
+from logs import get_logger
+
+
+class TokenClaims(NamedTuple):
+    user_id: int
+    username: str
+    role: str
+    issued_at: int   # mili giây
+    expires_at: int  # giây (epoch)
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+class TokenSigner:
+    """Token phiên ký HMAC-SHA256: `<payload base64url>.<chữ ký base64url>`.
+
+    Payload mang user id, tên, role và hạn dùng nên kiểm tra quyền không cần truy vấn Users.
+    `revoke_user` vô hiệu mọi token cấp trước thời điểm gọi (ví dụ sau khi đổi role).
+    """
+
+    def __init__(self, secret: bytes, ttl: float = 12 * 3600.0):
+        self._secret = secret
+        self.ttl = ttl
+        self._not_before = {}  # user_id -> mốc issued_at (ms) tối thiểu còn hợp lệ
+        self._lock = threading.Lock()
+
+        self.issued = 0
+        self.verified = 0
+        self.rejected = 0
+
+    def _sign(self, payload: bytes) -> bytes:
+        return hmac.new(self._secret, payload, hashlib.sha256).digest()
+
+    def issue(self, user_id: int, username: str, role: str):
+        issued_at = time.time_ns() // 1_000_000
+        expires_at = int(issued_at // 1000 + self.ttl)
+        payload = json.dumps(
+            {"uid": user_id, "name": username, "role": role, "iat": issued_at, "exp": expires_at},
+            separators=(",", ":"),
+        ).encode("utf-8")
+        self.issued += 1
+        token = f"{_b64encode(payload)}.{_b64encode(self._sign(payload))}"
+        return token, expires_at
+
+    def verify(self, token: str):
+        claims = self._verify(token)
+        if claims is None:
+            self.rejected += 1
+        else:
+            self.verified += 1
+        return claims
+
+    def _verify(self, token: str):
+        try:
+            encoded_payload, encoded_signature = token.split(".")
+            payload = _b64decode(encoded_payload)
+            signature = _b64decode(encoded_signature)
+        except ValueError:
+            return None
+        # So sánh thời gian hằng định: không lộ số byte chữ ký trùng khớp
+        if not hmac.compare_digest(signature, self._sign(payload)):
+            return None
+        data = json.loads(payload)
+        claims = TokenClaims(data["uid"], data["name"], data["role"], data["iat"], data["exp"])
+        if claims.expires_at <= time.time():
+            return None
+        if claims.issued_at < self._not_before.get(claims.user_id, 0):
+            return None
+        return claims
+
+    def revoke_user(self, user_id: int):
+        with self._lock:
+            self._not_before[user_id] = time.time_ns() // 1_000_000
+
+    def stats(self):
+        return {
+            "issued": self.issued,
+            "verified": self.verified,
+            "rejected": self.rejected,
+            "revoked_users": len(self._not_before),
+        }
+
+
+def load_secret(env_var: str = "AUTH_SECRET") -> bytes:
+    # Nhiều worker / nhiều máy phải dùng chung AUTH_SECRET, nếu không token chỉ hợp lệ trong một tiến trình
+    secret = os.environ.get(env_var)
+    if secret:
+        return secret.encode("utf-8")
+    get_logger("auth").warning("auth_secret_missing", env_var=env_var)
+    return secrets.token_bytes(32)
+
+
+def bearer_token(authorization: str):
+    if not authorization:
+        raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        raise HTTPException(status_code=401, detail="Invalid authorization header", headers={"WWW-Authenticate": "Bearer"})
+    return token.strip()
@@ -0,0 +1,124 @@
+"""Mô phỏng quá tải trong tiến trình: so sánh độ trễ đuôi khi có và không có AdmissionControl.
+
+"DB" giả lập là pool `--pool-size` kết nối, mỗi truy vấn tốn `--service-ms`; request đến theo lịch cố định
+(open-loop) với tốc độ bằng `--overload` lần công suất. Không có admission, request xếp hàng chờ kết nối
+tới `--checkout-timeout`; có admission, phần vượt quá bị từ chối 503 ngay hoặc sau `queue_timeout`.
+
+    python benchmarks/bench_admission.py --overload 5 --duration 5 --check
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from starlette.requests import Request  # noqa: E402
+from starlette.responses import Response  # noqa: E402
+
+from admission import AdmissionControl  # noqa: E402
+from metrics import MetricsRegistry  # noqa: E402
+
+
+def make_request(path="/courses"):
+    return Request({
+        "type": "http", "method": "GET", "path": path, "raw_path": path.encode(), "query_string": b"",
+        "headers": [], "client": ("127.0.0.1", 12345), "server": ("testserver", 80), "scheme": "http",
+    })
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+async def run(args, use_admission):
+    pool = asyncio.Semaphore(args.pool_size)
+
+    async def handler(request):
+        try:
+            await asyncio.wait_for(pool.acquire(), args.checkout_timeout)
+        except asyncio.TimeoutError:
+            return Response(status_code=503)  # như PoolTimeout của Database.run
+        try:
+            await asyncio.sleep(args.service_ms / 1000)
+        finally:
+            pool.release()
+        return Response(status_code=200)
+
+    limits = {"read": {"max_concurrency": args.pool_size * 2, "max_queue": args.max_queue,
+                       "queue_timeout": args.queue_timeout}}
+    admission = AdmissionControl(MetricsRegistry(), [(None, r"^/", "read")], limits)
+
+    results = []
+
+    async def one(scheduled):
+        request = make_request()
+        if use_admission:
+            response = await admission(request, handler)
+        else:
+            response = await handler(request)
+        results.append((response.status_code, time.perf_counter() - scheduled))
+
+    capacity = args.pool_size / (args.service_ms / 1000)
+    rps = capacity * args.overload
+    tasks = []
+    started = time.perf_counter()
+    for i in range(int(rps * args.duration)):
+        scheduled = started + i / rps
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.ensure_future(one(scheduled)))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+
+    ok = [latency for code, latency in results if code == 200]
+    rejected = [latency for code, latency in results if code != 200]
+    return {
+        "admission": use_admission,
+        "offered_rps": round(rps, 1),
+        "capacity_rps": round(capacity, 1),
+        "goodput_rps": round(len(ok) / elapsed, 1),
+        "ok": len(ok),
+        "rejected": len(rejected),
+        "ok_p50_ms": round(percentile(ok, 0.50) * 1000, 1),
+        "ok_p99_ms": round(percentile(ok, 0.99) * 1000, 1),
+        "ok_max_ms": round(max(ok, default=0.0) * 1000, 1),
+        "rejected_p50_ms": round(percentile(rejected, 0.50) * 1000, 1),
+        "rejected_p99_ms": round(percentile(rejected, 0.99) * 1000, 1),
+        "mean_all_ms": round(statistics.fmean([latency for _, latency in results]) * 1000, 1) if results else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pool-size", type=int, default=20)
+    parser.add_argument("--service-ms", type=float, default=20.0)
+    parser.add_argument("--overload", type=float, default=5.0, help="tốc độ đến / công suất")
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--checkout-timeout", type=float, default=5.0)
+    parser.add_argument("--queue-timeout", type=float, default=0.5)
+    parser.add_argument("--max-queue", type=int, default=100)
+    parser.add_argument("--check", action="store_true",
+                        help="thoát mã 1 nếu p99 của request được nhận vượt queue_timeout + 2 * service")
+    args = parser.parse_args()
+
+    results = [asyncio.run(run(args, use_admission)) for use_admission in (False, True)]
+    print(json.dumps(results, indent=2))
+    if args.check:
+        bound_ms = (args.queue_timeout + 2 * args.service_ms / 1000) * 1000
+        with_admission = results[1]
+        if with_admission["ok_p99_ms"] > bound_ms or with_admission["rejected_p99_ms"] > bound_ms:
+            print(f"FAIL: p99 vượt {bound_ms:.0f} ms", file=sys.stderr)
+            sys.exit(1)
+        print(f"OK: p99 <= {bound_ms:.0f} ms", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
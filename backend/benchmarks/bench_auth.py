@@ -0,0 +1,54 @@
+"""Chi phí xác thực trên mỗi request: cấp token, kiểm tra token hợp lệ / sai chữ ký / đã thu hồi.
+
+So với đường cũ (mỗi endpoint ghi truy vấn Users/Courses để kiểm tra role, ~1 round trip DB),
+kiểm tra token chỉ là một HMAC-SHA256 và giải mã JSON trong tiến trình.
+
+    python benchmarks/bench_auth.py --iterations 200000
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from auth import TokenSigner, bearer_token  # noqa: E402
+
+
+def per_op_us(fn, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return round((time.perf_counter() - started) * 1e6 / iterations, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=100000)
+    args = parser.parse_args()
+
+    signer = TokenSigner(b"benchmark-secret-benchmark-secret", ttl=3600.0)
+    token, _ = signer.issue(42, "Nguyễn Văn A", "instructor")
+    header = f"Bearer {token}"
+    forged = token[:-2] + ("AA" if not token.endswith("AA") else "BB")
+
+    revoked_signer = TokenSigner(b"benchmark-secret-benchmark-secret", ttl=3600.0)
+    revoked_token, _ = revoked_signer.issue(7, "student", "student")
+    time.sleep(0.002)
+    revoked_signer.revoke_user(7)
+
+    results = {
+        "issue_us": per_op_us(lambda: signer.issue(42, "Nguyễn Văn A", "instructor"), args.iterations),
+        "verify_us": per_op_us(lambda: signer.verify(bearer_token(header)), args.iterations),
+        "verify_bad_signature_us": per_op_us(lambda: signer.verify(forged), args.iterations),
+        "verify_revoked_us": per_op_us(lambda: revoked_signer.verify(revoked_token), args.iterations),
+        "token_bytes": len(token),
+    }
+    assert signer.verify(token) is not None and signer.verify(forged) is None
+    assert revoked_signer.verify(revoked_token) is None
+    print(json.dumps(results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Đo số byte trên đường truyền và độ trễ của các endpoint danh mục: không nén, gzip, brotli, và
+revalidate bằng If-None-Match (304).
+
+Chạy khi server đang bật, ví dụ:
+    python benchmarks/bench_http_cache.py --path "/courses?limit=100" --concurrency 16 --requests 500
+"""
+import argparse
+import http.client
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+# (tên kịch bản, header gửi kèm); "{etag}" được thay bằng ETag lấy từ lần gọi đầu
+SCENARIOS = (
+    ("identity", {"Accept-Encoding": "identity"}),
+    ("gzip", {"Accept-Encoding": "gzip"}),
+    ("br", {"Accept-Encoding": "br"}),
+    ("revalidate", {"Accept-Encoding": "br, gzip", "If-None-Match": "{etag}"}),
+)
+
+
+def _request(base, path, headers):
+    # http.client không tự giải nén -> số byte đọc được chính là số byte trên đường truyền
+    conn = http.client.HTTPConnection(base.hostname, base.port or 80, timeout=60)
+    started = time.perf_counter()
+    conn.request("GET", path, headers=headers)
+    response = conn.getresponse()
+    body = response.read()
+    elapsed = time.perf_counter() - started
+    header_bytes = sum(len(k) + len(v) + 4 for k, v in response.getheaders())
+    conn.close()
+    return response, len(body), header_bytes, elapsed
+
+
+def run_scenario(base, path, name, headers, concurrency, requests):
+    lock = threading.Lock()
+    latencies, statuses = [], {}
+    body_bytes = 0
+    wire_bytes = 0
+
+    def one(_):
+        nonlocal body_bytes, wire_bytes
+        response, received, header_bytes, elapsed = _request(base, path, headers)
+        with lock:
+            latencies.append(elapsed)
+            statuses[response.status] = statuses.get(response.status, 0) + 1
+            body_bytes += received
+            wire_bytes += received + header_bytes
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(requests)))
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "scenario": name,
+        "path": path,
+        "requests": requests,
+        "statuses": statuses,
+        "body_bytes_per_req": round(body_bytes / requests),
+        "wire_bytes_per_req": round(wire_bytes / requests),
+        "req_per_s": round(requests / wall, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p99_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--path", action="append", help="endpoint cần đo, có thể lặp lại (mặc định /courses, /courses/featured)")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--output", help="ghi kết quả JSON ra file")
+    args = parser.parse_args()
+
+    base = urlparse(args.base_url)
+    paths = args.path or ["/courses?limit=100", "/courses/featured"]
+    results = []
+    for path in paths:
+        response, _, _, _ = _request(base, path, {"Accept-Encoding": "identity"})
+        etag = response.getheader("etag")
+        for name, headers in SCENARIOS:
+            if "If-None-Match" in headers and not etag:
+                continue  # endpoint không có ETag (server cũ hoặc route không cache)
+            headers = {k: v.replace("{etag}", etag or "") for k, v in headers.items()}
+            result = run_scenario(base, path, name, headers, args.concurrency, args.requests)
+            results.append(result)
+            print(json.dumps(result))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
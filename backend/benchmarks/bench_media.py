@@ -0,0 +1,111 @@
+"""So sánh throughput phục vụ video giữa mount StaticFiles (/uploads) và endpoint /media.
+
+Trong lúc tải, một luồng gọi tuần tự GET / (không chạm đĩa, không chạm DB) để đo độ trễ của các
+request khác: probe_p99_ms tăng vọt nghĩa là việc đọc file đang chặn event loop.
+
+Chạy khi server đang bật, ví dụ:
+    python benchmarks/bench_media.py --file <uuid>.mp4 --concurrency 16 --requests 200
+"""
+import argparse
+import http.client
+import json
+import random
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+
+def _request(base, path, headers):
+    conn = http.client.HTTPConnection(base.hostname, base.port or 80, timeout=60)
+    started = time.perf_counter()
+    conn.request("GET", path, headers=headers)
+    response = conn.getresponse()
+    received = 0
+    while chunk := response.read(1024 * 1024):
+        received += len(chunk)
+    conn.close()
+    return response.status, received, time.perf_counter() - started
+
+
+def run_scenario(base, path, size, mode, concurrency, requests, range_size):
+    lock = threading.Lock()
+    latencies, statuses = [], {}
+    total_bytes = 0
+
+    def one(_):
+        nonlocal total_bytes
+        headers = {}
+        if mode == "range" and size > range_size:
+            start = random.randrange(0, size - range_size)
+            headers["Range"] = f"bytes={start}-{start + range_size - 1}"
+        status, received, elapsed = _request(base, path, headers)
+        with lock:
+            latencies.append(elapsed)
+            statuses[status] = statuses.get(status, 0) + 1
+            total_bytes += received
+
+    probe_latencies = []
+    done = threading.Event()
+
+    def probe():
+        while not done.is_set():
+            probe_latencies.append(_request(base, "/", {})[2])
+
+    prober = threading.Thread(target=probe)
+    started = time.perf_counter()
+    prober.start()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(requests)))
+    wall = time.perf_counter() - started
+    done.set()
+    prober.join()
+    probe_latencies.sort()
+
+    latencies.sort()
+    return {
+        "path": path,
+        "mode": mode,
+        "requests": requests,
+        "statuses": statuses,
+        "wall_s": round(wall, 3),
+        "req_per_s": round(requests / wall, 1),
+        "mb_per_s": round(total_bytes / wall / 1e6, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p99_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000, 2),
+        "probe_p99_ms": round(probe_latencies[min(len(probe_latencies) - 1, int(len(probe_latencies) * 0.99))] * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--file", required=True, help="tên file trong uploads/videos")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--range-size", type=int, default=2 * 1024 * 1024)
+    parser.add_argument("--output", help="ghi kết quả JSON ra file")
+    args = parser.parse_args()
+
+    base = urlparse(args.base_url)
+    conn = http.client.HTTPConnection(base.hostname, base.port or 80)
+    conn.request("HEAD", f"/media/videos/{args.file}")
+    size = int(conn.getresponse().getheader("content-length"))
+    conn.close()
+
+    results = []
+    for mode in ("full", "range"):
+        for prefix in ("/uploads/videos", "/media/videos"):
+            result = run_scenario(base, f"{prefix}/{args.file}", size, mode,
+                                  args.concurrency, args.requests, args.range_size)
+            results.append(result)
+            print(json.dumps(result))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"file_size": size, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
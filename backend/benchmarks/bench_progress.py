@@ -0,0 +1,145 @@
+"""Đo số heartbeat tiến độ học / giây chịu được: ghi theo lô (ProgressBuffer) so với upsert từng heartbeat.
+
+`--sessions` người đang xem video, mỗi người gửi một heartbeat mỗi `--interval` giây (open-loop), trong
+`--duration` giây, vào một file SQLite tạm. Chế độ "naive" chạy UPDATE (rồi INSERT nếu chưa có) cho mỗi
+heartbeat qua Database.run; chế độ "write_behind" chỉ ghi vào bộ đệm, DB được ghi theo lô.
+
+    python benchmarks/bench_progress.py --sessions 20000 --interval 2 --duration 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import migrations  # noqa: E402
+import sqlite_backend  # noqa: E402
+from database import Database  # noqa: E402
+from db_pool import ConnectionPool  # noqa: E402
+from progress import PROGRESS_CONFIG, ProgressBuffer  # noqa: E402
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def upsert_one(db, user_id, lecture_id, course_id, position):
+    # Cách làm không có bộ đệm: mỗi heartbeat một giao dịch
+    cursor = db.cursor()
+    cursor.execute("UPDATE LectureProgress SET PositionSeconds = ?, UpdatedAt = SYSUTCDATETIME() "
+                   "WHERE UserID = ? AND LectureID = ?", position, user_id, lecture_id)
+    if cursor.rowcount == 0:
+        cursor.execute("INSERT INTO LectureProgress (UserID, LectureID, CourseID, PositionSeconds, Completed, UpdatedAt) "
+                       "VALUES (?, ?, ?, ?, 0, SYSUTCDATETIME())", user_id, lecture_id, course_id, position)
+
+
+def create_db(path, users, courses, lectures_per_course):
+    cnxn = sqlite_backend.connect(path)
+    migrations.migrate(cnxn, "sqlite")
+    raw = cnxn._cnxn
+    raw.execute("BEGIN")
+    raw.executemany("INSERT INTO Users (UserID, Username, Email, Password, Role) VALUES (?, ?, ?, 'x', 'student')",
+                    [(i, f"user{i}", f"user{i}@example.com") for i in range(1, users + 1)])
+    raw.executemany("INSERT INTO Courses (CourseID, Title, InstructorID) VALUES (?, ?, 1)",
+                    [(i, f"Course {i}") for i in range(1, courses + 1)])
+    raw.executemany("INSERT INTO Lectures (LectureID, CourseID, Title, LectureOrder) VALUES (?, ?, ?, ?)",
+                    [((c - 1) * lectures_per_course + n, c, f"Lecture {n}", n)
+                     for c in range(1, courses + 1) for n in range(1, lectures_per_course + 1)])
+    raw.execute("COMMIT")
+    cnxn.close()
+
+
+async def run(args, mode, path):
+    database = Database(ConnectionPool(lambda: sqlite_backend.connect(path), max_size=args.pool_size), args.pool_size)
+    buffer = ProgressBuffer(database, **dict(PROGRESS_CONFIG, flush_interval=args.flush_interval))
+    rng = random.Random(42)
+    lectures = args.courses * args.lectures_per_course
+    # Mỗi phiên xem: một người dùng đang xem một bài giảng, vị trí tăng dần theo thời gian
+    sessions = [(rng.randint(1, args.users), rng.randint(1, lectures)) for _ in range(args.sessions)]
+    latencies, errors = [], 0
+
+    async def naive(scheduled, user_id, lecture_id, course_id, position):
+        nonlocal errors
+        try:
+            await database.run(upsert_one, user_id, lecture_id, course_id, position)
+        except Exception:
+            errors += 1
+        latencies.append(time.perf_counter() - scheduled)
+
+    if mode == "write_behind":
+        buffer.start()
+    rate = args.sessions / args.interval
+    tasks = []
+    started = time.perf_counter()
+    total = int(rate * args.duration)
+    for i in range(total):
+        scheduled = started + i / rate
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        user_id, lecture_id = sessions[i % args.sessions]
+        course_id = (lecture_id - 1) // args.lectures_per_course + 1
+        position = float(i // args.sessions * args.interval)
+        if mode == "write_behind":
+            buffer.record(user_id, lecture_id, course_id, position)
+            latencies.append(time.perf_counter() - scheduled)
+        else:
+            tasks.append(asyncio.ensure_future(naive(scheduled, user_id, lecture_id, course_id, position)))
+    await asyncio.gather(*tasks)
+    if mode == "write_behind":
+        await buffer.close()
+    elapsed = time.perf_counter() - started
+    database.close()
+
+    cnxn = sqlite_backend.connect(path)
+    stored = cnxn.cursor().execute("SELECT COUNT(*) FROM LectureProgress").fetchone()[0]
+    cnxn.cursor().execute("DELETE FROM LectureProgress")
+    cnxn.close()
+    result = {
+        "mode": mode,
+        "offered_hps": round(rate, 1),
+        "sustained_hps": round(total / elapsed, 1),
+        "heartbeats": total,
+        "seconds": round(elapsed, 2),
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "rows_stored": stored,
+    }
+    if mode == "write_behind":
+        result.update({key: value for key, value in buffer.stats().items()
+                       if key in ("rows_written", "coalescing_ratio", "flushes", "last_flush_ms")})
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=20000, help="số người đang xem cùng lúc")
+    parser.add_argument("--interval", type=float, default=2.0, help="giây giữa hai heartbeat của một người")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--courses", type=int, default=500)
+    parser.add_argument("--lectures-per-course", type=int, default=20)
+    parser.add_argument("--pool-size", type=int, default=20)
+    parser.add_argument("--flush-interval", type=float, default=PROGRESS_CONFIG["flush_interval"])
+    parser.add_argument("--modes", default="naive,write_behind")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "progress.sqlite3")
+        create_db(path, args.users, args.courses, args.lectures_per_course)
+        results = [asyncio.run(run(args, mode, path)) for mode in args.modes.split(",")]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""So sánh đường tuần tự hoá cũ (CourseOut.from_row + validate response_model + json) với
+CourseRowSerializer + orjson trên một trang kết quả lớn (mặc định 10k dòng), không cần DB.
+Một phần các dòng (--uploaded-images) dùng ảnh upload đã có biến thể, trong thư mục tạm.
+
+    python benchmarks/bench_serialize.py --rows 10000 --repeat 20 --uploaded-images 0.5
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from collections import namedtuple
+from decimal import Decimal
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from images import IMAGE_VARIANTS, VARIANTS_FOLDER, variant_filename  # noqa: E402
+from models import CourseOut, CoursePage  # noqa: E402
+from serializers import CourseRowSerializer, dumps, orjson  # noqa: E402
+
+COLUMNS = ("CourseID", "Title", "ImageURL", "ShortDescription", "FullDescription", "Price",
+           "InstructorID", "InstructorBio", "InstructorName")
+# pyodbc.Row hỗ trợ cả truy cập theo tên và theo chỉ số, namedtuple cũng vậy
+Row = namedtuple("Row", COLUMNS)
+DESCRIPTION = [(name, None, None, None, None, None, True) for name in COLUMNS]
+
+
+def image_url(i, uploaded_images):
+    if i % 100 < uploaded_images * 100:
+        return f"/uploads/images/{i:064x}.jpg"
+    return f"https://images.example.com/course-{i}.jpg"
+
+
+def make_variants(count, uploaded_images):
+    # Thư mục hiện tại là thư mục tạm: uploads/images/variants/ tương đối như khi chạy server
+    VARIANTS_FOLDER.mkdir(parents=True, exist_ok=True)
+    for i in range(count):
+        if i % 100 < uploaded_images * 100:
+            for name in IMAGE_VARIANTS:
+                (VARIANTS_FOLDER / variant_filename(f"{i:064x}", name)).touch()
+
+
+def make_rows(count, uploaded_images):
+    return [
+        Row(
+            count - i,
+            f"Khoá học lập trình số {i}",
+            image_url(i, uploaded_images),
+            "Học từ cơ bản đến nâng cao với các bài tập thực hành.",
+            "Nội dung chi tiết của khoá học, gồm nhiều chương và bài giảng video. " * 4,
+            Decimal(0) if i % 4 == 0 else Decimal("199000.00"),
+            1 + i % 50,
+            "Giảng viên có nhiều năm kinh nghiệm.",
+            f"Giảng viên {i % 50}",
+        )
+        for i in range(count)
+    ]
+
+
+def old_path_factory():
+    # Giống FastAPI: validate giá trị trả về theo response_model rồi jsonable_encoder + json.dumps
+    try:
+        from fastapi.routing import serialize_response
+        from fastapi.utils import create_response_field
+    except ImportError:
+        serialize_response = None
+
+    if serialize_response is not None:
+        field = create_response_field(name="response", type_=CoursePage)
+
+        def encode(page):
+            content = asyncio.run(serialize_response(field=field, response_content=page))
+            return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    else:
+        def encode(page):
+            validated = CoursePage.parse_obj(page.dict())
+            return json.dumps(validated.dict(), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    def run(rows):
+        page = CoursePage(items=[CourseOut.from_row(row) for row in rows], next_cursor=None)
+        return encode(page)
+    return run
+
+
+def new_path(rows):
+    return dumps({"items": CourseRowSerializer(DESCRIPTION).to_list(rows), "next_cursor": None})
+
+
+def measure(fn, rows, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = fn(rows)
+        timings.append(time.perf_counter() - started)
+    return body, timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--uploaded-images", type=float, default=0.5, help="tỉ lệ dòng có ảnh upload đã tạo biến thể")
+    args = parser.parse_args()
+
+    workdir = tempfile.TemporaryDirectory()
+    os.chdir(workdir.name)
+    make_variants(args.rows, args.uploaded_images)
+    rows = make_rows(args.rows, args.uploaded_images)
+    old_body, old_timings = measure(old_path_factory(), rows, max(1, args.repeat // 4))
+    new_body, new_timings = measure(new_path, rows, args.repeat)
+    if json.loads(old_body) != json.loads(new_body):
+        raise SystemExit("Kết quả JSON của hai đường không giống nhau")
+
+    for name, timings, body in (("pydantic", old_timings, old_body), ("row_serializer", new_timings, new_body)):
+        print(json.dumps({
+            "path": name,
+            "rows": args.rows,
+            "uploaded_images": args.uploaded_images,
+            "encoder": "json" if name == "pydantic" or orjson is None else "orjson",
+            "median_ms": round(statistics.median(timings) * 1000, 2),
+            "min_ms": round(min(timings) * 1000, 2),
+            "bytes": len(body),
+        }))
+    print(json.dumps({"speedup": round(statistics.median(old_timings) / statistics.median(new_timings), 1)}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Kiểm tra gộp truy vấn (single-flight): N request đồng thời cho cùng một khoá học chưa có trong cache.
+
+Gọi thẳng ứng dụng ASGI trong tiến trình trên file SQLite của benchmarks/seed_sqlite.py, đếm số câu SQL
+mỗi đợt `--concurrency` request GET /courses/{id} và /courses/{id}/lectures, có và không có single-flight.
+Đợt "cancel_leader" huỷ request dẫn đầu khi truy vấn đang chạy: các request còn lại vẫn phải nhận 200.
+
+    python benchmarks/bench_singleflight.py --db elearning.sqlite3 --concurrency 200 --check
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+async def http_get(app, path):
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+        "headers": [(b"host", b"testserver")], "client": ("127.0.0.1", 12345), "server": ("testserver", 80),
+    }
+    status = None
+    finished = asyncio.Event()
+    received = False
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body" and not message.get("more_body"):
+            finished.set()
+
+    try:
+        await app(scope, receive, send)
+    finally:
+        finished.set()
+    return status
+
+
+async def burst(main, path, concurrency, cancel_leader=False):
+    tasks = [asyncio.ensure_future(http_get(main.app, path)) for _ in range(concurrency)]
+    if cancel_leader:
+        while not len(main.catalog_flights):
+            await asyncio.sleep(0.0005)
+        tasks[0].cancel()
+    return await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def run(args):
+    import main
+
+    queries = []
+    traced = main.database.on_query
+
+    def count_query(sql, seconds, error=None):
+        queries.append(sql)
+        traced(sql, seconds, error)
+
+    main.database.on_query = count_query
+    rounds = []
+    course_id = args.first_course
+    for mode in ("single_flight", "no_single_flight", "cancel_leader"):
+        main.catalog_cache.flights = None if mode == "no_single_flight" else main.catalog_flights
+        for path in (f"/courses/{course_id}", f"/courses/{course_id}/lectures"):
+            main.catalog_cache.clear()
+            before = len(queries)
+            started = time.perf_counter()
+            results = await burst(main, path, args.concurrency, cancel_leader=mode == "cancel_leader")
+            statuses = [result for result in results if not isinstance(result, BaseException)]
+            cancelled = len(results) - len(statuses)
+            rounds.append({
+                "mode": mode,
+                "path": path,
+                "requests": args.concurrency,
+                "cancelled": cancelled,
+                "ok": statuses.count(200),
+                "other_statuses": sorted(set(status for status in statuses if status != 200)),
+                "db_queries": len(queries) - before,
+                "ms": round((time.perf_counter() - started) * 1000, 1),
+            })
+        course_id += 1
+    main.catalog_cache.flights = main.catalog_flights
+    main.database.on_query = traced
+    main.read_router.close()
+    main.database.close()
+    return {"rounds": rounds, "singleflight": main.catalog_flights.stats()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="elearning.sqlite3")
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--first-course", type=int, default=1)
+    parser.add_argument("--check", action="store_true",
+                        help="thoát mã 1 nếu một đợt có single-flight chạy khác đúng một câu SQL hoặc có request lỗi")
+    args = parser.parse_args()
+    os.environ.update(DB_BACKEND="sqlite", SQLITE_PATH=args.db, LOG_LEVEL=os.environ.get("LOG_LEVEL", "WARNING"))
+
+    report = asyncio.run(run(args))
+    print(json.dumps(report, indent=2))
+    if args.check:
+        failed = [r for r in report["rounds"] if r["mode"] != "no_single_flight"
+                  and (r["db_queries"] != 1 or r["ok"] != r["requests"] - r["cancelled"])]
+        if failed:
+            print(f"FAIL: {len(failed)} đợt không gộp được về một truy vấn", file=sys.stderr)
+            sys.exit(1)
+        print("OK: mỗi đợt single-flight chạy đúng một câu SQL", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+"""Kiểm tra hồi quy kế hoạch truy vấn: mọi câu SQL main.py dùng (qua crud.py) phải đi bằng chỉ mục.
+
+Tạo DB SQLite mới bằng migrations.py (hoặc chép `--db` đã seed), gọi lần lượt các hàm crud mà endpoint
+dùng và lấy EXPLAIN QUERY PLAN của từng câu. Báo lỗi khi một câu quét toàn bảng (SCAN bảng thật, không
+phải bảng tạm / truy vấn con) mà không nằm trong ALLOWED_FULL_SCANS, hoặc khi khoá ngoại không có chỉ mục
+ở bảng con (xoá dòng cha sẽ quét bảng con). Quét theo thứ tự rồi dừng ở LIMIT chỉ được bỏ qua khi câu không
+lọc WHERE, hoặc mọi cột lọc đều là cột đầu của một chỉ mục: SQLite không có histogram nên với điều kiện một phía
+(`Price > 0`) luôn chọn quét theo thứ tự, SQL Server chọn theo thống kê giữa hai cách. Cột lọc không có chỉ mục
+(ví dụ Price khi thiếu IX_Courses_Price) vẫn là lỗi.
+Kế hoạch của SQLite chỉ xấp xỉ SQL Server: đủ để bắt thiếu chỉ mục, không thay cho xem plan thật.
+Với `--db`, kế hoạch phụ thuộc thống kê (ANALYZE) của DB đó; bảng tạm không có thống kê nên SQLite có thể
+chọn quét bảng nhỏ thay vì đi từ bảng tạm. Cổng kiểm tra là chạy mặc định trên DB mới.
+
+    python benchmarks/check_plans.py --check
+    python benchmarks/check_plans.py --db elearning.sqlite3 --verbose
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import crud  # noqa: E402
+import migrations  # noqa: E402
+import sqlite_backend  # noqa: E402
+from metrics import normalize_sql  # noqa: E402
+
+# Hàm được phép quét toàn bảng: không chạy theo request của người dùng hoặc cần đọc hết dữ liệu
+ALLOWED_FULL_SCANS = {
+    "list_course_search_docs": "dựng chỉ mục tìm kiếm lúc khởi động",
+    "list_enrollment_counts": "dựng bảng xếp hạng lúc khởi động / định kỳ",
+    "list_featured_courses": "dự phòng khi chưa có lượt đăng ký nào, kết quả được cache",
+    "list_media_blobs": "`python storage.py gc`",
+    "count_media_references": "`python storage.py gc`",
+    "upsert_lecture_progress": "ghi nền theo lô (progress.py), không theo request; SQLite không có thống kê "
+                               "bảng tạm nên có thể quét LectureProgress, SQL Server đi theo khoá chính từ #ProgressBatch",
+}
+_SCAN = re.compile(r"^SCAN (temp\.)?(\w+)")
+_DERIVED = re.compile(r"^(?:CO-ROUTINE|MATERIALIZE) (\w+)")
+_TEMP_TABLE = re.compile(r"\btemp\.(\w+)(?:\s+(?:AS\s+)?(\w+))?", re.IGNORECASE)
+_WHERE = re.compile(r"\bWHERE\b(.*?)(?:\bGROUP BY\b|\bORDER BY\b|\bLIMIT\b|$)", re.IGNORECASE | re.DOTALL)
+_FILTER_COLUMN = re.compile(r"\b(?:\w+\.)?(\w+)\s*(?:[<>=!]|\bIN\b|\bIS\b|\bBETWEEN\b|\bLIKE\b)", re.IGNORECASE)
+
+
+class PlanCapture:
+    def __init__(self):
+        self.function = None
+        self.plans = {}  # (hàm, câu SQL) -> kế hoạch
+
+    def __call__(self, sql, translated, details):
+        key = (self.function, normalize_sql(sql))
+        if key not in self.plans:
+            self.plans[key] = {"function": self.function, "sql": key[1], "plan": details,
+                               "full_scans": full_scans(translated, details),
+                               "ordered_with_limit": ordered_with_limit(translated, details),
+                               "filters": sorted(where_columns(translated))}
+
+
+def full_scans(translated, details):
+    temp = {name for match in _TEMP_TABLE.findall(translated) for name in match if name}
+    derived = {match.group(1) for match in map(_DERIVED.match, details) if match}
+    scans = []
+    for detail in details:
+        match = _SCAN.match(detail)
+        if match is None or match.group(1) or match.group(2) == "CONSTANT" or match.group(2) in temp | derived:
+            continue
+        scans.append(detail)
+    return scans
+
+
+def ordered_with_limit(translated, details):
+    # Quét theo thứ tự chỉ mục rồi dừng ở LIMIT, không sắp xếp lại (không có TEMP B-TREE)
+    return bool(re.search(r"\bLIMIT\b", translated)) and not any("TEMP B-TREE" in detail for detail in details)
+
+
+def where_columns(translated):
+    # Các cột bị lọc trong WHERE ngoài cùng (điều kiện JOIN nằm ở ON, không tính)
+    match = _WHERE.search(translated)
+    return set(_FILTER_COLUMN.findall(match.group(1))) if match else set()
+
+
+def allowed_ordered_scan(plan, indexed):
+    # `indexed`: các cột đứng đầu một chỉ mục (hoặc là khoá chính INTEGER) ở bất kỳ bảng nào
+    if not plan["ordered_with_limit"]:
+        return False
+    return set(plan["filters"]) <= indexed  # không lọc: đọc đúng LIMIT dòng theo thứ tự
+
+
+def indexed_columns(raw):
+    # Bảng -> các cột đứng đầu một chỉ mục, kể cả khoá chính INTEGER (rowid)
+    indexed = {}
+    tables = [row[0] for row in raw.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'")]
+    for table in tables:
+        leading = {row[1] for row in raw.execute(f"PRAGMA table_info({table})") if row[5] == 1 and row[2].upper() == "INTEGER"}
+        for index in raw.execute(f"PRAGMA index_list({table})").fetchall():
+            columns = raw.execute(f"PRAGMA index_info({index[1]})").fetchall()
+            if columns:
+                leading.add(columns[0][2])
+        indexed[table] = leading
+    return indexed
+
+
+def unindexed_foreign_keys(raw, indexed):
+    missing = []
+    for table, leading in indexed.items():
+        for fk in raw.execute(f"PRAGMA foreign_key_list({table})"):
+            if fk[3] not in leading:
+                missing.append({"table": table, "column": fk[3], "references": fk[2], "on_delete": fk[6]})
+    return missing
+
+
+def seed(raw):
+    raw.execute("INSERT INTO Users (Username, Email, Password, Role) VALUES ('plan_instructor', 'plan_instructor@example.com', 'x', 'instructor')")
+    raw.execute("INSERT INTO Users (Username, Email, Password) VALUES ('plan_student', 'plan_student@example.com', 'x')")
+    instructor_id, student_id = (row[0] for row in raw.execute("SELECT UserID FROM Users WHERE Username LIKE 'plan_%' ORDER BY Username"))
+    raw.execute("INSERT INTO Courses (Title, Price, InstructorID) VALUES ('Plan course', 0, ?)", (instructor_id,))
+    course_id = raw.execute("SELECT MAX(CourseID) FROM Courses").fetchone()[0]
+    raw.execute("INSERT INTO Lectures (CourseID, Title, VideoURL, LectureOrder) VALUES (?, 'Plan lecture', '/uploads/videos/plan.mp4', 1)",
+                (course_id,))
+    raw.execute("INSERT INTO Enrollments (UserID, CourseID) VALUES (?, ?)", (student_id, course_id))
+    return instructor_id, student_id, course_id
+
+
+def run_scenarios(db, capture, instructor_id, student_id, course_id):
+    # Các lời gọi crud của main.py / loaders.py / storage.py với tham số tiêu biểu
+    def step(fn, *args, **kwargs):
+        capture.function = fn.__name__
+        return fn(db, *args, **kwargs)
+
+    user = step(crud.create_user, "plan_new_user", "plan_new_user@example.com", "x")
+    step(crud.get_user_login_row, "plan_student@example.com")
+    step(crud.get_users_by_ids, [instructor_id, student_id])
+    step(crud.upgrade_user_to_instructor, user.user_id)
+
+    for options in ({}, {"cursor": course_id + 1}, {"is_free": True}, {"is_free": False},
+                    {"min_price": 1, "max_price": 500000}, {"summary": True}, {"instructor_id": instructor_id}):
+        step(crud.list_courses, limit=20, **options)
+    step(crud.list_created_courses, instructor_id, limit=20)
+    step(crud.get_courses_by_ids, [course_id])
+    step(crud.get_courses_by_ids, [course_id], summary=True)
+    step(crud.list_courses_by_ids, [course_id])
+    step(crud.list_courses_by_ids, [course_id], summary=True)
+    step(crud.list_course_search_docs)
+    step(crud.list_featured_courses)
+    step(crud.list_enrollment_counts)
+    step(crud.list_recent_enrollments, datetime.utcnow() - timedelta(days=28))
+    step(crud.list_enrolled_courses, student_id, limit=20)
+    step(crud.list_enrolled_courses, student_id, cursor=2 ** 31 - 1, limit=20, summary=True)
+
+    course = step(crud.create_course, "Plan course 2", None, "short", "full", 0, instructor_id, "bio", "plan_instructor")
+    lecture = step(crud.create_lecture, course.course_id, "Plan lecture 2", "/uploads/videos/plan2.mp4", None)
+    step(crud.get_lectures_by_ids, [lecture.lecture_id])
+    step(crud.list_lectures_if_course_exists, course.course_id)
+    step(crud.get_course_page, course.course_id)
+    step(crud.get_enrollment, student_id, course_id)
+    step(crud.create_enrollment, student_id, course.course_id)
+    step(crud.bulk_create_enrollments, [(user.user_id, course_id), (user.user_id, course.course_id)])
+
+    now = datetime.utcnow()
+    step(crud.upsert_lecture_progress, [(student_id, lecture.lecture_id, course.course_id, 10.0, 300.0, False, now)])
+    step(crud.upsert_lecture_progress, [(student_id, lecture.lecture_id, course.course_id, 20.0, None, True, now)])
+    step(crud.list_course_progress, student_id, course.course_id)
+
+    step(crud.acquire_media_blob, "0" * 64, "/uploads/videos/plan2.mp4", 1)
+    step(crud.acquire_media_blob, "0" * 64, "/uploads/videos/plan2.mp4", 1)
+    step(crud.list_media_blobs)
+    step(crud.count_media_references)
+    step(crud.set_media_blob_refcount, "0" * 64, 2, 1)
+    step(crud.acquire_media_url, "/uploads/videos/plan2.mp4")
+    step(crud.release_media_blob, "/uploads/videos/plan2.mp4")
+
+    step(crud.delete_lecture, lecture.lecture_id)
+    step(crud.delete_course, course.course_id)
+
+
+def collect(db_path=None):
+    """Chạy các kịch bản trên DB mới (hoặc bản chép của `db_path`), trả về báo cáo và danh sách lỗi."""
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "plans.sqlite3")
+        if db_path:
+            shutil.copyfile(db_path, path)
+        cnxn = sqlite_backend.connect(path)
+        migrations.migrate(cnxn, "sqlite")
+        ids = seed(cnxn._cnxn)
+        capture = PlanCapture()
+        cnxn.on_plan = capture
+        run_scenarios(cnxn, capture, *ids)
+        indexed = indexed_columns(cnxn._cnxn)
+        missing_fk_indexes = unindexed_foreign_keys(cnxn._cnxn, indexed)
+        cnxn.close()
+
+    indexed_anywhere = set().union(*indexed.values())
+    plans = list(capture.plans.values())
+    scanning = [plan for plan in plans if plan["full_scans"]]
+    ordered = [plan for plan in scanning
+               if plan["function"] not in ALLOWED_FULL_SCANS and allowed_ordered_scan(plan, indexed_anywhere)]
+    failures = [plan for plan in scanning if plan["function"] not in ALLOWED_FULL_SCANS and plan not in ordered]
+    report = {
+        "statements": len(plans),
+        "functions": len({plan["function"] for plan in plans}),
+        "full_scans": failures,
+        "allowed_full_scans": [{"function": plan["function"], "reason": ALLOWED_FULL_SCANS[plan["function"]],
+                                "scans": plan["full_scans"]} for plan in scanning
+                               if plan["function"] in ALLOWED_FULL_SCANS],
+        "allowed_ordered_scans": [{"function": plan["function"], "filters": plan["filters"], "scans": plan["full_scans"]}
+                                  for plan in ordered],
+        "unindexed_foreign_keys": missing_fk_indexes,
+        "plans": plans,
+    }
+    return report, failures + missing_fk_indexes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=None, help="DB SQLite đã seed (được chép ra file tạm); mặc định tạo DB mới")
+    parser.add_argument("--verbose", action="store_true", help="in kế hoạch của mọi câu SQL")
+    parser.add_argument("--check", action="store_true", help="thoát mã 1 nếu có quét toàn bảng hoặc khoá ngoại thiếu chỉ mục")
+    args = parser.parse_args()
+
+    report, violations = collect(args.db)
+    plans = report["plans"] if args.verbose else report.pop("plans")
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if args.check:
+        if violations:
+            print(f"FAIL: {len(report['full_scans'])} câu quét toàn bảng, "
+                  f"{len(report['unindexed_foreign_keys'])} khoá ngoại thiếu chỉ mục", file=sys.stderr)
+            sys.exit(1)
+        print(f"OK: {len(plans)} câu SQL đều dùng chỉ mục", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
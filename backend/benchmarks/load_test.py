@@ -0,0 +1,443 @@
+"""Load test cho toàn bộ endpoint trong main.py ở một RPS cố định (open-loop), báo cáo throughput và
+p50/p95/p99 theo từng endpoint, ghi kết quả JSON để so sánh giữa các lần chạy.
+
+Chuẩn bị dữ liệu và server (không cần SQL Server):
+    python benchmarks/seed_sqlite.py --db /tmp/elearning.sqlite3 --scale 0.01
+    DB_BACKEND=sqlite SQLITE_PATH=/tmp/elearning.sqlite3 RATE_LIMITS=off uvicorn main:app --port 8000
+
+Chạy:
+    python benchmarks/load_test.py --manifest /tmp/elearning.sqlite3.manifest.json --rps 200 --duration 60 \\
+        --output results/run1.json
+    python benchmarks/load_test.py ... --output results/run2.json --compare results/run1.json
+
+Độ trễ tính từ thời điểm request *được lên lịch* (không phải lúc gửi), nên khi server chậm hàng đợi phía
+client cũng được tính vào p99 thay vì bị che mất (coordinated omission).
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import random
+import statistics
+import time
+from urllib.parse import quote, urlencode, urlparse
+
+
+class HTTPConnection:
+    """Kết nối HTTP/1.1 keep-alive tối giản trên asyncio streams (Content-Length và chunked)."""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def open(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+    async def request(self, method, path, headers, body=b""):
+        if self.writer is None:
+            await self.open()
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {self.host}:{self.port}", f"Content-Length: {len(body)}"]
+        lines.extend(f"{name}: {value}" for name, value in headers.items())
+        self.writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError("server closed the connection")
+        status = int(status_line.split()[1])
+        response_headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            response_headers[name.strip().lower()] = value.strip()
+
+        if method == "HEAD" or status in (204, 304) or 100 <= status < 200:
+            payload = b""
+        elif response_headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await self.reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    await self.reader.readline()
+                    break
+                chunks.append(await self.reader.readexactly(size))
+                await self.reader.readline()
+            payload = b"".join(chunks)
+        else:
+            payload = await self.reader.readexactly(int(response_headers.get("content-length", 0)))
+        if response_headers.get("connection", "").lower() == "close":
+            self.close()
+        return status, response_headers, payload
+
+
+class EndpointStats:
+    def __init__(self):
+        self.latencies = []
+        self.statuses = {}
+        self.errors = 0
+        self.bytes = 0
+
+    def summary(self, duration):
+        latencies = sorted(self.latencies)
+        count = len(latencies)
+        if count:
+            quantiles = statistics.quantiles(latencies, n=100, method="inclusive") if count > 1 else latencies * 99
+            p50, p95, p99 = quantiles[49], quantiles[94], quantiles[98]
+        else:
+            p50 = p95 = p99 = 0.0
+        return {
+            "requests": count,
+            "throughput_rps": round(count / duration, 2),
+            "p50_ms": round(p50 * 1000, 2),
+            "p95_ms": round(p95 * 1000, 2),
+            "p99_ms": round(p99 * 1000, 2),
+            "mean_ms": round(statistics.fmean(latencies) * 1000, 2) if count else 0.0,
+            "max_ms": round(latencies[-1] * 1000, 2) if count else 0.0,
+            "statuses": dict(sorted(self.statuses.items())),
+            "errors": self.errors,
+            "bytes": self.bytes,
+        }
+
+
+class LoadTest:
+    """Giữ pool kết nối, token đăng nhập và các id tạo ra trong lúc chạy (để kịch bản xoá dùng lại)."""
+
+    def __init__(self, base_url, manifest, connections, seed, media_file=None):
+        url = urlparse(base_url)
+        self.host, self.port = url.hostname, url.port or 80
+        self.manifest = manifest
+        self.rng = random.Random(seed)
+        self.media_file = media_file
+        self.run_id = f"{int(time.time())}{random.Random().randrange(1000):03d}"
+        self.stats = {}
+        self.connections = asyncio.Queue()
+        for _ in range(connections):
+            self.connections.put_nowait(HTTPConnection(self.host, self.port))
+
+        self.instructor_tokens = []  # (user_id, token)
+        self.created_courses = []    # (course_id, auth)
+        self.created_lectures = []   # (lecture_id, course_id, auth)
+        self.registered_users = []   # (user_id, email)
+        self.counter = 0
+
+    # --- dữ liệu ngẫu nhiên theo manifest ---
+    def course_id(self):
+        return self.rng.randint(1, self.manifest["courses"])
+
+    def user_id(self):
+        return self.rng.randint(1, self.manifest["users"])
+
+    def instructor_id(self):
+        return self.rng.randint(1, self.manifest["instructors"])
+
+    def next_name(self):
+        self.counter += 1
+        return f"lt{self.run_id}_{self.counter}"
+
+    async def call(self, name, method, path, scheduled=None, headers=None, body=b"", json_body=None, form=None):
+        headers = dict(headers or {})
+        headers.setdefault("Accept-Encoding", "gzip")
+        if json_body is not None:
+            body = json.dumps(json_body).encode("utf-8")
+            headers["Content-Type"] = "application/json"
+        elif form is not None:
+            body = urlencode(form).encode("utf-8")
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+        started = scheduled if scheduled is not None else time.perf_counter()
+        stats = self.stats.setdefault(name, EndpointStats())
+
+        connection = await self.connections.get()
+        try:
+            status, response_headers, payload = await connection.request(method, path, headers, body)
+        except (OSError, ValueError, IndexError, asyncio.IncompleteReadError):
+            connection.close()
+            stats.errors += 1
+            return None, None
+        finally:
+            self.connections.put_nowait(connection)
+        stats.latencies.append(time.perf_counter() - started)
+        stats.statuses[str(status)] = stats.statuses.get(str(status), 0) + 1
+        stats.bytes += len(payload)
+        if status >= 500:
+            stats.errors += 1
+        if response_headers.get("content-encoding") == "gzip":
+            payload = gzip.decompress(payload)
+        return status, payload
+
+    async def login(self, email, name="login", scheduled=None):
+        status, payload = await self.call(
+            name, "POST", "/login", scheduled,
+            json_body={"email": email, "password": self.manifest["password"]})
+        if status == 200:
+            session = json.loads(payload)
+            return session["user_id"], session["access_token"]
+        return None, None
+
+    async def warm_up(self, instructors):
+        email_format = self.manifest["email_format"]
+        for user_id in range(1, min(instructors, self.manifest["instructors"]) + 1):
+            uid, token = await self.login(email_format.format(user_id), name="warmup_login")
+            if token:
+                self.instructor_tokens.append((uid, token))
+        if not self.instructor_tokens:
+            raise SystemExit("Không đăng nhập được tài khoản giảng viên nào; kiểm tra --manifest và server")
+
+    def instructor_auth(self):
+        user_id, token = self.rng.choice(self.instructor_tokens)
+        return user_id, {"Authorization": f"Bearer {token}"}
+
+
+# --- Kịch bản: mỗi hàm gửi một (hoặc vài) request; request đầu tiên tính độ trễ từ thời điểm lên lịch ---
+async def list_courses(t, scheduled):
+    cursor = t.rng.choice(["", f"&cursor={t.course_id()}"])
+    await t.call("GET /courses", "GET", f"/courses?limit=20{cursor}", scheduled)
+
+
+async def list_courses_summary(t, scheduled):
+    await t.call("GET /courses?fields=summary", "GET", "/courses?limit=100&fields=summary", scheduled)
+
+
+async def featured_courses(t, scheduled):
+    await t.call("GET /courses/featured", "GET", "/courses/featured", scheduled)
+
+
+async def search_courses(t, scheduled):
+    term = t.rng.choice(t.manifest.get("search_terms") or ["python"])
+    await t.call("GET /courses/search", "GET", f"/courses/search?q={quote(term)}", scheduled)
+
+
+async def course_detail(t, scheduled):
+    await t.call("GET /courses/{id}", "GET", f"/courses/{t.course_id()}", scheduled)
+
+
+async def course_lectures(t, scheduled):
+    await t.call("GET /courses/{id}/lectures", "GET", f"/courses/{t.course_id()}/lectures", scheduled)
+
+
+async def course_page(t, scheduled):
+    await t.call("GET /courses/{id}/page", "GET", f"/courses/{t.course_id()}/page?user_id={t.user_id()}", scheduled)
+
+
+async def enrolled_courses(t, scheduled):
+    await t.call("GET /users/{id}/enrolled_courses", "GET", f"/users/{t.user_id()}/enrolled_courses", scheduled)
+
+
+async def created_courses(t, scheduled):
+    await t.call("GET /users/{id}/created_courses", "GET", f"/users/{t.instructor_id()}/created_courses", scheduled)
+
+
+async def login(t, scheduled):
+    await t.login(t.manifest["email_format"].format(t.user_id()), name="POST /login", scheduled=scheduled)
+
+
+async def register(t, scheduled):
+    name = t.next_name()
+    email = f"{name}@loadtest.local"
+    status, payload = await t.call(
+        "POST /register", "POST", "/register", scheduled,
+        json_body={"username": name, "email": email, "password": t.manifest["password"]})
+    if status == 200:
+        t.registered_users.append((json.loads(payload)["user_id"], email))
+
+
+async def upgrade_to_instructor(t, scheduled):
+    if not t.registered_users:
+        return await register(t, scheduled)
+    _, email = t.registered_users.pop()
+    user_id, token = await t.login(email, name="POST /login", scheduled=scheduled)
+    if token:
+        await t.call("PUT /users/{id}/upgrade-to-instructor", "PUT", f"/users/{user_id}/upgrade-to-instructor",
+                     headers={"Authorization": f"Bearer {token}"})
+
+
+async def enroll(t, scheduled):
+    await t.call("POST /enroll", "POST", "/enroll", scheduled,
+                 json_body={"user_id": t.user_id(), "course_id": t.course_id()})
+
+
+async def enroll_bulk(t, scheduled):
+    # Giảng viên chỉ đăng ký học viên vào khoá học của mình
+    if not t.created_courses:
+        return await create_course(t, scheduled)
+    course_id, auth = t.rng.choice(t.created_courses)
+    items = [{"user_id": t.user_id(), "course_id": course_id} for _ in range(20)]
+    await t.call("POST /enroll/bulk", "POST", "/enroll/bulk", scheduled, headers=auth, json_body={"items": items})
+
+
+async def create_course(t, scheduled):
+    _, auth = t.instructor_auth()
+    status, payload = await t.call(
+        "POST /courses", "POST", "/courses", scheduled, headers=auth,
+        form={"title": f"Khoá học {t.next_name()}", "short_description": "Tạo bởi load test", "price": 0})
+    if status == 201:
+        t.created_courses.append((json.loads(payload)["course_id"], auth))
+
+
+async def delete_course(t, scheduled):
+    if not t.created_courses:
+        return await create_course(t, scheduled)
+    course_id, auth = t.created_courses.pop()
+    # Bài giảng của khoá bị xoá theo (cascade), bỏ khỏi danh sách chờ xoá
+    t.created_lectures = [lecture for lecture in t.created_lectures if lecture[1] != course_id]
+    await t.call("DELETE /courses/{id}", "DELETE", f"/courses/{course_id}", scheduled, headers=auth)
+
+
+async def add_lecture(t, scheduled):
+    if not t.created_courses:
+        return await create_course(t, scheduled)
+    course_id, auth = t.rng.choice(t.created_courses)
+    status, payload = await t.call(
+        "POST /courses/{id}/lectures", "POST", f"/courses/{course_id}/lectures", scheduled, headers=auth,
+        form={"title": f"Bài {t.next_name()}", "video_url": "https://videos.example.com/loadtest.mp4"})
+    if status == 201:
+        t.created_lectures.append((json.loads(payload)["lecture_id"], course_id, auth))
+
+
+async def delete_lecture(t, scheduled):
+    if not t.created_lectures:
+        return await add_lecture(t, scheduled)
+    lecture_id, _, auth = t.created_lectures.pop()
+    await t.call("DELETE /lectures/{id}", "DELETE", f"/lectures/{lecture_id}", scheduled, headers=auth)
+
+
+async def upload_session(t, scheduled):
+    status, payload = await t.call(
+        "POST /upload-sessions", "POST", "/upload-sessions", scheduled,
+        json_body={"filename": "loadtest.mp4", "size": 1024 * 1024, "content_type": "video/mp4"})
+    if status == 201:
+        upload_id = json.loads(payload)["upload_id"]
+        await t.call("HEAD /upload-sessions/{id}", "HEAD", f"/upload-sessions/{upload_id}")
+        await t.call("DELETE /upload-sessions/{id}", "DELETE", f"/upload-sessions/{upload_id}")
+
+
+async def media(t, scheduled):
+    start = t.rng.randrange(0, 1024 * 1024)
+    await t.call("GET /media/{kind}/{filename}", "GET", f"/media/videos/{quote(t.media_file)}", scheduled,
+                 headers={"Range": f"bytes={start}-{start + 256 * 1024 - 1}"})
+
+
+async def health(t, scheduled):
+    path = t.rng.choice(["/health/db", "/health/cache", "/health/images", "/"])
+    await t.call(f"GET {path}", "GET", path, scheduled)
+
+
+async def metrics(t, scheduled):
+    await t.call("GET /metrics", "GET", "/metrics", scheduled)
+
+
+# Trọng số mô phỏng lưu lượng thực tế: chủ yếu đọc danh mục, ít thao tác ghi
+SCENARIOS = (
+    (20, list_courses), (4, list_courses_summary), (10, featured_courses), (8, search_courses),
+    (14, course_detail), (8, course_lectures), (12, course_page), (5, enrolled_courses),
+    (2, created_courses), (4, login), (1, register), (0.5, upgrade_to_instructor), (3, enroll),
+    (0.5, enroll_bulk), (1, create_course), (0.8, delete_course), (1, add_lecture), (0.8, delete_lecture),
+    (0.5, upload_session), (0, media), (1, health), (0.2, metrics),
+)
+
+
+async def run(t, rps, duration, scenarios):
+    weights = [weight for weight, _ in scenarios]
+    functions = [fn for _, fn in scenarios]
+    total = int(rps * duration)
+    tasks = []
+    started = time.perf_counter()
+    for i in range(total):
+        scheduled = started + i / rps
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        scenario = t.rng.choices(functions, weights)[0]
+        tasks.append(asyncio.ensure_future(scenario(t, scheduled)))
+    await asyncio.gather(*tasks)
+    return time.perf_counter() - started
+
+
+def compare(results, baseline):
+    print(f"{'endpoint':45} {'rps':>16} {'p95 ms':>20} {'p99 ms':>20}")
+    for name, current in results["endpoints"].items():
+        before = baseline["endpoints"].get(name)
+        if before is None:
+            continue
+        cells = []
+        for key in ("throughput_rps", "p95_ms", "p99_ms"):
+            change = (current[key] - before[key]) / before[key] * 100 if before[key] else 0.0
+            cells.append(f"{before[key]:>7} -> {current[key]:<7} {change:+.0f}%")
+        print(f"{name:45} " + " ".join(cells))
+
+
+async def main_async(args):
+    with open(args.manifest) as f:
+        manifest = json.load(f)
+    t = LoadTest(args.url, manifest, args.connections, args.seed, args.media_file)
+    await t.warm_up(args.instructors)
+    t.stats.clear()
+
+    scenarios = [(weight, fn) for weight, fn in SCENARIOS if fn is not media or args.media_file]
+    if args.media_file:
+        scenarios = [(5 if fn is media else weight, fn) for weight, fn in scenarios]
+    if args.only:
+        wanted = set(args.only.split(","))
+        scenarios = [(weight, fn) for weight, fn in scenarios if fn.__name__ in wanted]
+    elapsed = await run(t, args.rps, args.duration, scenarios)
+
+    overall = EndpointStats()
+    for stats in t.stats.values():
+        overall.latencies.extend(stats.latencies)
+        overall.errors += stats.errors
+        overall.bytes += stats.bytes
+        for code, count in stats.statuses.items():
+            overall.statuses[code] = overall.statuses.get(code, 0) + count
+    while not t.connections.empty():
+        t.connections.get_nowait().close()
+
+    return {
+        "config": {
+            "url": args.url, "rps": args.rps, "duration": args.duration, "connections": args.connections,
+            "seed": args.seed, "manifest": {k: manifest[k] for k in ("users", "courses", "lectures", "enrollments")},
+        },
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "elapsed_seconds": round(elapsed, 2),
+        "overall": overall.summary(elapsed),
+        "endpoints": {name: stats.summary(elapsed) for name, stats in sorted(t.stats.items())},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--manifest", required=True, help="file .manifest.json do seed_sqlite.py sinh ra")
+    parser.add_argument("--rps", type=float, default=100.0)
+    parser.add_argument("--duration", type=float, default=30.0, help="giây")
+    parser.add_argument("--connections", type=int, default=64, help="số kết nối keep-alive tối đa")
+    parser.add_argument("--instructors", type=int, default=20, help="số giảng viên đăng nhập sẵn cho request ghi")
+    parser.add_argument("--media-file", help="tên file trong videos/ để thêm kịch bản GET /media (Range)")
+    parser.add_argument("--only", help="chỉ chạy các kịch bản này (tên hàm, phân tách bằng dấu phẩy)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="ghi kết quả JSON ra file")
+    parser.add_argument("--compare", help="file JSON của lần chạy trước để so sánh")
+    args = parser.parse_args()
+
+    results = asyncio.run(main_async(args))
+    print(json.dumps({"overall": results["overall"], "elapsed_seconds": results["elapsed_seconds"]}, indent=2))
+    for name, summary in results["endpoints"].items():
+        print(f"{name:45} n={summary['requests']:<6} p50={summary['p50_ms']:<8} p95={summary['p95_ms']:<8} "
+              f"p99={summary['p99_ms']:<8} errors={summary['errors']} statuses={summary['statuses']}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""Sinh dữ liệu giả lập vào SQLite để chạy backend và load test không cần SQL Server.
+
+Mặc định: 100k khoá học, 1M bài giảng, 10M lượt đăng ký (--scale 0.01 để thử nhanh).
+
+    python benchmarks/seed_sqlite.py --db elearning.sqlite3
+    DB_BACKEND=sqlite SQLITE_PATH=elearning.sqlite3 RATE_LIMITS=off uvicorn main:app --port 8000
+
+Ghi kèm `<db>.manifest.json` (số lượng, mật khẩu, định dạng email) cho benchmarks/load_test.py.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import migrations  # noqa: E402
+import sqlite_backend  # noqa: E402
+
+PASSWORD = "password123"
+EMAIL_FORMAT = "user{}@example.com"
+BATCH_SIZE = 50000
+
+TOPICS = ["Python", "JavaScript", "React", "SQL", "Java", "C#", "Docker", "Machine Learning", "Excel",
+          "Thiết kế", "Marketing", "Tiếng Anh", "Kế toán", "Nhiếp ảnh", "Guitar", "Toán", "Vật lý", "Hoá học"]
+LEVELS = ["cơ bản", "nâng cao", "cho người mới bắt đầu", "thực chiến", "từ A đến Z", "chuyên sâu"]
+WORDS = ["học", "lập", "trình", "dữ", "liệu", "ứng", "dụng", "dự", "án", "bài", "tập", "kỹ", "năng",
+         "thực", "hành", "phân", "tích", "hệ", "thống", "web", "mobile", "thiết", "kế", "giao", "diện"]
+
+
+def sentence(rng, length):
+    return " ".join(rng.choice(WORDS) for _ in range(length)).capitalize() + "."
+
+
+def insert_batches(cursor, sql, rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            cursor.executemany(sql, batch)
+            batch.clear()
+    if batch:
+        cursor.executemany(sql, batch)
+
+
+def generate_users(count, instructors):
+    for user_id in range(1, count + 1):
+        role = "instructor" if user_id <= instructors else "student"
+        yield user_id, f"user{user_id}", EMAIL_FORMAT.format(user_id), PASSWORD, role
+
+
+def generate_courses(rng, count, instructors):
+    for course_id in range(1, count + 1):
+        title = f"{rng.choice(TOPICS)} {rng.choice(LEVELS)} {course_id}"
+        price = 0 if rng.random() < 0.25 else rng.choice([99000, 199000, 299000, 499000, 999000])
+        yield (course_id, title, f"https://images.example.com/courses/{course_id}.jpg", sentence(rng, 12),
+               sentence(rng, 80), price, rng.randint(1, instructors), sentence(rng, 20))
+
+
+def generate_lectures(rng, courses, total):
+    average = max(1, total // courses)
+    lecture_id = 0
+    for course_id in range(1, courses + 1):
+        count = rng.randint(1, 2 * average - 1)
+        for order in range(1, count + 1):
+            lecture_id += 1
+            yield (lecture_id, course_id, f"Bài {order}: {sentence(rng, 4)}",
+                   f"https://videos.example.com/{course_id}/{order}.mp4", sentence(rng, 25), order)
+
+
+def generate_enrollments(rng, users, courses, total):
+    # Mỗi người đăng ký một dải khoá học liên tiếp bắt đầu từ một khoá "phổ biến" (phân phối Pareto)
+    average = max(1, total // users)
+    for user_id in range(1, users + 1):
+        count = min(courses, rng.randint(1, 2 * average - 1))
+        start = int(rng.paretovariate(1.2) * 10) % courses
+        for course_id in sorted((start + offset) % courses + 1 for offset in range(count)):
+            yield user_id, course_id
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="elearning.sqlite3")
+    parser.add_argument("--courses", type=int, default=100_000)
+    parser.add_argument("--lectures", type=int, default=1_000_000)
+    parser.add_argument("--enrollments", type=int, default=10_000_000)
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--instructors", type=int, default=2_000)
+    parser.add_argument("--scale", type=float, default=1.0, help="nhân tất cả số lượng với hệ số này")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    counts = {name: max(1, int(getattr(args, name) * args.scale))
+              for name in ("users", "instructors", "courses", "lectures", "enrollments")}
+    counts["instructors"] = min(counts["instructors"], counts["users"])
+    if os.path.exists(args.db):
+        raise SystemExit(f"{args.db} đã tồn tại, hãy xoá trước khi sinh lại dữ liệu")
+
+    rng = random.Random(args.seed)
+    cnxn = sqlite_backend.connect(args.db)
+    migrations.migrate(cnxn, "sqlite")
+    raw = cnxn._cnxn
+    raw.execute("PRAGMA synchronous=OFF")
+    cursor = raw.cursor()
+
+    steps = (
+        ("users", "INSERT INTO Users (UserID, Username, Email, Password, Role) VALUES (?, ?, ?, ?, ?)",
+         generate_users(counts["users"], counts["instructors"])),
+        ("courses", "INSERT INTO Courses (CourseID, Title, ImageURL, ShortDescription, FullDescription, Price, "
+                    "InstructorID, InstructorBio) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+         generate_courses(rng, counts["courses"], counts["instructors"])),
+        ("lectures", "INSERT INTO Lectures (LectureID, CourseID, Title, VideoURL, Description, LectureOrder) "
+                     "VALUES (?, ?, ?, ?, ?, ?)",
+         generate_lectures(rng, counts["courses"], counts["lectures"])),
+        ("enrollments", "INSERT INTO Enrollments (UserID, CourseID) VALUES (?, ?)",
+         generate_enrollments(rng, counts["users"], counts["courses"], counts["enrollments"])),
+    )
+    actual = {}
+    for name, sql, rows in steps:
+        started = time.perf_counter()
+        raw.execute("BEGIN")
+        insert_batches(cursor, sql, rows)
+        raw.execute("COMMIT")
+        table = name.capitalize()
+        actual[name] = raw.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        print(json.dumps({"table": table, "rows": actual[name], "seconds": round(time.perf_counter() - started, 1)}))
+    raw.execute("ANALYZE")
+    cnxn.close()
+
+    manifest = {
+        "db": os.path.abspath(args.db),
+        "seed": args.seed,
+        "users": actual["users"],
+        "instructors": counts["instructors"],
+        "courses": actual["courses"],
+        "lectures": actual["lectures"],
+        "enrollments": actual["enrollments"],
+        "password": PASSWORD,
+        "email_format": EMAIL_FORMAT,
+        "search_terms": [topic.lower() for topic in TOPICS],
+    }
+    with open(f"{args.db}.manifest.json", "w") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    print(json.dumps(manifest, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
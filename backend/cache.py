@@ -0,0 +1,118 @@
+import threading
+import time
+from collections import OrderedDict
+
+MISSING = object()
+
+
+class TTLCache:
+    """Cache LRU có giới hạn số phần tử và thời gian sống (TTL).
+
+    Mỗi lần invalidate sẽ tăng `generation`; giá trị được nạp trước thời điểm đó
+    sẽ không được ghi vào cache nữa (tránh ghi đè dữ liệu cũ sau khi đã xoá).
+    Có `flights` (SingleFlight) thì các lần nạp trùng khoá cùng generation chỉ chạy một truy vấn.
+    """
+
+    def __init__(self, maxsize=1024, ttl=60.0, flights=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.flights = flights
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @property
+    def generation(self):
+        return self._generation
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key, MISSING)
+            if item is MISSING:
+                self.misses += 1
+                return MISSING
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return MISSING
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, generation=None):
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, *keys):
+        with self._lock:
+            self._generation += 1
+            for key in keys:
+                if self._data.pop(key, MISSING) is not MISSING:
+                    self.invalidations += 1
+
+    def invalidate_prefix(self, *prefixes):
+        with self._lock:
+            self._generation += 1
+            stale = [key for key in self._data if any(key[:len(p)] == p for p in prefixes)]
+            for key in stale:
+                del self._data[key]
+            self.invalidations += len(stale)
+
+    def invalidate_where(self, predicate):
+        # Xoá các phần tử có predicate(key, value) đúng; trả về số phần tử bị xoá
+        with self._lock:
+            self._generation += 1
+            stale = [key for key, (_, value) in self._data.items() if predicate(key, value)]
+            for key in stale:
+                del self._data[key]
+            self.invalidations += len(stale)
+            return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self.invalidations += len(self._data)
+            self._data.clear()
+
+    async def get_or_load(self, key, loader):
+        value = self.get(key)
+        if value is not MISSING:
+            return value
+        generation = self._generation
+        if self.flights is not None:
+            # Không dùng chung lần nạp bắt đầu trước một lần invalidate
+            value = await self.flights.do((key, generation), loader)
+        else:
+            value = await loader()
+        if value is not None:
+            self.set(key, value, generation)
+        return value
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
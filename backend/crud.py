@@ -0,0 +1,664 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import db_errors
+from models import UserOut, CourseOut, LectureOut, EnrollmentOut
+from serializers import CourseRowSerializer
+
+if TYPE_CHECKING:
+    import pyodbc  # chỉ dùng cho chú thích kiểu; SQLite chạy được khi không có driver ODBC
+
+# Các hàm truy vấn đồng bộ. Luôn được gọi qua `Database.run` (thread pool riêng),
+# không gọi trực tiếp từ endpoint async.
+# Các hàm danh sách khoá học trả về dict (qua CourseRowSerializer) thay vì CourseOut để mã hoá JSON nhanh.
+
+COURSE_COLUMNS = (
+    "c.CourseID, c.Title, c.ImageURL, c.ShortDescription, c.FullDescription, "
+    "c.Price, c.InstructorID, c.InstructorBio"
+)
+# Bỏ các cột văn bản dài (FullDescription, InstructorBio) cho danh sách dạng thẻ
+COURSE_SUMMARY_COLUMNS = "c.CourseID, c.Title, c.ImageURL, c.ShortDescription, c.Price, c.InstructorID"
+
+COURSE_SELECT = """
+    SELECT c.*, u.Username AS InstructorName
+    FROM Courses c
+    JOIN Users u ON c.InstructorID = u.UserID
+"""
+
+
+def lecture_from_row(row):
+    return LectureOut(
+        lecture_id=row.LectureID,
+        course_id=row.CourseID,
+        title=row.Title,
+        video_url=row.VideoURL,
+        description=row.Description,
+        lecture_order=row.LectureOrder
+    )
+
+
+# --- Users ---
+def get_user_by_id(db: pyodbc.Connection, user_id: int):
+    cursor = db.cursor()
+    cursor.execute("SELECT UserID, Username, Email, Role FROM Users WHERE UserID = ?", user_id)
+    user_row = cursor.fetchone()
+    if user_row:
+        return UserOut(
+            user_id=user_row.UserID,
+            username=user_row.Username,
+            email=user_row.Email,
+            role=user_row.Role
+        )
+    return None
+
+
+def user_from_row(row):
+    return UserOut(user_id=row.UserID, username=row.Username, email=row.Email, role=row.Role)
+
+
+def _in_clause(ids):
+    return ", ".join("?" for _ in ids)
+
+
+def get_users_by_ids(db: pyodbc.Connection, user_ids):
+    if not user_ids:
+        return {}
+    cursor = db.cursor()
+    cursor.execute(f"SELECT UserID, Username, Email, Role FROM Users WHERE UserID IN ({_in_clause(user_ids)})", *user_ids)
+    return {row.UserID: user_from_row(row) for row in cursor.fetchall()}
+
+
+def get_user_login_row(db: pyodbc.Connection, email: str):
+    cursor = db.cursor()
+    cursor.execute("SELECT UserID, Username, Email, Password, Role FROM Users WHERE Email = ?", email)
+    return cursor.fetchone()
+
+
+def create_user(db: pyodbc.Connection, username: str, email: str, password: str):
+    cursor = db.cursor()
+    cursor.execute("INSERT INTO Users (Username, Email, Password) VALUES (?, ?, ?)",
+                   username, email, password)
+    db.commit()
+    cursor.execute("SELECT @@IDENTITY AS UserID")
+    new_user_id = cursor.fetchone()[0]
+    return UserOut(user_id=new_user_id, username=username, email=email, role="student")
+
+
+def upgrade_user_to_instructor(db: pyodbc.Connection, user_id: int):
+    cursor = db.cursor()
+    cursor.execute("""
+        UPDATE Users SET Role = 'instructor'
+        OUTPUT INSERTED.UserID, INSERTED.Username, INSERTED.Email, INSERTED.Role
+        WHERE UserID = ?
+    """, user_id)
+    row = cursor.fetchone()
+    db.commit()
+    return user_from_row(row) if row else None
+
+
+# --- Courses ---
+def get_course_by_id(db: pyodbc.Connection, course_id: int):
+    cursor = db.cursor()
+    cursor.execute(COURSE_SELECT + " WHERE c.CourseID = ?", course_id)
+    course_row = cursor.fetchone()
+    if course_row:
+        return CourseOut.from_row(course_row)
+    return None
+
+
+def _course_filters(is_free=None, min_price=None, max_price=None, instructor_id=None):
+    clauses, params = [], []
+    if is_free is True:
+        clauses.append("c.Price = 0")
+    elif is_free is False:
+        clauses.append("c.Price > 0")
+    if min_price is not None:
+        clauses.append("c.Price >= ?")
+        params.append(min_price)
+    if max_price is not None:
+        clauses.append("c.Price <= ?")
+        params.append(max_price)
+    if instructor_id is not None:
+        clauses.append("c.InstructorID = ?")
+        params.append(instructor_id)
+    return clauses, params
+
+
+def _page(cur, limit, cursor_column):
+    # Lấy dư 1 dòng để biết còn trang sau hay không
+    rows = cur.fetchall()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = getattr(rows[-1], cursor_column)
+    return {"items": CourseRowSerializer(cur.description).to_list(rows), "next_cursor": next_cursor}
+
+
+def list_courses(db: pyodbc.Connection, cursor=None, limit=20, summary=False,
+                 is_free=None, min_price=None, max_price=None, instructor_id=None):
+    clauses, params = _course_filters(is_free, min_price, max_price, instructor_id)
+    if cursor is not None:
+        clauses.append("c.CourseID < ?")
+        params.append(cursor)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    columns = COURSE_SUMMARY_COLUMNS if summary else COURSE_COLUMNS
+    cur = db.cursor()
+    cur.execute(f"""
+        SELECT TOP (?) {columns}, u.Username AS InstructorName
+        FROM Courses c
+        JOIN Users u ON c.InstructorID = u.UserID
+        {where}
+        ORDER BY c.CourseID DESC
+    """, limit + 1, *params)
+    return _page(cur, limit, "CourseID")
+
+
+def get_courses_by_ids(db: pyodbc.Connection, course_ids, summary=False):
+    if not course_ids:
+        return {}
+    columns = COURSE_SUMMARY_COLUMNS if summary else COURSE_COLUMNS
+    placeholders = _in_clause(course_ids)
+    cursor = db.cursor()
+    cursor.execute(f"""
+        SELECT {columns}, u.Username AS InstructorName
+        FROM Courses c
+        JOIN Users u ON c.InstructorID = u.UserID
+        WHERE c.CourseID IN ({placeholders})
+    """, *course_ids)
+    return {row.CourseID: CourseOut.from_row(row) for row in cursor.fetchall()}
+
+
+def list_course_search_docs(db: pyodbc.Connection):
+    cursor = db.cursor()
+    cursor.execute("SELECT CourseID, Title, ShortDescription, FullDescription FROM Courses")
+    return cursor.fetchall()
+
+
+def list_featured_courses(db: pyodbc.Connection):
+    # Dự phòng khi chưa có lượt đăng ký nào để xếp hạng: khoá miễn phí + 3 khoá mới nhất
+    cursor = db.cursor()
+    cursor.execute(COURSE_SELECT + """
+        WHERE c.Price = 0 OR c.CourseID IN (SELECT TOP 3 CourseID FROM Courses ORDER BY CourseID DESC)
+        ORDER BY c.CourseID DESC
+    """)
+    return CourseRowSerializer(cursor.description).to_list(cursor.fetchall())
+
+
+def list_courses_by_ids(db: pyodbc.Connection, course_ids, summary=False):
+    # Dict khoá học theo đúng thứ tự course_ids (bỏ id không còn tồn tại)
+    if not course_ids:
+        return []
+    columns = COURSE_SUMMARY_COLUMNS if summary else COURSE_COLUMNS
+    cursor = db.cursor()
+    cursor.execute(f"""
+        SELECT {columns}, u.Username AS InstructorName
+        FROM Courses c
+        JOIN Users u ON c.InstructorID = u.UserID
+        WHERE c.CourseID IN ({_in_clause(course_ids)})
+    """, *course_ids)
+    courses = {course["course_id"]: course for course in CourseRowSerializer(cursor.description).to_list(cursor.fetchall())}
+    return [courses[course_id] for course_id in course_ids if course_id in courses]
+
+
+def list_enrollment_counts(db: pyodbc.Connection):
+    # Chỉ chạy khi dựng lại bảng xếp hạng (khởi động / định kỳ), không chạy theo request
+    cursor = db.cursor()
+    cursor.execute("SELECT CourseID, COUNT(*) AS Enrolled FROM Enrollments GROUP BY CourseID")
+    return [(row.CourseID, row.Enrolled) for row in cursor.fetchall()]
+
+
+def list_recent_enrollments(db: pyodbc.Connection, since):
+    cursor = db.cursor()
+    cursor.execute("SELECT CourseID, EnrollmentDate FROM Enrollments WHERE EnrollmentDate >= ?", since)
+    return [(row.CourseID, row.EnrollmentDate) for row in cursor.fetchall()]
+
+
+def list_enrolled_courses(db: pyodbc.Connection, user_id: int, cursor=None, limit=20, summary=False):
+    # Keyset theo EnrollmentID (tăng dần theo thời điểm đăng ký)
+    params = [user_id]
+    keyset = ""
+    if cursor is not None:
+        keyset = "AND e.EnrollmentID < ?"
+        params.append(cursor)
+    columns = COURSE_SUMMARY_COLUMNS if summary else COURSE_COLUMNS
+    cur = db.cursor()
+    cur.execute(f"""
+        SELECT TOP (?) {columns}, u.Username AS InstructorName, e.EnrollmentID
+        FROM Courses c
+        JOIN Enrollments e ON c.CourseID = e.CourseID
+        JOIN Users u ON c.InstructorID = u.UserID
+        WHERE e.UserID = ? {keyset}
+        ORDER BY e.EnrollmentID DESC
+    """, limit + 1, *params)
+    return _page(cur, limit, "EnrollmentID")
+
+
+def list_created_courses(db: pyodbc.Connection, user_id: int, cursor=None, limit=20, summary=False):
+    return list_courses(db, cursor=cursor, limit=limit, summary=summary, instructor_id=user_id)
+
+
+def create_course(db: pyodbc.Connection, title, image_url, short_description, full_description,
+                  price, instructor_id, instructor_bio, instructor_name=None):
+    # OUTPUT trả về bản ghi vừa chèn; tên giảng viên đã biết từ bước kiểm tra quyền nên không cần JOIN lại
+    cursor = db.cursor()
+    cursor.execute("""
+        INSERT INTO Courses (Title, ImageURL, ShortDescription, FullDescription, Price, InstructorID, InstructorBio)
+        OUTPUT INSERTED.CourseID, INSERTED.Title, INSERTED.ImageURL, INSERTED.ShortDescription,
+               INSERTED.FullDescription, INSERTED.Price, INSERTED.InstructorID, INSERTED.InstructorBio
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """,
+    title,
+    image_url,
+    short_description,
+    full_description,
+    price,
+    instructor_id,
+    instructor_bio
+    )
+    row = cursor.fetchone()
+    db.commit()
+    course = CourseOut.from_row(row)
+    course.instructor_name = instructor_name
+    return course
+
+
+def delete_course(db: pyodbc.Connection, course_id: int):
+    cursor = db.cursor()
+    cursor.execute("DELETE FROM Courses WHERE CourseID = ?", course_id)
+    db.commit()
+
+
+# --- Lectures ---
+def get_lecture_by_id(db: pyodbc.Connection, lecture_id: int):
+    cursor = db.cursor()
+    cursor.execute("SELECT * FROM Lectures WHERE LectureID = ?", lecture_id)
+    lecture_row = cursor.fetchone()
+    if lecture_row:
+        return lecture_from_row(lecture_row)
+    return None
+
+
+def get_lectures_by_ids(db: pyodbc.Connection, lecture_ids):
+    if not lecture_ids:
+        return {}
+    cursor = db.cursor()
+    cursor.execute(f"SELECT * FROM Lectures WHERE LectureID IN ({_in_clause(lecture_ids)})", *lecture_ids)
+    return {row.LectureID: lecture_from_row(row) for row in cursor.fetchall()}
+
+
+def list_lectures_if_course_exists(db: pyodbc.Connection, course_id: int):
+    # Một truy vấn: None nếu khoá học không tồn tại, ngược lại danh sách bài giảng (có thể rỗng)
+    cursor = db.cursor()
+    cursor.execute("""
+        SELECT l.LectureID, c.CourseID, l.Title, l.VideoURL, l.Description, l.LectureOrder
+        FROM Courses c
+        LEFT JOIN Lectures l ON l.CourseID = c.CourseID
+        WHERE c.CourseID = ?
+        ORDER BY l.LectureOrder ASC
+    """, course_id)
+    rows = cursor.fetchall()
+    if not rows:
+        return None
+    return [lecture_from_row(row) for row in rows if row.LectureID is not None]
+
+
+def get_enrollment(db: pyodbc.Connection, user_id: int, course_id: int):
+    cursor = db.cursor()
+    cursor.execute(
+        "SELECT EnrollmentID, UserID, CourseID, EnrollmentDate FROM Enrollments WHERE UserID = ? AND CourseID = ?",
+        user_id, course_id
+    )
+    row = cursor.fetchone()
+    return enrollment_from_row(row) if row else None
+
+
+def get_course_page(db: pyodbc.Connection, course_id: int):
+    # Một truy vấn: khoá học kèm danh sách bài giảng (LEFT JOIN); trạng thái đăng ký theo người xem
+    # không nằm ở đây để phần này dùng chung cache catalog. Trả về (khoá học, bài giảng) hoặc None.
+    cursor = db.cursor()
+    cursor.execute("""
+        SELECT c.*, u.Username AS InstructorName,
+               l.LectureID, l.Title AS LectureTitle, l.VideoURL, l.Description AS LectureDescription, l.LectureOrder
+        FROM Courses c
+        JOIN Users u ON c.InstructorID = u.UserID
+        LEFT JOIN Lectures l ON l.CourseID = c.CourseID
+        WHERE c.CourseID = ?
+        ORDER BY l.LectureOrder ASC
+    """, course_id)
+    rows = cursor.fetchall()
+    if not rows:
+        return None
+    lectures = [
+        LectureOut(
+            lecture_id=row.LectureID,
+            course_id=row.CourseID,
+            title=row.LectureTitle,
+            video_url=row.VideoURL,
+            description=row.LectureDescription,
+            lecture_order=row.LectureOrder
+        )
+        for row in rows if row.LectureID is not None
+    ]
+    return CourseOut.from_row(rows[0]), lectures
+
+
+def list_lectures(db: pyodbc.Connection, course_id: int):
+    cursor = db.cursor()
+    cursor.execute("SELECT * FROM Lectures WHERE CourseID = ? ORDER BY LectureOrder ASC", course_id)
+    return [lecture_from_row(row) for row in cursor.fetchall()]
+
+
+def create_lecture(db: pyodbc.Connection, course_id, title, video_url, description):
+    cursor = db.cursor()
+    cursor.execute("SELECT ISNULL(MAX(LectureOrder), 0) + 1 FROM Lectures WHERE CourseID = ?", course_id)
+    next_order = cursor.fetchone()[0]
+
+    cursor.execute("""
+        INSERT INTO Lectures (CourseID, Title, VideoURL, Description, LectureOrder)
+        VALUES (?, ?, ?, ?, ?)
+    """,
+    course_id,
+    title,
+    video_url,
+    description,
+    next_order
+    )
+    db.commit()
+
+    cursor.execute("SELECT @@IDENTITY AS LectureID")
+    new_lecture_id = cursor.fetchone()[0]
+
+    return LectureOut(
+        lecture_id=new_lecture_id,
+        course_id=course_id,
+        title=title,
+        video_url=video_url,
+        description=description,
+        lecture_order=next_order
+    )
+
+
+def delete_lecture(db: pyodbc.Connection, lecture_id: int):
+    cursor = db.cursor()
+    cursor.execute("DELETE FROM Lectures WHERE LectureID = ?", lecture_id)
+    db.commit()
+
+
+# --- Enrollments ---
+class EnrollmentError(Exception):
+    # reason: "user_not_found" | "course_not_found" | "already_enrolled"
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+
+
+# Ràng buộc khoá ngoại của Enrollments (tên theo migration 5) -> lý do lỗi
+ENROLLMENT_FOREIGN_KEYS = {
+    db_errors.foreign_key_name("Enrollments", "Users"): "user_not_found",
+    db_errors.foreign_key_name("Enrollments", "Courses"): "course_not_found",
+}
+
+
+def classify_enrollment_error(ex: db_errors.IntegrityError):
+    message = str(ex)
+    for constraint, reason in ENROLLMENT_FOREIGN_KEYS.items():
+        if f'"{constraint}"' in message:
+            return reason
+    if "FOREIGN KEY" in message:
+        # Ràng buộc chưa được đặt tên: SQL Server vẫn ghi bảng cha trong thông báo
+        return "user_not_found" if '"dbo.Users"' in message else "course_not_found"
+    return "already_enrolled"
+
+
+def enrollment_from_row(row):
+    return EnrollmentOut(
+        enrollment_id=row.EnrollmentID,
+        user_id=row.UserID,
+        course_id=row.CourseID,
+        enrollment_date=row.EnrollmentDate.isoformat()
+    )
+
+
+def create_enrollment(db: pyodbc.Connection, user_id: int, course_id: int):
+    # Một câu lệnh duy nhất: khoá ngoại kiểm tra User/Course, OUTPUT trả về bản ghi vừa chèn
+    cursor = db.cursor()
+    try:
+        cursor.execute("""
+            INSERT INTO Enrollments (UserID, CourseID)
+            OUTPUT INSERTED.EnrollmentID, INSERTED.UserID, INSERTED.CourseID, INSERTED.EnrollmentDate
+            VALUES (?, ?)
+        """, user_id, course_id)
+        row = cursor.fetchone()
+        db.commit()
+    except db_errors.IntegrityError as ex:
+        raise EnrollmentError(classify_enrollment_error(ex))
+    return enrollment_from_row(row)
+
+
+def bulk_create_enrollments(db: pyodbc.Connection, pairs):
+    """Đăng ký hàng loạt các cặp (user_id, course_id).
+
+    Nạp toàn bộ vào bảng tạm bằng fast_executemany rồi phân loại và chèn bằng hai câu lệnh
+    tập hợp. Trả về {(user_id, course_id): EnrollmentOut | lý do lỗi}.
+    """
+    pairs = list(pairs)
+    if not pairs:
+        return {}  # pyodbc: executemany với fast_executemany không nhận danh sách rỗng
+    cursor = db.cursor()
+    autocommit = db.autocommit
+    db.autocommit = False
+    try:
+        cursor.execute("CREATE TABLE #BulkEnroll (UserID INT NOT NULL, CourseID INT NOT NULL, PRIMARY KEY (UserID, CourseID))")
+        cursor.fast_executemany = True
+        cursor.executemany("INSERT INTO #BulkEnroll (UserID, CourseID) VALUES (?, ?)", pairs)
+        cursor.fast_executemany = False
+
+        cursor.execute("""
+            SELECT b.UserID, b.CourseID,
+                   CASE WHEN u.UserID IS NULL THEN 'user_not_found'
+                        WHEN c.CourseID IS NULL THEN 'course_not_found'
+                        ELSE 'already_enrolled' END AS Reason
+            FROM #BulkEnroll b
+            LEFT JOIN Users u ON u.UserID = b.UserID
+            LEFT JOIN Courses c ON c.CourseID = b.CourseID
+            LEFT JOIN Enrollments e WITH (UPDLOCK, HOLDLOCK) ON e.UserID = b.UserID AND e.CourseID = b.CourseID
+            WHERE u.UserID IS NULL OR c.CourseID IS NULL OR e.EnrollmentID IS NOT NULL
+        """)
+        results = {(row.UserID, row.CourseID): row.Reason for row in cursor.fetchall()}
+
+        cursor.execute("""
+            INSERT INTO Enrollments (UserID, CourseID)
+            OUTPUT INSERTED.EnrollmentID, INSERTED.UserID, INSERTED.CourseID, INSERTED.EnrollmentDate
+            SELECT b.UserID, b.CourseID
+            FROM #BulkEnroll b
+            JOIN Users u ON u.UserID = b.UserID
+            JOIN Courses c ON c.CourseID = b.CourseID
+            WHERE NOT EXISTS (
+                SELECT 1 FROM Enrollments e WITH (UPDLOCK, HOLDLOCK)
+                WHERE e.UserID = b.UserID AND e.CourseID = b.CourseID
+            )
+        """)
+        for row in cursor.fetchall():
+            results[(row.UserID, row.CourseID)] = enrollment_from_row(row)
+        db.commit()
+        return results
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        cursor.execute("IF OBJECT_ID('tempdb..#BulkEnroll') IS NOT NULL DROP TABLE #BulkEnroll")
+        db.autocommit = autocommit
+
+
+# --- Media blobs (lưu file theo nội dung, đếm tham chiếu) ---
+def acquire_media_blob(db: pyodbc.Connection, digest: str, url: str, size: int):
+    # Trả về (url đang lưu cho digest này, True nếu vừa tạo bản ghi mới)
+    cursor = db.cursor()
+    for _ in range(2):
+        cursor.execute("UPDATE MediaBlobs SET RefCount = RefCount + 1 OUTPUT INSERTED.Url WHERE Digest = ?", digest)
+        row = cursor.fetchone()
+        if row:
+            db.commit()
+            return row.Url, False
+        try:
+            cursor.execute("INSERT INTO MediaBlobs (Digest, Url, SizeBytes, RefCount) VALUES (?, ?, ?, 1)",
+                           digest, url, size)
+            db.commit()
+            return url, True
+        except db_errors.IntegrityError:
+            continue  # upload song song cùng nội dung vừa chèn trước -> tăng RefCount
+    raise RuntimeError(f"Could not acquire media blob {digest}")
+
+
+def acquire_media_url(db: pyodbc.Connection, url: str) -> bool:
+    # Thêm một tham chiếu tới file đã có trong kho (URL /uploads client gửi lại); False nếu kho không quản lý URL này
+    cursor = db.cursor()
+    cursor.execute("UPDATE MediaBlobs SET RefCount = RefCount + 1 WHERE Url = ? AND RefCount > 0", url)
+    acquired = cursor.rowcount > 0
+    db.commit()
+    return acquired
+
+
+def release_media_blob(db: pyodbc.Connection, url: str, remove_file=None):
+    """Giảm tham chiếu; trả về True nếu file không còn ai dùng (hoặc là file cũ chưa được quản lý).
+
+    `remove_file()` được gọi trước khi commit, trong cùng giao dịch với DELETE: upload song song cùng
+    nội dung phải chờ khoá dòng tới khi file đã bị xoá, rồi mới tạo lại bản ghi và ghi lại file.
+    """
+    cursor = db.cursor()
+    autocommit = db.autocommit
+    db.autocommit = False
+    try:
+        cursor.execute("UPDATE MediaBlobs SET RefCount = RefCount - 1 OUTPUT INSERTED.RefCount WHERE Url = ? AND RefCount > 0", url)
+        row = cursor.fetchone()
+        if row is None:
+            cursor.execute("SELECT COUNT(*) FROM MediaBlobs WITH (UPDLOCK, HOLDLOCK) WHERE Url = ?", url)
+            released = cursor.fetchone()[0] == 0
+        elif row.RefCount > 0:
+            released = False
+        else:
+            cursor.execute("DELETE FROM MediaBlobs WHERE Url = ? AND RefCount = 0", url)
+            released = cursor.rowcount > 0
+        if released and remove_file is not None:
+            remove_file()
+        db.commit()
+        return released
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.autocommit = autocommit
+
+
+def list_media_blobs(db: pyodbc.Connection):
+    cursor = db.cursor()
+    cursor.execute("SELECT Digest, Url, SizeBytes, RefCount FROM MediaBlobs")
+    return cursor.fetchall()
+
+
+def count_media_references(db: pyodbc.Connection):
+    # Số lần mỗi URL file upload đang được Courses / Lectures tham chiếu
+    cursor = db.cursor()
+    cursor.execute("""
+        SELECT Url, COUNT(*) AS Refs FROM (
+            SELECT ImageURL AS Url FROM Courses WHERE ImageURL LIKE '/uploads/%'
+            UNION ALL
+            SELECT VideoURL AS Url FROM Lectures WHERE VideoURL LIKE '/uploads/%'
+        ) refs
+        GROUP BY Url
+    """)
+    return {row.Url: row.Refs for row in cursor.fetchall()}
+
+
+def set_media_blob_refcount(db: pyodbc.Connection, digest: str, stored: int, ref_count: int, remove_file=None):
+    # Sửa RefCount nếu nó vẫn bằng giá trị đã đọc (`stored`); về 0 thì xoá bản ghi và gọi remove_file()
+    # trong cùng giao dịch như release_media_blob. Trả về False nếu RefCount đã đổi từ lúc đọc.
+    cursor = db.cursor()
+    autocommit = db.autocommit
+    db.autocommit = False
+    try:
+        if ref_count > 0:
+            cursor.execute("UPDATE MediaBlobs SET RefCount = ? WHERE Digest = ? AND RefCount = ?", ref_count, digest, stored)
+        else:
+            cursor.execute("DELETE FROM MediaBlobs WHERE Digest = ? AND RefCount = ?", digest, stored)
+        updated = cursor.rowcount > 0
+        if updated and ref_count == 0 and remove_file is not None:
+            remove_file()
+        db.commit()
+        return updated
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.autocommit = autocommit
+
+
+# --- Tiến độ học (ghi theo lô từ progress.ProgressBuffer) ---
+def upsert_lecture_progress(db: pyodbc.Connection, rows):
+    """Ghi một lô (user_id, lecture_id, course_id, position, duration, completed, updated_at).
+
+    Nạp vào bảng tạm rồi cập nhật + chèn bằng hai câu lệnh tập hợp trong một giao dịch. Dòng cũ
+    hơn dữ liệu đang lưu (worker khác đã ghi sau) không ghi đè vị trí; Completed chỉ bật.
+    Bài giảng đã bị xoá được bỏ qua.
+    """
+    cursor = db.cursor()
+    autocommit = db.autocommit
+    db.autocommit = False
+    try:
+        cursor.execute("""
+            CREATE TABLE #ProgressBatch (
+                UserID INT NOT NULL, LectureID INT NOT NULL, CourseID INT NOT NULL,
+                PositionSeconds FLOAT NOT NULL, DurationSeconds FLOAT NULL, Completed BIT NOT NULL,
+                UpdatedAt DATETIME2 NOT NULL, PRIMARY KEY (UserID, LectureID)
+            )
+        """)
+        cursor.fast_executemany = True
+        cursor.executemany("""
+            INSERT INTO #ProgressBatch (UserID, LectureID, CourseID, PositionSeconds, DurationSeconds, Completed, UpdatedAt)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, list(rows))
+        cursor.fast_executemany = False
+
+        cursor.execute("""
+            UPDATE LectureProgress
+            SET PositionSeconds = CASE WHEN s.UpdatedAt >= LectureProgress.UpdatedAt
+                                       THEN s.PositionSeconds ELSE LectureProgress.PositionSeconds END,
+                DurationSeconds = ISNULL(s.DurationSeconds, LectureProgress.DurationSeconds),
+                Completed = CASE WHEN s.Completed = 1 OR LectureProgress.Completed = 1 THEN 1 ELSE 0 END,
+                UpdatedAt = CASE WHEN s.UpdatedAt >= LectureProgress.UpdatedAt
+                                 THEN s.UpdatedAt ELSE LectureProgress.UpdatedAt END
+            FROM #ProgressBatch s
+            WHERE LectureProgress.UserID = s.UserID AND LectureProgress.LectureID = s.LectureID
+        """)
+        cursor.execute("""
+            INSERT INTO LectureProgress (UserID, LectureID, CourseID, PositionSeconds, DurationSeconds, Completed, UpdatedAt)
+            SELECT s.UserID, s.LectureID, s.CourseID, s.PositionSeconds, s.DurationSeconds, s.Completed, s.UpdatedAt
+            FROM #ProgressBatch s
+            JOIN Lectures l ON l.LectureID = s.LectureID
+            WHERE NOT EXISTS (
+                SELECT 1 FROM LectureProgress p WITH (UPDLOCK, HOLDLOCK)
+                WHERE p.UserID = s.UserID AND p.LectureID = s.LectureID
+            )
+        """)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        cursor.execute("IF OBJECT_ID('tempdb..#ProgressBatch') IS NOT NULL DROP TABLE #ProgressBatch")
+        db.autocommit = autocommit
+
+
+def list_course_progress(db: pyodbc.Connection, user_id: int, course_id: int):
+    # {lecture_id: (position, duration, completed, updated_at)} của một người dùng trong một khoá học
+    cursor = db.cursor()
+    cursor.execute("""
+        SELECT LectureID, PositionSeconds, DurationSeconds, Completed, UpdatedAt
+        FROM LectureProgress
+        WHERE UserID = ? AND CourseID = ?
+    """, user_id, course_id)
+    return {
+        row.LectureID: (row.PositionSeconds, row.DurationSeconds, bool(row.Completed), row.UpdatedAt)
+        for row in cursor.fetchall()
+    }
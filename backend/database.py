@@ -0,0 +1,322 @@
+import asyncio
+import functools
+import itertools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException
+
+import db_errors
+from db_pool import ConnectionPool, PoolTimeout
+
+# Cấu hình kết nối Database (giữ nguyên)
+DB_CONFIG = {
+    "DRIVER": "{ODBC Driver 17 for SQL Server}",
+    "SERVER": "DESKTOP-S730D0D\SQLEXPRESS01",
+    "DATABASE": "ELearningDB",
+    "UID": "sa",
+    "PWD": "123"
+}
+
+def conn_str(server: str) -> str:
+    return (
+        f"DRIVER={DB_CONFIG['DRIVER']};"
+        f"SERVER={server};"
+        f"DATABASE={DB_CONFIG['DATABASE']};"
+        f"UID={DB_CONFIG['UID']};"
+        f"PWD={DB_CONFIG['PWD']}"
+    )
+
+DB_CONN_STR = conn_str(DB_CONFIG["SERVER"])
+
+# Cấu hình connection pool
+POOL_CONFIG = {
+    "max_size": 20,
+    "checkout_timeout": 5.0,   # giây chờ tối đa khi pool đã cạn
+    "max_age": 1800.0,         # tái tạo kết nối sau 30 phút
+    "max_idle": 300.0,         # đóng kết nối nhàn rỗi quá 5 phút
+    "ping_interval": 5.0,      # kiểm tra "SELECT 1" nếu kết nối nhàn rỗi lâu hơn
+}
+
+# Backend lưu trữ: "mssql" (mặc định) hoặc "sqlite" (chạy local / benchmark, xem benchmarks/seed_sqlite.py)
+DB_BACKEND = os.environ.get("DB_BACKEND", "mssql")
+SQLITE_PATH = os.environ.get("SQLITE_PATH", "elearning.sqlite3")
+
+# Replica chỉ đọc cho các endpoint GET, phân tách bằng dấu phẩy:
+#   DB_REPLICA_SERVERS="srv-read1,srv-read2"  (SQL Server, cùng DATABASE/UID/PWD với primary)
+#   SQLITE_REPLICA_PATHS="r1.sqlite3,r2.sqlite3"  (khi DB_BACKEND=sqlite, để thử failover ở local)
+REPLICA_ENV = "SQLITE_REPLICA_PATHS" if DB_BACKEND == "sqlite" else "DB_REPLICA_SERVERS"
+DB_REPLICAS = [target.strip() for target in os.environ.get(REPLICA_ENV, "").split(",") if target.strip()]
+
+REPLICA_POOL_CONFIG = dict(POOL_CONFIG, max_size=10)
+
+READ_ROUTING_CONFIG = {
+    "sticky_seconds": 5.0,       # sau khi ghi, đọc liên quan đi primary (lớn hơn độ trễ replication)
+    "eject_seconds": 10.0,       # replica lỗi kết nối bị loại, hết hạn thì thử lại
+    "max_eject_seconds": 120.0,  # lỗi liên tiếp -> thời gian loại nhân đôi, tối đa bấy nhiêu
+}
+
+
+def connect(target=None):
+    # target: server (SQL Server) hoặc đường dẫn file (SQLite) của replica; None = primary
+    if DB_BACKEND == "sqlite":
+        import sqlite_backend
+        return sqlite_backend.connect(target or SQLITE_PATH)
+    import pyodbc  # chỉ cần driver ODBC khi dùng SQL Server
+    return pyodbc.connect(DB_CONN_STR if target is None else conn_str(target), autocommit=True)
+
+
+db_pool = ConnectionPool(connect, **POOL_CONFIG)
+
+# Số luồng dành riêng cho pyodbc: bằng kích thước pool để mỗi luồng luôn có kết nối
+DB_EXECUTOR_WORKERS = POOL_CONFIG["max_size"]
+
+
+class TracedCursor:
+    """Bọc cursor pyodbc: đo thời gian mỗi execute/executemany và báo cho `on_query(sql, giây, lỗi)`."""
+
+    def __init__(self, cursor, on_query):
+        object.__setattr__(self, "_cursor", cursor)
+        object.__setattr__(self, "_on_query", on_query)
+
+    def _timed(self, method, sql, params):
+        started = time.perf_counter()
+        error = None
+        try:
+            method(sql, *params)
+        except Exception as ex:
+            error = ex
+            raise
+        finally:
+            self._on_query(sql, time.perf_counter() - started, error)
+        return self
+
+    def execute(self, sql, *params):
+        return self._timed(self._cursor.execute, sql, params)
+
+    def executemany(self, sql, *params):
+        return self._timed(self._cursor.executemany, sql, params)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._cursor, name, value)  # ví dụ cursor.fast_executemany
+
+
+class TracedConnection:
+    def __init__(self, cnxn, on_query):
+        object.__setattr__(self, "_cnxn", cnxn)
+        object.__setattr__(self, "_on_query", on_query)
+
+    def cursor(self):
+        return TracedCursor(self._cnxn.cursor(), self._on_query)
+
+    def execute(self, sql, *params):
+        return self.cursor().execute(sql, *params)
+
+    def __getattr__(self, name):
+        return getattr(self._cnxn, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._cnxn, name, value)  # ví dụ cnxn.autocommit
+
+
+class Database:
+    """Chạy các hàm truy vấn đồng bộ (pyodbc) trên thread pool riêng, không chặn event loop.
+
+    Mỗi lời gọi `run(fn, *args)` mượn một kết nối từ pool, gọi `fn(cnxn, *args)`
+    trong luồng worker rồi trả kết nối về pool. Nếu có `on_query`, kết nối được bọc
+    TracedConnection để đo thời gian từng câu SQL.
+    """
+
+    def __init__(self, pool, max_workers, on_query=None):
+        self.pool = pool
+        self.max_workers = max_workers
+        self.on_query = on_query
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="db")
+
+    def _call(self, fn, args, kwargs):
+        with self.pool.connection() as cnxn:
+            if self.on_query is not None:
+                cnxn = TracedConnection(cnxn, self.on_query)
+            return fn(cnxn, *args, **kwargs)
+
+    async def _submit(self, fn, args, kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(self._call, fn, args, kwargs))
+
+    async def run(self, fn, *args, **kwargs):
+        try:
+            return await self._submit(fn, args, kwargs)
+        except PoolTimeout as ex:
+            raise HTTPException(status_code=503, detail=f"Database busy: {ex}")
+        except db_errors.Error as ex:
+            if ex.args and ex.args[0] == '28000':
+                raise HTTPException(status_code=500, detail="Database connection failed: Invalid credentials.")
+            raise
+
+    def stats(self):
+        stats = self.pool.stats()
+        stats["executor_workers"] = self.max_workers
+        stats["executor_queued"] = self.executor._work_queue.qsize()
+        return stats
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        self.pool.close()
+
+
+database = Database(db_pool, DB_EXECUTOR_WORKERS)
+
+
+def is_unavailable(ex: BaseException) -> bool:
+    """Lỗi do máy chủ không dùng được (mất kết nối, hết pool), khác với lỗi dữ liệu / câu SQL."""
+    if isinstance(ex, (PoolTimeout, db_errors.OperationalError, db_errors.InterfaceError)):
+        return True
+    # SQLSTATE lớp 08: lỗi kết nối
+    return isinstance(ex, db_errors.Error) and bool(ex.args) and str(ex.args[0]).startswith("08")
+
+
+class Replica:
+    def __init__(self, name, database):
+        self.name = name
+        self.database = database
+        self.ejected_until = 0.0
+        self.failures = 0     # số lần lỗi liên tiếp
+        self.ejections = 0
+        self.reads = 0
+        self.last_error = None
+
+
+class ReadView:
+    """Giao diện `run(fn, ...)` như Database, nhưng đọc qua ReadRouter với các khoá stickiness của request."""
+
+    def __init__(self, router, keys):
+        self.router = router
+        self.keys = keys
+
+    async def run(self, fn, *args, **kwargs):
+        return await self.router.run(self.keys, fn, *args, **kwargs)
+
+
+class ReadRouter:
+    """Chia truy vấn đọc cho các replica theo vòng tròn; ghi và mọi thứ khác vẫn đi primary.
+
+    - Replica lỗi kết nối bị loại `eject_seconds` (nhân đôi khi lỗi liên tiếp), request đó thử replica
+      kế tiếp rồi mới về primary.
+    - `mark_write(*keys)` sau mỗi thay đổi: trong `sticky_seconds`, các lần đọc mang một trong các khoá đó
+      (ví dụ ("user", id), "catalog") đi primary để người vừa ghi thấy ngay dữ liệu của mình.
+    """
+
+    def __init__(self, primary, replicas, sticky_seconds=5.0, eject_seconds=10.0, max_eject_seconds=120.0,
+                 logger=None):
+        self.primary = primary
+        self.replicas = list(replicas)
+        self.sticky_seconds = sticky_seconds
+        self.eject_seconds = eject_seconds
+        self.max_eject_seconds = max_eject_seconds
+        self.logger = logger
+        self._next = itertools.count()
+        self._sticky = {}  # khoá -> hạn (time.monotonic)
+
+        self.primary_reads = 0
+        self.sticky_reads = 0
+        self.fallbacks = 0
+
+    def reader(self, keys=()):
+        return ReadView(self, tuple(keys))
+
+    def mark_write(self, *keys):
+        now = time.monotonic()
+        if len(self._sticky) > 10000:
+            self._sticky = {key: until for key, until in self._sticky.items() if until > now}
+        until = now + self.sticky_seconds
+        for key in keys:
+            self._sticky[key] = until
+
+    def is_sticky(self, keys):
+        now = time.monotonic()
+        return any(self._sticky.get(key, 0.0) > now for key in keys)
+
+    def _eject(self, replica, ex):
+        replica.failures += 1
+        replica.ejections += 1
+        replica.last_error = str(ex)
+        duration = min(self.eject_seconds * 2 ** (replica.failures - 1), self.max_eject_seconds)
+        replica.ejected_until = time.monotonic() + duration
+        if self.logger is not None:
+            self.logger.warning("replica_ejected", replica=replica.name, seconds=duration, error=str(ex))
+
+    async def run(self, keys, fn, *args, **kwargs):
+        if self.replicas:
+            if self.is_sticky(keys):
+                self.sticky_reads += 1
+            else:
+                start = next(self._next)
+                for offset in range(len(self.replicas)):
+                    replica = self.replicas[(start + offset) % len(self.replicas)]
+                    if replica.ejected_until > time.monotonic():
+                        continue
+                    try:
+                        result = await replica.database._submit(fn, args, kwargs)
+                    except Exception as ex:
+                        if not is_unavailable(ex):
+                            raise
+                        self._eject(replica, ex)
+                        continue
+                    replica.failures = 0
+                    replica.reads += 1
+                    return result
+                self.fallbacks += 1
+        self.primary_reads += 1
+        return await self.primary.run(fn, *args, **kwargs)
+
+    def healthy(self):
+        now = time.monotonic()
+        return sum(1 for replica in self.replicas if replica.ejected_until <= now)
+
+    def stats(self):
+        now = time.monotonic()
+        return {
+            "replicas": [
+                {
+                    "name": replica.name,
+                    "healthy": replica.ejected_until <= now,
+                    "ejected_for_seconds": round(max(0.0, replica.ejected_until - now), 1),
+                    "reads": replica.reads,
+                    "ejections": replica.ejections,
+                    "last_error": replica.last_error,
+                    "pool": replica.database.stats(),
+                }
+                for replica in self.replicas
+            ],
+            "primary_reads": self.primary_reads,
+            "sticky_reads": self.sticky_reads,
+            "fallbacks": self.fallbacks,
+            "sticky_keys": sum(1 for until in self._sticky.values() if until > now),
+        }
+
+    def close(self):
+        for replica in self.replicas:
+            replica.database.close()
+
+
+read_router = ReadRouter(
+    database,
+    [
+        Replica(target, Database(ConnectionPool(functools.partial(connect, target), **REPLICA_POOL_CONFIG),
+                                 REPLICA_POOL_CONFIG["max_size"]))
+        for target in DB_REPLICAS
+    ],
+    **READ_ROUTING_CONFIG,
+)
+
+
+# Dependency trả về lớp truy cập dữ liệu dùng chung
+def get_db():
+    return database
@@ -0,0 +1,30 @@
+try:
+    import pyodbc
+except ImportError:  # chạy SQLite không cần driver ODBC / unixODBC (libodbc.so.2)
+    pyodbc = None
+
+# Lỗi DB dùng chung cho mọi backend: crud.py / database.py chỉ bắt các lớp này.
+# Có pyodbc thì chính là các lớp lỗi của pyodbc (lỗi SQL Server đi thẳng, không cần đổi);
+# sqlite_backend ánh xạ lỗi sqlite3 sang cùng các lớp, với args = (SQLSTATE, thông báo) như pyodbc.
+if pyodbc is not None:
+    Error = pyodbc.Error
+    IntegrityError = pyodbc.IntegrityError
+    OperationalError = pyodbc.OperationalError
+    InterfaceError = pyodbc.InterfaceError
+else:
+    class Error(Exception):
+        pass
+
+    class IntegrityError(Error):
+        pass
+
+    class OperationalError(Error):
+        pass
+
+    class InterfaceError(Error):
+        pass
+
+
+def foreign_key_name(table: str, referenced_table: str) -> str:
+    # Quy ước tên ràng buộc khoá ngoại (migration 5): lỗi vi phạm được phân loại theo tên này
+    return f"FK_{table}_{referenced_table}"
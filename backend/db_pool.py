@@ -0,0 +1,194 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class _PooledConnection:
+    __slots__ = ("raw", "created_at", "last_used")
+
+    def __init__(self, raw):
+        now = time.monotonic()
+        self.raw = raw
+        self.created_at = now
+        self.last_used = now
+
+
+class ConnectionPool:
+    """Pool kết nối có giới hạn, không phụ thuộc driver.
+
+    `connect` là một callable trả về kết nối DB-API mới (pyodbc, sqlite3, stub...).
+    """
+
+    def __init__(
+        self,
+        connect,
+        max_size=10,
+        checkout_timeout=5.0,
+        max_age=1800.0,
+        max_idle=300.0,
+        ping_interval=5.0,
+        validate_query="SELECT 1",
+    ):
+        self._connect = connect
+        self.max_size = max_size
+        self.checkout_timeout = checkout_timeout
+        self.max_age = max_age
+        self.max_idle = max_idle
+        self.ping_interval = ping_interval
+        self.validate_query = validate_query
+
+        self._cond = threading.Condition()
+        self._idle = deque()
+        self._in_use = {}
+        self._size = 0
+        self._waiting = 0
+        self._closed = False
+
+        self._checkouts = 0
+        self._created = 0
+        self._discarded = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    # --- Checkout / checkin ---
+    def acquire(self, timeout=None):
+        if timeout is None:
+            timeout = self.checkout_timeout
+        started = time.monotonic()
+        deadline = started + timeout
+
+        while True:
+            entry = None
+            must_create = False
+            with self._cond:
+                if self._closed:
+                    raise PoolTimeout("Connection pool is closed.")
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeout(
+                            f"Timed out after {timeout:.1f}s waiting for a database connection "
+                            f"(pool size {self.max_size})."
+                        )
+                    self._waiting += 1
+                    try:
+                        self._cond.wait(remaining)
+                    finally:
+                        self._waiting -= 1
+                if self._idle:
+                    # LIFO: kết nối dùng gần nhất ít có khả năng bị server đóng nhất
+                    entry = self._idle.pop()
+                else:
+                    self._size += 1
+                    must_create = True
+
+            if must_create:
+                try:
+                    entry = _PooledConnection(self._connect())
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self._created += 1
+            elif not self._is_usable(entry):
+                self._dispose(entry)
+                continue
+
+            waited = time.monotonic() - started
+            with self._cond:
+                self._in_use[id(entry.raw)] = entry
+                self._checkouts += 1
+                self._wait_total += waited
+                if waited > self._wait_max:
+                    self._wait_max = waited
+            return entry.raw
+
+    def release(self, raw, discard=False):
+        with self._cond:
+            entry = self._in_use.pop(id(raw), None)
+        if entry is None:
+            return
+        now = time.monotonic()
+        if discard or self._closed or now - entry.created_at > self.max_age:
+            self._dispose(entry)
+            return
+        entry.last_used = now
+        with self._cond:
+            self._idle.append(entry)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        raw = self.acquire(timeout)
+        discard = False
+        try:
+            yield raw
+        except Exception:
+            discard = not self._ping(raw)
+            raise
+        finally:
+            self.release(raw, discard=discard)
+
+    # --- Health checks ---
+    def _is_usable(self, entry):
+        now = time.monotonic()
+        if now - entry.created_at > self.max_age or now - entry.last_used > self.max_idle:
+            return False
+        if now - entry.last_used < self.ping_interval:
+            return True
+        return self._ping(entry.raw)
+
+    def _ping(self, raw):
+        try:
+            cursor = raw.cursor()
+            cursor.execute(self.validate_query)
+            cursor.fetchall()
+            cursor.close()
+            return True
+        except Exception:
+            return False
+
+    def _dispose(self, entry):
+        try:
+            entry.raw.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._size -= 1
+            self._discarded += 1
+            self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._cond.notify_all()
+        for entry in idle:
+            self._dispose(entry)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "max_size": self.max_size,
+                "size": self._size,
+                "in_use": len(self._in_use),
+                "idle": len(self._idle),
+                "waiting": self._waiting,
+                "checkouts": self._checkouts,
+                "created": self._created,
+                "discarded": self._discarded,
+                "timeouts": self._timeouts,
+                "wait_time_total_ms": round(self._wait_total * 1000, 3),
+                "wait_time_avg_ms": round(self._wait_total * 1000 / self._checkouts, 3) if self._checkouts else 0.0,
+                "wait_time_max_ms": round(self._wait_max * 1000, 3),
+            }
@@ -0,0 +1,192 @@
+import asyncio
+import gzip
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from email.utils import formatdate
+
+from starlette.responses import Response
+
+from media import etag_matches
+
+try:
+    import brotli
+except ImportError:  # brotli là tuỳ chọn: không có thì chỉ nén gzip
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("application/json", "text/")
+ENCODING_SUFFIXES = {"br": "-br", "gzip": "-gz"}
+
+
+class CatalogVersion:
+    """Phiên bản danh mục khoá học, tăng mỗi khi course / lecture thay đổi.
+
+    ETag = token tiến trình + phiên bản + khung thời gian `max_age`: worker khác có thể đã ghi
+    mà worker này không biết, nên ETag cũng không sống lâu hơn TTL của cache catalog.
+    """
+
+    def __init__(self, max_age: float):
+        self.max_age = max_age
+        self._token = uuid.uuid4().hex[:8]
+        self._lock = threading.Lock()
+        self.version = 0
+        self.modified_at = time.time()
+
+    def bump(self):
+        with self._lock:
+            self.version += 1
+            self.modified_at = time.time()
+
+    def etag(self) -> str:
+        epoch = int(time.time() // self.max_age) if self.max_age else 0
+        return f'"{self._token}-{self.version}-{epoch}"'
+
+    def last_modified(self) -> str:
+        return formatdate(self.modified_at, usegmt=True)
+
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    # ETag mạnh phải khác nhau giữa bản nén và bản gốc
+    return etag[:-1] + ENCODING_SUFFIXES[encoding] + '"' if encoding else etag
+
+
+def negotiate_encoding(accept_encoding: str):
+    accepted = {part.split(";")[0].strip().lower() for part in (accept_encoding or "").split(",")}
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, encoding: str, gzip_level: int, brotli_quality: int) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=brotli_quality)
+    return gzip.compress(body, compresslevel=gzip_level)
+
+
+class HTTPCacheMiddleware:
+    """Header cache theo route, ETag từ CatalogVersion (304 không cần chạm DB) và nén gzip/brotli.
+
+    `policies` là danh sách (regex đường dẫn, {"cache_control": ..., "etag": bool}); luật đầu tiên khớp được dùng.
+    Route không khớp luật nào (ví dụ /media, /uploads) được trả nguyên vẹn.
+    Bản nén của route có ETag được giữ theo (ETag, URL, encoding): cùng phiên bản danh mục thì trả lại
+    ngay, không chạy handler và không nén lại. Body lớn từ `offload_size` byte được nén trên thread.
+    """
+
+    def __init__(self, version: CatalogVersion, policies, min_size: int = 1024, gzip_level: int = 6,
+                 brotli_quality: int = 4, cache_size: int = 256, offload_size: int = 64 * 1024):
+        self.version = version
+        self.policies = [(re.compile(pattern), policy) for pattern, policy in policies]
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.cache_size = cache_size
+        self.offload_size = offload_size
+        self._compressed_bodies = OrderedDict()  # (etag, url, encoding) -> (headers, body đã nén)
+        self.not_modified = 0
+        self.compressed = 0
+        self.compressed_hits = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def policy_for(self, path: str):
+        for pattern, policy in self.policies:
+            if pattern.match(path):
+                return policy
+        return None
+
+    async def __call__(self, request, call_next):
+        policy = self.policy_for(request.url.path)
+        if policy is None or request.method != "GET":
+            return await call_next(request)
+
+        use_etag = policy.get("etag", False)
+        etag = self.version.etag() if use_etag else None
+        if etag is not None:
+            if_none_match = request.headers.get("if-none-match")
+            if any(etag_matches(if_none_match, encoded_etag(etag, enc)) for enc in (None, "gzip", "br")):
+                self.not_modified += 1
+                return Response(status_code=304, headers=self._headers(policy, etag, None))
+
+        encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+        cache_key = (etag, str(request.url), encoding) if etag is not None and encoding is not None else None
+        cached = self._compressed_bodies.get(cache_key) if cache_key is not None else None
+        if cached is not None:
+            self._compressed_bodies.move_to_end(cache_key)
+            self.compressed_hits += 1
+            headers, body = cached
+            return Response(content=body, status_code=200, headers=headers)
+
+        response = await call_next(request)
+        if response.status_code != 200:
+            return response
+
+        # Danh mục bị sửa trong lúc xử lý: nội dung có thể mới hơn ETag đã đọc -> không gắn ETag
+        if etag is not None and etag != self.version.etag():
+            etag = None
+
+        content_type = response.headers.get("content-type", "")
+        if "content-encoding" in response.headers or not content_type.startswith(COMPRESSIBLE_TYPES):
+            encoding = None
+
+        body = b"".join([chunk async for chunk in response.body_iterator])
+        self.bytes_in += len(body)
+        if encoding is not None and len(body) >= self.min_size:
+            if len(body) >= self.offload_size:
+                # gzip / brotli nhả GIL: body lớn nén trên thread, không chặn event loop
+                body = await asyncio.get_running_loop().run_in_executor(
+                    None, compress, body, encoding, self.gzip_level, self.brotli_quality)
+            else:
+                body = compress(body, encoding, self.gzip_level, self.brotli_quality)
+            self.compressed += 1
+        else:
+            encoding = None
+        self.bytes_out += len(body)
+
+        headers = {k: v for k, v in response.headers.items() if k not in ("content-length", "cache-control")}
+        vary = headers.pop("vary", None)
+        headers.update(self._headers(policy, etag, encoding))
+        if vary and "accept-encoding" not in vary.lower():
+            headers["vary"] = f"{vary}, Accept-Encoding"
+        if encoding is not None:
+            headers["content-encoding"] = encoding
+            if etag is not None and response.background is None:
+                self._remember(cache_key, headers, body)
+        return Response(
+            content=body,
+            status_code=response.status_code,
+            headers=headers,
+            background=response.background,
+        )
+
+    def _remember(self, key, headers, body):
+        # Bản nén dùng chung cho mọi người xem: bỏ header CORS / Vary theo Origin của request đầu tiên
+        headers = {k: v for k, v in headers.items() if not k.startswith("access-control-")}
+        headers["vary"] = "Accept-Encoding"
+        self._compressed_bodies[key] = (headers, body)
+        self._compressed_bodies.move_to_end(key)
+        while len(self._compressed_bodies) > self.cache_size:
+            self._compressed_bodies.popitem(last=False)
+
+    def _headers(self, policy, etag, encoding):
+        headers = {"cache-control": policy["cache_control"], "vary": "Accept-Encoding"}
+        if etag is not None:
+            headers["etag"] = encoded_etag(etag, encoding)
+            headers["last-modified"] = self.version.last_modified()
+        return headers
+
+    def stats(self):
+        return {
+            "catalog_version": self.version.version,
+            "not_modified": self.not_modified,
+            "compressed": self.compressed,
+            "compressed_hits": self.compressed_hits,
+            "compressed_cached": len(self._compressed_bodies),
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "compression_ratio": round(self.bytes_out / self.bytes_in, 4) if self.bytes_in else 1.0,
+            "brotli": brotli is not None,
+        }
@@ -0,0 +1,193 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from logs import get_logger
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow là phụ thuộc tuỳ chọn: không có thì bỏ qua tạo ảnh thu nhỏ
+    Image = None
+
+UPLOADS_URL_PREFIX = "/uploads/images/"
+VARIANTS_DIRNAME = "variants"
+
+# tên biến thể -> (rộng, cao, định dạng, chất lượng)
+IMAGE_VARIANTS = {
+    "card": (480, 270, "JPEG", 80),
+    "card_webp": (480, 270, "WEBP", 75),
+    "hero": (1280, 720, "JPEG", 82),
+    "hero_webp": (1280, 720, "WEBP", 78),
+}
+VARIANT_EXTENSIONS = {"JPEG": "jpg", "WEBP": "webp"}
+
+VARIANTS_FOLDER = Path("uploads") / "images" / VARIANTS_DIRNAME
+VARIANT_RESCAN_INTERVAL = 60.0  # giây; thấy biến thể do worker khác tạo, bằng TTL cache catalog
+
+log = get_logger("images")
+
+
+def variant_filename(stem: str, name: str) -> str:
+    return f"{stem}_{name}.{VARIANT_EXTENSIONS[IMAGE_VARIANTS[name][2]]}"
+
+
+def _variant_urls_for(stem: str):
+    return {name: f"{UPLOADS_URL_PREFIX}{VARIANTS_DIRNAME}/{variant_filename(stem, name)}" for name in IMAGE_VARIANTS}
+
+
+class VariantIndex:
+    """URL biến thể theo stem ảnh, giữ trong bộ nhớ: tuần tự hoá danh sách không stat file cho từng dòng.
+
+    Nạp bằng một lần liệt kê thư mục variants; ImagePipeline thêm / bỏ ngay khi tạo / xoá biến thể.
+    Biến thể do worker khác tạo được thấy sau lần quét lại kế tiếp (`rescan_interval` giây).
+    """
+
+    def __init__(self, folder: Path, rescan_interval: float = VARIANT_RESCAN_INTERVAL):
+        self.folder = Path(folder)
+        self.rescan_interval = rescan_interval
+        self._lock = threading.Lock()
+        self._ready = {}
+        self._scanned_at = None
+        self.scans = 0
+
+    def _stale(self):
+        return self._scanned_at is None or time.monotonic() - self._scanned_at > self.rescan_interval
+
+    def _rescan(self):
+        # Ảnh có biến thể "card" được coi là đã xử lý xong (generate_variants ghi từng file qua .tmp)
+        marker = variant_filename("", "card")
+        try:
+            names = os.listdir(self.folder)
+        except FileNotFoundError:
+            names = []
+        previous = self._ready
+        self._ready = {
+            stem: previous.get(stem) or _variant_urls_for(stem)
+            for stem in (name[:-len(marker)] for name in names if name.endswith(marker))
+        }
+        self._scanned_at = time.monotonic()
+        self.scans += 1
+
+    def get(self, stem: str):
+        if self._stale():
+            with self._lock:
+                if self._stale():
+                    self._rescan()
+        return self._ready.get(stem)
+
+    def add(self, stem: str):
+        with self._lock:
+            self._ready[stem] = _variant_urls_for(stem)
+
+    def discard(self, stem: str):
+        with self._lock:
+            self._ready.pop(stem, None)
+
+
+variant_index = VariantIndex(VARIANTS_FOLDER)
+
+
+def variant_urls(image_url):
+    # URL các biến thể của ảnh upload, None nếu chưa được tạo (frontend dùng ảnh gốc)
+    if not image_url or not image_url.startswith(UPLOADS_URL_PREFIX):
+        return None
+    return variant_index.get(Path(image_url).stem)
+
+
+def generate_variants(source: str, destination_folder: str):
+    # Chạy trong process con: giải mã, thu nhỏ, nén lại từng biến thể
+    source_path = Path(source)
+    folder = Path(destination_folder)
+    stem = source_path.stem
+    with Image.open(source_path) as original:
+        original = ImageOps.exif_transpose(original).convert("RGB")
+        for name, (width, height, fmt, quality) in IMAGE_VARIANTS.items():
+            target = folder / variant_filename(stem, name)
+            if target.exists():
+                continue
+            resized = ImageOps.fit(original, (width, height), method=Image.LANCZOS)
+            tmp = target.with_suffix(target.suffix + ".tmp")
+            resized.save(tmp, fmt, quality=quality, optimize=True)
+            tmp.replace(target)
+    return stem
+
+
+class ImagePipeline:
+    """Tạo ảnh thu nhỏ / WebP sau khi upload, trên process pool riêng (không chặn request)."""
+
+    def __init__(self, images_folder: Path, max_workers: int = 2, on_complete=None):
+        self.images_folder = Path(images_folder)
+        self.on_complete = on_complete  # gọi với image_url khi các biến thể đã sẵn sàng
+        self.variants_folder = VARIANTS_FOLDER
+        self.variants_folder.mkdir(parents=True, exist_ok=True)
+        self.max_workers = max_workers
+        self.enabled = Image is not None
+        self._executor = None
+        self._tasks = set()
+
+        self.queued = 0
+        self.completed = 0
+        self.failed = 0
+        self.processing_time_total = 0.0
+        self.processing_time_max = 0.0
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    def submit(self, image_url: str):
+        if not self.enabled or not image_url or not image_url.startswith(UPLOADS_URL_PREFIX):
+            return
+        task = asyncio.create_task(self._process(image_url))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _process(self, image_url: str):
+        source = self.images_folder / Path(image_url).name
+        loop = asyncio.get_running_loop()
+        self.queued += 1
+        started = time.perf_counter()
+        try:
+            stem = await loop.run_in_executor(self._get_executor(), generate_variants, str(source), str(self.variants_folder))
+            variant_index.add(stem)
+            self.completed += 1
+            if self.on_complete is not None:
+                self.on_complete(image_url)
+        except Exception as e:
+            self.failed += 1
+            log.error("image_variants_failed", source=str(source), error=str(e))
+        finally:
+            self.queued -= 1
+            elapsed = time.perf_counter() - started
+            self.processing_time_total += elapsed
+            self.processing_time_max = max(self.processing_time_max, elapsed)
+
+    def remove_variants(self, image_url: str):
+        if not image_url or not image_url.startswith(UPLOADS_URL_PREFIX):
+            return
+        stem = Path(image_url).stem
+        variant_index.discard(stem)
+        for name in IMAGE_VARIANTS:
+            (self.variants_folder / variant_filename(stem, name)).unlink(missing_ok=True)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        finished = self.completed + self.failed
+        return {
+            "enabled": self.enabled,
+            "workers": self.max_workers,
+            "queue_depth": self.queued,
+            "completed": self.completed,
+            "failed": self.failed,
+            "processing_time_avg_ms": round(self.processing_time_total * 1000 / finished, 2) if finished else 0.0,
+            "processing_time_max_ms": round(self.processing_time_max * 1000, 2),
+            "variant_index_size": len(variant_index._ready),
+            "variant_index_scans": variant_index.scans,
+        }
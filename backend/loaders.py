@@ -0,0 +1,75 @@
+import asyncio
+
+import crud
+
+
+class BatchLoader:
+    """Gom và ghi nhớ các lần tải theo id trong phạm vi một request.
+
+    Các `load()` được gọi trong cùng một vòng lặp event loop được gộp thành một lần gọi
+    `batch_fn(cnxn, ids)` (một câu `WHERE id IN (...)`); id đã tải sẽ không truy vấn lại.
+    """
+
+    def __init__(self, db, batch_fn, max_batch_size=500):
+        self.db = db
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self._futures = {}
+        self._queue = []
+        self.batches = 0
+
+    async def load(self, key):
+        future = self._futures.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = self._futures[key] = loop.create_future()
+            self._queue.append(key)
+            if len(self._queue) == 1:
+                loop.call_soon(self._dispatch)
+        # shield: một request bị huỷ không làm hỏng future dùng chung
+        return await asyncio.shield(future)
+
+    async def load_many(self, keys):
+        return await asyncio.gather(*(self.load(key) for key in keys))
+
+    def prime(self, key, value):
+        # Ghi sẵn kết quả đã biết (ví dụ ngay sau INSERT) để lần tải sau không cần truy vấn
+        future = self._futures.get(key)
+        if future is None or future.done():
+            future = asyncio.get_running_loop().create_future()
+            self._futures[key] = future
+        future.set_result(value)
+
+    def clear(self, key):
+        self._futures.pop(key, None)
+
+    def _dispatch(self):
+        keys, self._queue = self._queue, []
+        for start in range(0, len(keys), self.max_batch_size):
+            asyncio.ensure_future(self._run(keys[start:start + self.max_batch_size]))
+
+    async def _run(self, keys):
+        self.batches += 1
+        try:
+            results = await self.db.run(self.batch_fn, keys)
+        except Exception as ex:
+            for key in keys:
+                future = self._futures.pop(key, None)
+                if future is not None and not future.done():
+                    future.set_exception(ex)
+            return
+        for key in keys:
+            future = self._futures.get(key)
+            if future is not None and not future.done():
+                future.set_result(results.get(key))
+
+
+class RequestLoaders:
+    def __init__(self, db):
+        self.users = BatchLoader(db, crud.get_users_by_ids)
+        self.courses = BatchLoader(db, crud.get_courses_by_ids)
+        self.lectures = BatchLoader(db, crud.get_lectures_by_ids)
+
+    @property
+    def query_count(self):
+        return self.users.batches + self.courses.batches + self.lectures.batches
@@ -0,0 +1,54 @@
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+
+LOGGER_NAME = "elearning"
+# Thuộc tính chuẩn của LogRecord, không đưa vào phần "fields" của bản ghi JSON
+_RESERVED = frozenset(vars(logging.makeLogRecord({}))) | {"message"}
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        entry.update({k: v for k, v in vars(record).items() if k not in _RESERVED})
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class StructuredLogger(logging.LoggerAdapter):
+    """`log.info("course_created", course_id=1)`: tham số từ khoá thành trường JSON của bản ghi."""
+
+    def process(self, msg, kwargs):
+        passthrough = {k: kwargs.pop(k) for k in ("exc_info", "stack_info", "stacklevel") if k in kwargs}
+        passthrough["extra"] = kwargs
+        return msg, passthrough
+
+
+def get_logger(name: str) -> StructuredLogger:
+    return StructuredLogger(logging.getLogger(f"{LOGGER_NAME}.{name}"), {})
+
+
+def setup_logging(level: str = "INFO", stream=None):
+    """Request chỉ đẩy bản ghi vào hàng đợi; một luồng nền định dạng và ghi ra stdout.
+
+    Trả về QueueListener, cần gọi `stop()` khi tắt server để ghi nốt các bản ghi còn trong hàng đợi.
+    """
+    log_queue = queue.SimpleQueue()
+    handler = logging.StreamHandler(stream or sys.stdout)
+    handler.setFormatter(JSONFormatter())
+    listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=False)
+
+    root = logging.getLogger(LOGGER_NAME)
+    root.handlers[:] = [logging.handlers.QueueHandler(log_queue)]
+    root.setLevel(level.upper())
+    root.propagate = False
+    listener.start()
+    return listener
@@ -1,110 +1,42 @@
-from fastapi import FastAPI, HTTPException, Depends, status, UploadFile, File, Form
+from fastapi import FastAPI, HTTPException, Depends, status, UploadFile, File, Form, Query, Request, Header
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel
-import pyodbc
+from fastapi.responses import JSONResponse, Response
 from typing import List, Optional
 import os # <-- Đảm bảo đã import os
-import uuid
-import aiofiles
+import asyncio
+import mimetypes
 from pathlib import Path # <-- Đảm bảo đã import Path
 
-# Cấu hình kết nối Database (giữ nguyên)
-DB_CONFIG = {
-    "DRIVER": "{ODBC Driver 17 for SQL Server}",
-    "SERVER": "DESKTOP-S730D0D\SQLEXPRESS01",
-    "DATABASE": "ELearningDB",
-    "UID": "sa",
-    "PWD": "123"
-}
-
-DB_CONN_STR = (
-    f"DRIVER={DB_CONFIG['DRIVER']};"
-    f"SERVER={DB_CONFIG['SERVER']};"
-    f"DATABASE={DB_CONFIG['DATABASE']};"
-    f"UID={DB_CONFIG['UID']};"
-    f"PWD={DB_CONFIG['PWD']}"
+import crud
+import db_errors
+import migrations
+from cache import MISSING, TTLCache
+from http_cache import CatalogVersion, HTTPCacheMiddleware
+from serializers import dumps, encoded, json_response
+from search import CourseSearchIndex
+from ranking import RANKING_CONFIG, popularity
+from media import resolve_media_path, media_response
+from uploads import IMAGE_SIGNATURES, SNIFF_BYTES, VIDEO_SIGNATURES, UploadSessionStore, sniff_extension
+from storage import BlobStore
+from images import ImagePipeline
+from database import DB_BACKEND, Database, database, get_db, read_router
+from loaders import RequestLoaders
+from auth import TokenClaims, TokenSigner, bearer_token, load_secret
+from logs import get_logger, setup_logging
+from metrics import PROMETHEUS_CONTENT_TYPE, MetricsRegistry, QueryMetrics, RequestMetrics
+from admission import AdmissionControl, Overloaded
+from singleflight import SingleFlight
+from progress import PROGRESS_CONFIG, BufferFull, ProgressBuffer
+from models import (
+    UserCreate, UserLogin, UserOut, SessionOut,
+    CourseOut, CoursePage, CourseDetailPage, LectureOut,
+    EnrollmentCreate, EnrollmentOut,
+    BulkEnrollmentCreate, BulkEnrollmentOut, BulkEnrollmentResult,
+    UploadSessionCreate, UploadFinalize,
+    LectureProgressUpdate, LectureProgressOut, CourseProgressOut,
 )
 
-# --- Pydantic Models (giữ nguyên) ---
-class UserBase(BaseModel):
-    username: str
-    email: str
-
-class UserCreate(UserBase):
-    password: str
-
-class UserLogin(BaseModel):
-    email: str
-    password: str
-
-class UserOut(UserBase):
-    user_id: int
-    role: str
-
-    class Config:
-        orm_mode = True
-
-class CourseBase(BaseModel):
-    title: str
-    image_url: Optional[str] = None
-    short_description: Optional[str] = None
-    full_description: Optional[str] = None
-    price: float
-    instructor_bio: Optional[str] = None
-
-class CourseOut(CourseBase):
-    course_id: int
-    instructor_id: int
-    instructor_name: Optional[str] = None
-    is_free: bool = False
-
-    @staticmethod
-    def from_row(row):
-        course = CourseOut(
-            course_id=row.CourseID,
-            title=row.Title,
-            image_url=row.ImageURL,
-            short_description=row.ShortDescription,
-            full_description=row.FullDescription,
-            price=float(row.Price),
-            instructor_id=row.InstructorID,
-            instructor_bio=row.InstructorBio,
-            is_free=float(row.Price) == 0.0
-        )
-        if hasattr(row, 'InstructorName'):
-            course.instructor_name = row.InstructorName
-        return course
-
-    class Config:
-        orm_mode = True
-
-class LectureBase(BaseModel):
-    title: str
-    video_url: Optional[str] = None
-    description: Optional[str] = None
-
-class LectureOut(LectureBase):
-    lecture_id: int
-    course_id: int
-    lecture_order: int
-
-    class Config:
-        orm_mode = True
-
-class EnrollmentCreate(BaseModel):
-    user_id: int
-    course_id: int
-
-class EnrollmentOut(BaseModel):
-    enrollment_id: int
-    user_id: int
-    course_id: int
-    enrollment_date: str
-    
-    class Config:
-        orm_mode = True
-
 # --- FastAPI App Setup (giữ nguyên) ---
 app = FastAPI(title="E-Learning Vibe Backend")
 
@@ -113,6 +45,136 @@ origins = [
     "http://localhost:5500",
 ]
 
+# --- Cấu hình thư mục tĩnh cho uploads ---
+UPLOAD_FOLDER = "uploads"
+IMAGES_FOLDER = Path(UPLOAD_FOLDER) / "images"
+VIDEOS_FOLDER = Path(UPLOAD_FOLDER) / "videos"
+
+PARTIAL_UPLOADS_FOLDER = Path(UPLOAD_FOLDER) / "partial"
+
+IMAGES_FOLDER.mkdir(parents=True, exist_ok=True)
+VIDEOS_FOLDER.mkdir(parents=True, exist_ok=True)
+
+UPLOAD_CONFIG = {
+    "buffer_size": 8 * 1024 * 1024,          # ghi đĩa theo khối 8 MB
+    "max_image_size": 20 * 1024 * 1024,
+    "max_video_size": 10 * 1024 * 1024 * 1024,
+    "session_expire_after": 24 * 3600.0,     # phiên upload bỏ dở quá 24h sẽ bị xoá
+    "cleanup_interval": 15 * 60.0,
+}
+
+# File upload được lưu theo hash nội dung (trùng nội dung -> dùng chung một file)
+blob_store = BlobStore(Path(UPLOAD_FOLDER), PARTIAL_UPLOADS_FOLDER, UPLOAD_CONFIG["buffer_size"])
+
+# Ảnh khoá học: tạo biến thể (thumbnail, hero, WebP) nền trên process pool
+IMAGE_PIPELINE_WORKERS = 2
+image_pipeline = ImagePipeline(
+    IMAGES_FOLDER,
+    max_workers=IMAGE_PIPELINE_WORKERS,
+    on_complete=lambda image_url: invalidate_course_image(image_url),  # để khoá học dùng ảnh này trả về URL biến thể mới
+)
+
+upload_sessions = UploadSessionStore(
+    PARTIAL_UPLOADS_FOLDER,
+    max_size=UPLOAD_CONFIG["max_video_size"],
+    buffer_size=UPLOAD_CONFIG["buffer_size"],
+    expire_after=UPLOAD_CONFIG["session_expire_after"],
+)
+
+app.mount(f"/{UPLOAD_FOLDER}", StaticFiles(directory=UPLOAD_FOLDER), name=UPLOAD_FOLDER)
+
+# --- Cache danh mục khoá học, bị xoá khi có thay đổi course/lecture ---
+CATALOG_CACHE_CONFIG = {
+    "maxsize": 2048,
+    "ttl": 60.0,   # giới hạn độ trễ khi chạy nhiều worker (mỗi worker có cache riêng)
+}
+
+# Nhiều request cùng lúc cho một khoá chưa có trong cache (khoá học vừa được chia sẻ rộng) dùng chung một truy vấn
+SINGLE_FLIGHT_CONFIG = {
+    "max_waiters": 1000,   # số request tối đa chờ chung một truy vấn, vượt quá trả 503
+}
+
+catalog_flights = SingleFlight(**SINGLE_FLIGHT_CONFIG)
+catalog_cache = TTLCache(**CATALOG_CACHE_CONFIG, flights=catalog_flights)
+
+# --- HTTP cache: ETag theo phiên bản danh mục, Cache-Control theo route, nén gzip/brotli ---
+HTTP_CACHE_CONFIG = {
+    "min_size": 1024,       # chỉ nén response từ 1 KB trở lên
+    "gzip_level": 6,
+    "brotli_quality": 4,
+    "cache_size": 256,           # số bản nén giữ lại theo (ETag, URL, encoding)
+    "offload_size": 64 * 1024,   # body từ 64 KB trở lên nén trên thread
+}
+# (regex đường dẫn, policy); luật đầu tiên khớp được dùng. /media và /uploads tự đặt header riêng.
+HTTP_CACHE_POLICIES = [
+    (r"^/courses(/featured|/search)?$", {"cache_control": "public, max-age=0, must-revalidate", "etag": True}),
+    (r"^/courses/\d+(/lectures)?$", {"cache_control": "public, max-age=0, must-revalidate", "etag": True}),
+    # Có trạng thái đăng ký của người xem -> không để CDN giữ
+    (r"^/courses/\d+/page$", {"cache_control": "private, no-cache"}),
+    (r"^/users/", {"cache_control": "private, no-store"}),
+    (r"^/health/", {"cache_control": "no-store"}),
+    (r"^/metrics$", {"cache_control": "no-store"}),
+]
+
+catalog_version = CatalogVersion(max_age=CATALOG_CACHE_CONFIG["ttl"])
+http_cache = HTTPCacheMiddleware(catalog_version, HTTP_CACHE_POLICIES, **HTTP_CACHE_CONFIG)
+app.middleware("http")(http_cache)
+
+# --- Log có cấu trúc (JSON, ghi qua hàng đợi nền) và metric Prometheus ---
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
+SLOW_QUERY_SECONDS = 0.5
+
+log_listener = setup_logging(LOG_LEVEL)
+log = get_logger("api")
+
+metrics_registry = MetricsRegistry()
+
+# --- Admission control: giới hạn đồng thời theo lớp route, từ chối nhanh (503) khi quá tải ---
+ADMISSION_LIMITS = {
+    # Đọc phần lớn trúng cache nên cho nhiều hơn kích thước pool DB; ghi và upload giữ kết nối / đĩa lâu hơn
+    "read": {"max_concurrency": 48, "max_queue": 256, "queue_timeout": 2.0},
+    "write": {"max_concurrency": 12, "max_queue": 64, "queue_timeout": 3.0},
+    "upload": {"max_concurrency": 8, "max_queue": 16, "queue_timeout": 10.0},
+}
+# (method hoặc None, regex đường dẫn, lớp route hoặc None = không giới hạn); luật đầu tiên khớp được dùng
+ADMISSION_ROUTES = [
+    ("OPTIONS", r"^/", None),                                  # CORS preflight
+    (None, r"^/(health/|metrics$|media/|uploads/)", None),     # giám sát và file tĩnh không chạm DB
+    (None, r"^/upload-sessions", "upload"),
+    ("POST", r"^/courses/\d+/lectures$", "upload"),            # có thể kèm file video
+    ("GET", r"^/", "read"),
+    ("HEAD", r"^/", "read"),
+    (None, r"^/", "write"),
+]
+# Giới hạn tần suất theo người dùng (chủ token, không có token thì theo IP).
+# RATE_LIMITS=off để tắt khi chạy load test từ một máy (benchmarks/load_test.py)
+RATE_LIMITS_ENABLED = os.environ.get("RATE_LIMITS", "on").lower() != "off"
+RATE_LIMITS = {
+    "login": {"rate": 10 / 60, "burst": 10},
+    "enroll": {"rate": 1.0, "burst": 20},
+    "upload": {"rate": 0.5, "burst": 10},
+    "progress": {"rate": 1.0, "burst": 10},    # trình phát gửi heartbeat vài giây một lần
+}
+RATE_LIMIT_RULES = [
+    ("POST", r"^/login$", "login"),
+    ("POST", r"^/enroll(/bulk)?$", "enroll"),
+    ("POST", r"^/upload-sessions(/[^/]+/lecture)?$", "upload"),
+    ("POST", r"^/courses/\d+/lectures$", "upload"),
+    ("POST", r"^/lectures/\d+/progress$", "progress"),
+]
+
+admission = AdmissionControl(
+    metrics_registry, ADMISSION_ROUTES, ADMISSION_LIMITS, RATE_LIMIT_RULES if RATE_LIMITS_ENABLED else (), RATE_LIMITS)
+# Sau http_cache: 304 cũng chiếm slot rất ngắn; trước request_metrics: request bị từ chối vẫn được đo
+app.middleware("http")(admission)
+
+# Đăng ký sau cùng trong các middleware "http" -> đo cả các response 304, 503 và thời gian nén
+request_metrics = RequestMetrics(metrics_registry)
+app.middleware("http")(request_metrics)
+
+# CORS đăng ký sau mọi middleware "http" -> ngoài cùng: 304 của http_cache và 503/429 của admission cũng có
+# Access-Control-Allow-Origin (trình duyệt mới đọc được status / Retry-After), còn header theo Origin
+# không lọt vào bản nén http_cache giữ chung cho mọi người xem
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
@@ -120,158 +182,394 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+database.on_query = QueryMetrics(metrics_registry, SLOW_QUERY_SECONDS, get_logger("db"))
+read_router.logger = get_logger("db")
+for replica in read_router.replicas:
+    replica.database.on_query = database.on_query
 
-# --- Cấu hình thư mục tĩnh cho uploads ---
-UPLOAD_FOLDER = "uploads"
-IMAGES_FOLDER = Path(UPLOAD_FOLDER) / "images"
-VIDEOS_FOLDER = Path(UPLOAD_FOLDER) / "videos"
+# Tiến độ học: gộp heartbeat trong bộ nhớ, ghi primary theo lô (progress.py)
+progress_buffer = ProgressBuffer(database, **PROGRESS_CONFIG, logger=get_logger("progress"))
 
-IMAGES_FOLDER.mkdir(parents=True, exist_ok=True)
-VIDEOS_FOLDER.mkdir(parents=True, exist_ok=True)
+metrics_registry.gauge("db_pool_in_use", "Database connections checked out.", lambda: database.stats()["in_use"])
+metrics_registry.gauge("db_pool_waiting", "Requests waiting for a database connection.", lambda: database.stats()["waiting"])
+metrics_registry.gauge("db_executor_queued", "Database calls queued for a worker thread.", lambda: database.stats()["executor_queued"])
+metrics_registry.gauge("db_replicas_healthy", "Read replicas currently in rotation.", read_router.healthy)
+metrics_registry.gauge("catalog_cache_size", "Entries in the catalog cache.", lambda: catalog_cache.stats()["size"])
+metrics_registry.gauge("catalog_cache_hit_ratio", "Catalog cache hit ratio.", lambda: catalog_cache.stats()["hit_ratio"])
+metrics_registry.gauge("progress_buffer_entries", "Lecture progress entries not yet written.", lambda: len(progress_buffer))
+metrics_registry.gauge("catalog_singleflight_in_flight", "Distinct catalog loads in flight.", lambda: len(catalog_flights))
+metrics_registry.gauge("catalog_singleflight_coalescing_ratio", "Share of catalog loads served by another request's query.",
+                       lambda: catalog_flights.coalescing_ratio)
+metrics_registry.gauge("image_pipeline_queue_depth", "Image variant jobs in progress.", lambda: image_pipeline.queued)
 
-app.mount(f"/{UPLOAD_FOLDER}", StaticFiles(directory=UPLOAD_FOLDER), name=UPLOAD_FOLDER)
+# Khoá stickiness của ReadRouter: đọc danh mục / dữ liệu của một người dùng ngay sau khi ghi đi primary
+CATALOG_READ_KEY = "catalog"
+
+def user_read_key(user_id) -> tuple:
+    return ("user", int(user_id))
+
+def invalidate_course_cache(course_id: Optional[int] = None):
+    # ("courses", ...) gồm mọi trang/bộ lọc của /courses và /courses/featured
+    catalog_cache.invalidate_prefix(("courses",))
+    if course_id is not None:
+        catalog_cache.invalidate(("course", course_id), ("lectures", course_id))
+    catalog_version.bump()
+    # Không để replica còn trễ nạp lại dữ liệu cũ vào cache vừa xoá
+    read_router.mark_write(CATALOG_READ_KEY)
+
+def references_image(value, image_url: str) -> bool:
+    # Giá trị cache catalog: CourseOut, trang {"items": [...]} hoặc danh sách dict khoá học
+    if isinstance(value, CourseOut):
+        return value.image_url == image_url
+    if isinstance(value, dict):
+        value = value.get("items", ())
+    return isinstance(value, list) and any(isinstance(item, dict) and item.get("image_url") == image_url for item in value)
+
+def invalidate_course_image(image_url: str):
+    # Biến thể ảnh vừa tạo xong: chỉ xoá các mục cache có khoá học dùng ảnh này. Không đổi phiên bản danh mục
+    # (ETag của mọi client) và không bám primary: biến thể không đến từ DB, client thấy trong khung ETag (TTL catalog)
+    removed = catalog_cache.invalidate_where(lambda key, value: references_image(value, image_url))
+    log.debug("course_image_variants_ready", url=image_url, invalidated=removed)
+
+def with_enrollment_counts(courses):
+    # Số lượt đăng ký đổi theo từng lượt enroll (ranking.popularity): cache catalog không giữ con số này,
+    # gộp vào lúc trả về thay vì xoá cache mỗi lần có người đăng ký
+    return [{**course, "enrollment_count": popularity.count(course["course_id"])} for course in courses]
 
-# Dependency để lấy kết nối database (giữ nguyên)
-def get_db_connection():
-    cnxn = None
+def with_enrollment_count(course: CourseOut) -> CourseOut:
+    return course.copy(update={"enrollment_count": popularity.count(course.course_id)})
+
+def invalidate_lecture_cache(course_id: int):
+    catalog_cache.invalidate(("lectures", course_id))
+    catalog_version.bump()
+    read_router.mark_write(CATALOG_READ_KEY)
+
+# --- Chỉ mục tìm kiếm khoá học (trong bộ nhớ, dựng lại khi khởi động và định kỳ) ---
+SEARCH_CONFIG = {
+    "champion_size": 500,      # số posting tốt nhất được duyệt cho mỗi term
+    "max_prefix_terms": 16,    # số term tối đa khi mở rộng tiền tố (typeahead)
+    "rebuild_interval": 600.0, # đồng bộ khoá học do worker khác tạo / xoá
+}
+
+search_index = CourseSearchIndex(**SEARCH_CONFIG)
+
+# Đăng ký trước các bước khởi động khác: bảng / chỉ mục phải có trước khi đọc
+@app.on_event("startup")
+async def apply_migrations():
     try:
-        cnxn = pyodbc.connect(DB_CONN_STR, autocommit=True)
-        yield cnxn
-    except pyodbc.Error as ex:
-        sqlstate = ex.args[0]
-        if sqlstate == '28000':
-            raise HTTPException(status_code=500, detail="Database connection failed: Invalid credentials.")
-        else:
-            raise HTTPException(status_code=500, detail=f"Database connection error: {ex}")
-    finally:
-        if cnxn:
-            cnxn.close()
-
-# --- Utility Functions (giữ nguyên) ---
-def get_user_by_id(db: pyodbc.Connection, user_id: int):
-    cursor = db.cursor()
-    cursor.execute("SELECT UserID, Username, Email, Role FROM Users WHERE UserID = ?", user_id)
-    user_row = cursor.fetchone()
-    if user_row:
-        return UserOut(
-            user_id=user_row.UserID,
-            username=user_row.Username,
-            email=user_row.Email,
-            role=user_row.Role
-        )
-    return None
+        applied = await database.run(migrations.migrate, DB_BACKEND)
+        if applied:
+            log.info("schema_migrated", versions=applied)
+    except Exception as e:
+        log.error("schema_migration_failed", error=str(e))
 
-def get_course_by_id(db: pyodbc.Connection, course_id: int):
-    cursor = db.cursor()
-    cursor.execute("""
-        SELECT c.*, u.Username AS InstructorName
-        FROM Courses c
-        JOIN Users u ON c.InstructorID = u.UserID
-        WHERE c.CourseID = ?
-    """, course_id)
-    course_row = cursor.fetchone()
-    if course_row:
-        return CourseOut.from_row(course_row)
-    return None
+async def rebuild_search_index():
+    search_index.begin_rebuild()
+    rows = await read_router.reader([CATALOG_READ_KEY]).run(crud.list_course_search_docs)
+    await asyncio.get_running_loop().run_in_executor(None, search_index.rebuild, rows)
+    log.info("search_index_built", courses=len(search_index))
 
-def get_lecture_by_id(db: pyodbc.Connection, lecture_id: int):
-    cursor = db.cursor()
-    cursor.execute("SELECT * FROM Lectures WHERE LectureID = ?", lecture_id)
-    lecture_row = cursor.fetchone()
-    if lecture_row:
-        return LectureOut(
-            lecture_id=lecture_row.LectureID,
-            course_id=lecture_row.CourseID,
-            title=lecture_row.Title,
-            video_url=lecture_row.VideoURL,
-            description=lecture_row.Description,
-            lecture_order=lecture_row.LectureOrder
-        )
+async def search_index_rebuild_loop():
+    while True:
+        await asyncio.sleep(search_index.rebuild_interval)
+        try:
+            await rebuild_search_index()
+        except Exception as e:
+            log.error("search_index_build_failed", error=str(e))
+
+@app.on_event("startup")
+async def build_search_index():
+    try:
+        await rebuild_search_index()
+    except Exception as e:
+        log.error("search_index_build_failed", error=str(e))
+    app.state.search_index_task = asyncio.create_task(search_index_rebuild_loop())
+
+@app.on_event("shutdown")
+async def stop_search_index_rebuild():
+    app.state.search_index_task.cancel()
+
+# --- Bảng xếp hạng khoá học nổi bật (popular / trending): cập nhật theo từng lượt đăng ký,
+# dựng lại từ DB lúc khởi động và định kỳ (đồng bộ lượt đăng ký do worker khác nhận) ---
+async def rebuild_popularity():
+    popularity.begin_rebuild()
+    reader = read_router.reader()
+    counts = await reader.run(crud.list_enrollment_counts)
+    recent = await reader.run(crud.list_recent_enrollments, popularity.trending_since())
+    prepared = await asyncio.get_running_loop().run_in_executor(None, popularity.prepare, counts, recent)
+    popularity.load(prepared)
+    catalog_version.bump()  # số lượt đăng ký trong /courses/featured đổi theo bảng xếp hạng mới
+    log.info("popularity_rebuilt", courses=len(popularity.counts), recent_enrollments=len(recent))
+
+async def popularity_rebuild_loop():
+    while True:
+        await asyncio.sleep(popularity.rebuild_interval)
+        try:
+            await rebuild_popularity()
+        except Exception as e:
+            log.error("popularity_rebuild_failed", error=str(e))
+
+@app.on_event("startup")
+async def start_popularity_ranking():
+    try:
+        await rebuild_popularity()
+    except Exception as e:
+        log.error("popularity_rebuild_failed", error=str(e))
+    app.state.popularity_task = asyncio.create_task(popularity_rebuild_loop())
+
+@app.on_event("shutdown")
+async def stop_popularity_ranking():
+    app.state.popularity_task.cancel()
+
+@app.on_event("startup")
+async def start_progress_buffer():
+    progress_buffer.start()
+
+# Đăng ký trước close_database: ghi nốt tiến độ còn trong bộ nhớ khi pool vẫn mở
+@app.on_event("shutdown")
+async def flush_progress_buffer():
+    try:
+        await progress_buffer.close()
+    except Exception as e:
+        log.error("progress_flush_failed", pending=len(progress_buffer), error=str(e))
+
+@app.on_event("startup")
+async def start_upload_cleanup():
+    app.state.upload_cleanup_task = asyncio.create_task(
+        upload_sessions.cleanup_loop(UPLOAD_CONFIG["cleanup_interval"])
+    )
+
+@app.on_event("shutdown")
+async def stop_upload_cleanup():
+    app.state.upload_cleanup_task.cancel()
+
+@app.on_event("shutdown")
+def stop_image_pipeline():
+    image_pipeline.shutdown()
+
+@app.on_event("shutdown")
+def close_database():
+    read_router.close()
+    database.close()
+
+@app.on_event("shutdown")
+def stop_logging():
+    log_listener.stop()  # ghi nốt các bản ghi còn trong hàng đợi
+
+# --- Xác thực: token phiên ký HMAC, kiểm tra role/chủ sở hữu không cần truy vấn Users ---
+AUTH_CONFIG = {
+    "token_ttl": 12 * 3600.0,
+}
+
+token_signer = TokenSigner(load_secret(), ttl=AUTH_CONFIG["token_ttl"])
+
+def get_current_user(authorization: Optional[str] = Header(None)) -> TokenClaims:
+    claims = token_signer.verify(bearer_token(authorization))
+    if claims is None:
+        raise HTTPException(status_code=401, detail="Invalid or expired token", headers={"WWW-Authenticate": "Bearer"})
+    return claims
+
+# Token không bắt buộc: trả về claims nếu header hợp lệ, ngược lại None (không báo lỗi 401)
+def optional_claims(authorization: Optional[str]) -> Optional[TokenClaims]:
+    if authorization and authorization[:7].lower() == "bearer ":
+        return token_signer.verify(authorization[7:].strip())
     return None
 
+# Khoá người dùng cho giới hạn tần suất (admission): token hợp lệ -> user id, ngược lại dùng IP
+def client_identity(request: Request):
+    claims = optional_claims(request.headers.get("authorization"))
+    return ("user", claims.user_id) if claims is not None else None
+
+admission.identify = client_identity
+
+# Quá tải phát hiện trong endpoint (vd. quá nhiều request chờ chung một truy vấn): 503 như admission
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, ex: Overloaded):
+    return JSONResponse({"detail": "Server is overloaded, please retry later."}, status_code=503,
+                        headers={"Retry-After": str(ex.retry_after)})
+
+def require_instructor(current_user: TokenClaims = Depends(get_current_user)) -> TokenClaims:
+    if current_user.role != 'instructor':
+        raise HTTPException(status_code=403, detail="Only instructors can perform this action.")
+    return current_user
+
+async def sniffed_extension(upload: UploadFile, signatures, detail: str) -> str:
+    # Phần mở rộng khi lưu lấy theo nội dung file, không theo tên file client gửi
+    head = await upload.read(SNIFF_BYTES)
+    await upload.seek(0)
+    extension = sniff_extension(head, signatures)
+    if extension is None:
+        raise HTTPException(status_code=415, detail=detail)
+    return extension
+
+def session_for(user: UserOut) -> SessionOut:
+    token, expires_at = token_signer.issue(user.user_id, user.username, user.role)
+    return SessionOut(**user.dict(), access_token=token, expires_at=expires_at)
+
+# Dependency: bộ loader theo từng request (gộp + ghi nhớ các lần tải user/course/lecture theo id)
+def get_loaders(db: Database = Depends(get_db)):
+    return RequestLoaders(db)
+
+# Dependency cho endpoint GET: đọc từ replica, trừ khi danh mục hoặc người dùng liên quan
+# (user_id trên đường dẫn/query, hoặc chủ token) vừa có thay đổi
+def get_read_db(request: Request, authorization: Optional[str] = Header(None)):
+    keys = [CATALOG_READ_KEY]
+    for user_id in (request.path_params.get("user_id"), request.query_params.get("user_id")):
+        if user_id is not None and user_id.isdigit():
+            keys.append(user_read_key(user_id))
+    claims = optional_claims(authorization)
+    if claims is not None:
+        keys.append(user_read_key(claims.user_id))
+    return read_router.reader(keys)
+
+def get_read_loaders(db: Database = Depends(get_read_db)):
+    return RequestLoaders(db)
+
 # --- API Endpoints ---
 
 # --- Auth Endpoints (giữ nguyên) ---
 @app.post("/register", response_model=UserOut)
-async def register(user: UserCreate, db: pyodbc.Connection = Depends(get_db_connection)):
-    cursor = db.cursor()
+async def register(user: UserCreate, db: Database = Depends(get_db)):
     try:
-        cursor.execute("INSERT INTO Users (Username, Email, Password) VALUES (?, ?, ?)", 
-                       user.username, user.email, user.password)
-        db.commit()
-        cursor.execute("SELECT @@IDENTITY AS UserID")
-        new_user_id = cursor.fetchone()[0]
-        return UserOut(user_id=new_user_id, username=user.username, email=user.email, role="student")
-    except pyodbc.IntegrityError:
+        new_user = await db.run(crud.create_user, user.username, user.email, user.password)
+    except db_errors.IntegrityError:
         raise HTTPException(status_code=400, detail="Email or username already registered.")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Registration failed: {e}")
+    read_router.mark_write(user_read_key(new_user.user_id))
+    return new_user
 
-@app.post("/login", response_model=UserOut)
-async def login(user_login: UserLogin, db: pyodbc.Connection = Depends(get_db_connection)):
-    cursor = db.cursor()
-    cursor.execute("SELECT UserID, Username, Email, Password, Role FROM Users WHERE Email = ?", user_login.email)
-    user_row = cursor.fetchone()
+@app.post("/login", response_model=SessionOut)
+async def login(user_login: UserLogin, db: Database = Depends(get_db)):
+    user_row = await db.run(crud.get_user_login_row, user_login.email)
     if not user_row:
         raise HTTPException(status_code=401, detail="Incorrect email or password")
     if user_row.Password != user_login.password:
         raise HTTPException(status_code=401, detail="Incorrect email or password")
-    return UserOut(
+    return session_for(UserOut(
         user_id=user_row.UserID,
         username=user_row.Username,
         email=user_row.Email,
         role=user_row.Role
-    )
+    ))
 
 # --- User Management Endpoints (giữ nguyên) ---
-@app.put("/users/{user_id}/upgrade-to-instructor", response_model=UserOut)
-async def upgrade_user_to_instructor(user_id: int, db: pyodbc.Connection = Depends(get_db_connection)):
-    user_to_upgrade = get_user_by_id(db, user_id)
+@app.put("/users/{user_id}/upgrade-to-instructor", response_model=SessionOut)
+async def upgrade_user_to_instructor(
+    user_id: int,
+    current_user: TokenClaims = Depends(get_current_user),
+    db: Database = Depends(get_db),
+    loaders: RequestLoaders = Depends(get_loaders)
+):
+    if current_user.user_id != user_id:
+        raise HTTPException(status_code=403, detail="Bạn chỉ có thể nâng cấp tài khoản của chính mình.")
+    user_to_upgrade = await loaders.users.load(user_id)
     if not user_to_upgrade:
         raise HTTPException(status_code=404, detail="Người dùng không tìm thấy.")
     if user_to_upgrade.role == 'instructor':
         raise HTTPException(status_code=400, detail="Người dùng đã là giảng viên rồi.")
-    cursor = db.cursor()
     try:
-        cursor.execute("UPDATE Users SET Role = 'instructor' WHERE UserID = ?", user_id)
-        db.commit()
-        updated_user = get_user_by_id(db, user_id)
-        return updated_user
+        updated_user = await db.run(crud.upgrade_user_to_instructor, user_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Lỗi khi nâng cấp vai trò người dùng: {e}")
+    read_router.mark_write(user_read_key(user_id))
+    # Token cũ mang role 'student': thu hồi và cấp token mới
+    token_signer.revoke_user(user_id)
+    return session_for(updated_user)
 
 # --- Course Endpoints ---
-@app.get("/courses", response_model=List[CourseOut])
-async def get_all_courses(db: pyodbc.Connection = Depends(get_db_connection)):
-    cursor = db.cursor()
-    cursor.execute("""
-        SELECT c.*, u.Username AS InstructorName
-        FROM Courses c
-        JOIN Users u ON c.InstructorID = u.UserID
-        ORDER BY c.CourseID DESC
-    """)
-    courses_rows = cursor.fetchall()
-    return [CourseOut.from_row(row) for row in courses_rows]
+# --- Tham số phân trang dùng chung cho các danh sách khoá học ---
+PAGE_SIZE_DEFAULT = 20
+PAGE_SIZE_MAX = 100
+
+@app.get("/courses", response_model=CoursePage)
+async def get_all_courses(
+    cursor: Optional[int] = None,
+    limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX),
+    fields: str = Query("full", regex="^(full|summary)$"),
+    is_free: Optional[bool] = None,
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    instructor_id: Optional[int] = None,
+    db: Database = Depends(get_read_db)
+):
+    summary = fields == "summary"
+    key = ("courses", "list", cursor, limit, summary, is_free, min_price, max_price, instructor_id)
+    # Cache giữ dict đã chuyển thẳng từ dòng DB (không qua Pydantic); response_model chỉ còn dùng cho tài liệu OpenAPI
+    page = await catalog_cache.get_or_load(key, lambda: db.run(
+        crud.list_courses,
+        cursor=cursor,
+        limit=limit,
+        summary=summary,
+        is_free=is_free,
+        min_price=min_price,
+        max_price=max_price,
+        instructor_id=instructor_id
+    ))
+    return json_response(dumps({**page, "items": with_enrollment_counts(page["items"])}))
 
 @app.get("/courses/featured", response_model=List[CourseOut])
-async def get_featured_courses(db: pyodbc.Connection = Depends(get_db_connection)):
-    cursor = db.cursor()
-    cursor.execute("""
-        SELECT c.*, u.Username AS InstructorName
-        FROM Courses c
-        JOIN Users u ON c.InstructorID = u.UserID
-        WHERE c.Price = 0 OR c.CourseID IN (SELECT TOP 3 CourseID FROM Courses ORDER BY CourseID DESC)
-        ORDER BY c.CourseID DESC
-    """)
-    courses_rows = cursor.fetchall()
-    return [CourseOut.from_row(row) for row in courses_rows]
+async def get_featured_courses(
+    by: str = Query("popular", regex="^(popular|trending)$"),
+    limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=RANKING_CONFIG["top_size"]),
+    db: Database = Depends(get_read_db)
+):
+    course_ids = tuple(popularity.top(by, limit))
+    if not course_ids:
+        courses = await catalog_cache.get_or_load(("courses", "featured"), lambda: db.run(crud.list_featured_courses))
+    else:
+        # Thông tin khoá học cache theo đúng danh sách id
+        courses = await catalog_cache.get_or_load(
+            ("courses", "featured", by, course_ids), lambda: db.run(crud.list_courses_by_ids, course_ids))
+    return json_response(dumps(with_enrollment_counts(courses)))
+
+@app.get("/courses/search", response_model=List[CourseOut])
+async def search_courses(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX),
+    db: Database = Depends(get_read_db)
+):
+    ranked = search_index.search(q, limit=limit)
+    if not ranked:
+        return []
+    course_ids = [course_id for course_id, _ in ranked]
+    # Theo thứ tự điểm tìm kiếm, mã hoá JSON ngay trên thread DB như các danh sách khác
+    body = await db.run(encoded(crud.list_courses_by_ids), course_ids, summary=True)
+    return json_response(body)
 
 @app.get("/courses/{course_id}", response_model=CourseOut)
-async def get_course_details(course_id: int, db: pyodbc.Connection = Depends(get_db_connection)):
-    course = get_course_by_id(db, course_id)
+async def get_course_details(course_id: int, loaders: RequestLoaders = Depends(get_read_loaders)):
+    course = await catalog_cache.get_or_load(("course", course_id), lambda: loaders.courses.load(course_id))
     if not course:
         raise HTTPException(status_code=404, detail="Course not found")
-    return course
+    return with_enrollment_count(course)
+
+@app.get("/courses/{course_id}/page", response_model=CourseDetailPage)
+async def get_course_page(course_id: int, user_id: Optional[int] = None, db: Database = Depends(get_read_db)):
+    # Gộp /courses/{id} + /lectures + trạng thái đăng ký vào một request.
+    # Phần khoá học/bài giảng dùng chung cache catalog; chỉ trạng thái đăng ký là theo người xem.
+    async def load_enrollment():
+        return await db.run(crud.get_enrollment, user_id, course_id) if user_id is not None else None
+
+    course = catalog_cache.get(("course", course_id))
+    lectures = catalog_cache.get(("lectures", course_id))
+    if course is MISSING or lectures is MISSING:
+        # Nhiều người cùng mở một khoá chưa có trong cache: phần dùng chung chỉ nạp một lần (single-flight),
+        # trạng thái đăng ký của từng người nạp song song
+        generation = catalog_cache.generation
+        page, enrollment = await asyncio.gather(
+            catalog_flights.do(("page", course_id, generation), lambda: db.run(crud.get_course_page, course_id)),
+            load_enrollment(),
+        )
+        if page is None:
+            raise HTTPException(status_code=404, detail="Course not found")
+        course, lectures = page
+        catalog_cache.set(("course", course_id), course, generation)
+        catalog_cache.set(("lectures", course_id), lectures, generation)
+    else:
+        enrollment = await load_enrollment()
+    return CourseDetailPage(course=with_enrollment_count(course), lectures=lectures,
+                            is_enrolled=enrollment is not None, enrollment=enrollment)
 
 @app.post("/courses", response_model=CourseOut, status_code=status.HTTP_201_CREATED)
 async def create_course(
@@ -280,302 +578,478 @@ async def create_course(
     full_description: Optional[str] = Form(None),
     course_image_url: Optional[str] = Form(None),
     course_image_file: Optional[UploadFile] = File(None),
-    instructor_id: int = Form(...),
     price: float = Form(0.0),
     instructor_bio: Optional[str] = Form(None),
-    db: pyodbc.Connection = Depends(get_db_connection)
+    instructor: TokenClaims = Depends(require_instructor),
+    db: Database = Depends(get_db),
+    loaders: RequestLoaders = Depends(get_loaders)
 ):
-    instructor_user = get_user_by_id(db, instructor_id)
-    if not instructor_user or instructor_user.role != 'instructor':
-        raise HTTPException(status_code=403, detail="Only instructors can create courses or invalid instructor ID.")
 
     image_path_to_save = None
     if course_image_file and course_image_file.filename:
-        extension = course_image_file.filename.split(".")[-1]
-        unique_filename = f"{uuid.uuid4()}.{extension}"
-        file_location = IMAGES_FOLDER / unique_filename
-        
+        extension = await sniffed_extension(course_image_file, IMAGE_SIGNATURES, "Uploaded file is not a supported image format.")
+
         try:
-            async with aiofiles.open(file_location, "wb") as f:
-                while content := await course_image_file.read(1024):
-                    await f.write(content)
-            image_path_to_save = f"/{UPLOAD_FOLDER}/images/{unique_filename}" 
-            print(f"DEBUG: Image file saved successfully to: {file_location}")
-            print(f"DEBUG: Image URL to save in DB: {image_path_to_save}")
+            image_path_to_save = await blob_store.store_upload(
+                db, course_image_file, "images", extension, UPLOAD_CONFIG["max_image_size"]
+            )
+            log.debug("course_image_stored", url=image_path_to_save)
+            image_pipeline.submit(image_path_to_save)
+        except HTTPException:
+            raise
         except Exception as e:
-            print(f"DEBUG: Error saving image file: {e}")
+            log.error("course_image_store_failed", error=str(e))
             raise HTTPException(status_code=500, detail=f"Failed to upload image file: {e}")
     elif course_image_url:
+        if blob_store.is_local(course_image_url) and not await blob_store.acquire(db, course_image_url):
+            raise HTTPException(status_code=400, detail="course_image_url does not refer to a stored upload.")
         image_path_to_save = course_image_url
-        print(f"DEBUG: Using provided image URL: {image_path_to_save}")
+        log.debug("course_image_external", url=image_path_to_save)
     else:
         image_path_to_save = 'https://images.unsplash.com/photo-1517694712202-14dd9538aa97?ixlib=rb-4.0.3&ixid=M3wxMjA3fDB8MHxwaG90by1wYWdlfHx8fGVufDB8fHx8fA%3D%3D&auto=format&fit=crop&w=800&h=400&q=80'
-        print(f"DEBUG: Using default image URL: {image_path_to_save}")
+        log.debug("course_image_default", url=image_path_to_save)
 
-    cursor = db.cursor()
     try:
-        cursor.execute("""
-            INSERT INTO Courses (Title, ImageURL, ShortDescription, FullDescription, Price, InstructorID, InstructorBio)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, 
-        title, 
-        image_path_to_save,
-        short_description, 
-        full_description, 
-        price, 
-        instructor_id,
-        instructor_bio
+        new_course = await db.run(
+            crud.create_course,
+            title,
+            image_path_to_save,
+            short_description,
+            full_description,
+            price,
+            instructor.user_id,
+            instructor_bio,
+            instructor.username
         )
-        db.commit()
-        
-        cursor.execute("SELECT @@IDENTITY AS CourseID")
-        new_course_id = cursor.fetchone()[0]
-
-        return get_course_by_id(db, new_course_id)
+        loaders.courses.prime(new_course.course_id, new_course)
+        invalidate_course_cache()
+        read_router.mark_write(user_read_key(instructor.user_id))
+        search_index.add(new_course.course_id, new_course.title, new_course.short_description, new_course.full_description)
+        return new_course
     except Exception as e:
-        print(f"DEBUG: Database error creating course: {e}")
+        log.error("course_create_failed", error=str(e))
+        await blob_store.release(db, image_path_to_save)
         raise HTTPException(status_code=500, detail=f"Failed to create course: {e}")
 
 @app.delete("/courses/{course_id}")
-async def delete_course(course_id: int, user_id: int, db: pyodbc.Connection = Depends(get_db_connection)):
-    course_to_delete = get_course_by_id(db, course_id)
+async def delete_course(
+    course_id: int,
+    instructor: TokenClaims = Depends(require_instructor),
+    db: Database = Depends(get_db),
+    loaders: RequestLoaders = Depends(get_loaders)
+):
+    # Hai truy vấn độc lập chạy song song
+    course_to_delete, lectures_of_course = await asyncio.gather(
+        loaders.courses.load(course_id),
+        db.run(crud.list_lectures, course_id),
+    )
     if not course_to_delete:
         raise HTTPException(status_code=404, detail="Course not found")
     
-    if course_to_delete.instructor_id != user_id:
+    if course_to_delete.instructor_id != instructor.user_id:
         raise HTTPException(status_code=403, detail="You are not authorized to delete this course.")
 
-    # --- BỔ SUNG LOGIC XÓA FILE ẢNH KHÓA HỌC ---
-    if course_to_delete.image_url and course_to_delete.image_url.startswith(f"/{UPLOAD_FOLDER}/images/"):
-        # Xây dựng đường dẫn vật lý đầy đủ đến file
-        # strip('/') để loại bỏ '/' đầu tiên, sau đó nối với thư mục gốc của project
-        relative_path = course_to_delete.image_url.lstrip('/') 
-        file_to_delete_path = Path(__file__).parent / relative_path # Path(__file__).parent là thư mục chứa main.py
-        
-        print(f"DEBUG: Attempting to delete course image file: {file_to_delete_path}")
-        try:
-            # Kiểm tra xem file có tồn tại và là một file hợp lệ không trước khi xóa
-            if file_to_delete_path.exists() and file_to_delete_path.is_file():
-                file_to_delete_path.unlink() # Xóa file
-                print(f"DEBUG: Successfully deleted file: {file_to_delete_path}")
-            else:
-                print(f"DEBUG: File not found or is not a regular file: {file_to_delete_path}")
-        except OSError as e: # Bắt các lỗi liên quan đến hệ thống file (ví dụ: quyền truy cập)
-            print(f"ERROR: Failed to delete image file {file_to_delete_path}: {e}")
-            # Có thể ném HTTPException nếu muốn báo lỗi cho người dùng
-            # Hoặc chỉ log lỗi và tiếp tục xóa bản ghi DB nếu việc xóa file không bắt buộc
-            raise HTTPException(status_code=500, detail=f"Failed to delete associated image file: {e}. Please check server permissions.")
-    else:
-        print(f"DEBUG: No local image file to delete for course {course_id} (URL: {course_to_delete.image_url})")
-    # --- KẾT THÚC LOGIC XÓA FILE ---
 
-    cursor = db.cursor()
     try:
-        cursor.execute("DELETE FROM Courses WHERE CourseID = ?", course_id)
-        db.commit()
-        return {"message": "Course deleted successfully"}
+        await db.run(crud.delete_course, course_id)
+        invalidate_course_cache(course_id)
+        popularity.remove(course_id)
+        read_router.mark_write(user_read_key(instructor.user_id))
+        search_index.remove(course_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to delete course record from DB: {e}")
 
+    # --- XÓA FILE ẢNH / VIDEO: chỉ xoá khi không còn khoá học hay bài giảng nào dùng chung ---
+    for media_url in [course_to_delete.image_url] + [lecture.video_url for lecture in lectures_of_course]:
+        try:
+            if await blob_store.release(db, media_url):
+                image_pipeline.remove_variants(media_url)
+                log.info("media_file_deleted", url=media_url)
+        except Exception as e:
+            # File còn sót sẽ được dọn bởi `python storage.py gc`
+            log.error("media_release_failed", url=media_url, error=str(e))
+
+    return {"message": "Course deleted successfully"}
+
 # --- Lecture Endpoints ---
-@app.get("/courses/{course_id}/lectures", response_model=List[LectureOut])
-async def get_lectures_for_course(course_id: int, db: pyodbc.Connection = Depends(get_db_connection)):
-    course = get_course_by_id(db, course_id)
-    if not course:
-        raise HTTPException(status_code=404, detail="Course not found")
+async def cached_course_lectures(db: Database, course_id: int) -> List[LectureOut]:
+    async def load_lectures():
+        lectures = await db.run(crud.list_lectures_if_course_exists, course_id)
+        if lectures is None:
+            raise HTTPException(status_code=404, detail="Course not found")
+        return lectures
+
+    return await catalog_cache.get_or_load(("lectures", course_id), load_lectures)
 
-    cursor = db.cursor()
-    cursor.execute("SELECT * FROM Lectures WHERE CourseID = ? ORDER BY LectureOrder ASC", course_id)
-    lectures_rows = cursor.fetchall()
-    return [
-        LectureOut(
-            lecture_id=row.LectureID,
-            course_id=row.CourseID,
-            title=row.Title,
-            video_url=row.VideoURL,
-            description=row.Description,
-            lecture_order=row.LectureOrder
-        ) for row in lectures_rows
-    ]
+@app.get("/courses/{course_id}/lectures", response_model=List[LectureOut])
+async def get_lectures_for_course(course_id: int, db: Database = Depends(get_read_db)):
+    return await cached_course_lectures(db, course_id)
 
 @app.post("/courses/{course_id}/lectures", response_model=LectureOut, status_code=status.HTTP_201_CREATED)
 async def add_lecture_to_course(
     course_id: int, 
-    instructor_id: int = Form(...), 
     title: str = Form(...),
     video_url: Optional[str] = Form(None),
     video_file: Optional[UploadFile] = File(None),
     description: Optional[str] = Form(None),
-    db: pyodbc.Connection = Depends(get_db_connection)
+    instructor: TokenClaims = Depends(require_instructor),
+    db: Database = Depends(get_db),
+    loaders: RequestLoaders = Depends(get_loaders)
 ):
-    course = get_course_by_id(db, course_id)
+    course = await loaders.courses.load(course_id)
     if not course:
         raise HTTPException(status_code=404, detail="Course not found")
     
-    if course.instructor_id != instructor_id:
+    if course.instructor_id != instructor.user_id:
         raise HTTPException(status_code=403, detail="You are not authorized to add lectures to this course.")
 
     video_path_to_save = None
     if video_file and video_file.filename:
-        extension = video_file.filename.split(".")[-1]
-        unique_filename = f"{uuid.uuid4()}.{extension}"
-        file_location = VIDEOS_FOLDER / unique_filename
-        
         if not video_file.content_type.startswith('video/'):
             raise HTTPException(status_code=400, detail="Uploaded file is not a video.")
+        extension = await sniffed_extension(video_file, VIDEO_SIGNATURES, "Uploaded content is not a supported video format.")
 
         try:
-            async with aiofiles.open(file_location, "wb") as f:
-                while content := await video_file.read(1024):
-                    await f.write(content)
-            video_path_to_save = f"/{UPLOAD_FOLDER}/videos/{unique_filename}"
-            print(f"DEBUG: Video file saved successfully to: {file_location}")
-            print(f"DEBUG: Video URL to save in DB: {video_path_to_save}")
+            video_path_to_save = await blob_store.store_upload(
+                db, video_file, "videos", extension, UPLOAD_CONFIG["max_video_size"]
+            )
+            log.debug("lecture_video_stored", url=video_path_to_save)
+        except HTTPException:
+            raise
         except Exception as e:
-            print(f"DEBUG: Error saving video file: {e}")
+            log.error("lecture_video_store_failed", error=str(e))
             raise HTTPException(status_code=500, detail=f"Failed to upload video file: {e}")
     elif video_url:
+        if blob_store.is_local(video_url) and not await blob_store.acquire(db, video_url):
+            raise HTTPException(status_code=400, detail="video_url does not refer to a stored upload.")
         video_path_to_save = video_url
-        print(f"DEBUG: Using provided video URL: {video_path_to_save}")
+        log.debug("lecture_video_external", url=video_path_to_save)
     else:
         video_path_to_save = 'https://www.youtube.com/embed/dQw4w9WgXcQ'
-        print(f"DEBUG: Using default video URL: {video_path_to_save}")
+        log.debug("lecture_video_default", url=video_path_to_save)
 
-    cursor = db.cursor()
     try:
-        cursor.execute("SELECT ISNULL(MAX(LectureOrder), 0) + 1 FROM Lectures WHERE CourseID = ?", course_id)
-        next_order = cursor.fetchone()[0]
-
-        cursor.execute("""
-            INSERT INTO Lectures (CourseID, Title, VideoURL, Description, LectureOrder)
-            VALUES (?, ?, ?, ?, ?)
-        """, 
-        course_id, 
-        title, 
-        video_path_to_save,
-        description, 
-        next_order
-        )
-        db.commit()
-        
-        cursor.execute("SELECT @@IDENTITY AS LectureID")
-        new_lecture_id = cursor.fetchone()[0]
-
-        return LectureOut(
-            lecture_id=new_lecture_id,
-            course_id=course_id,
-            title=title,
-            video_url=video_path_to_save,
-            description=description,
-            lecture_order=next_order
-        )
+        new_lecture = await db.run(crud.create_lecture, course_id, title, video_path_to_save, description)
+        invalidate_lecture_cache(course_id)
+        return new_lecture
     except Exception as e:
-        print(f"DEBUG: Database error adding lecture: {e}")
+        log.error("lecture_create_failed", course_id=course_id, error=str(e))
+        await blob_store.release(db, video_path_to_save)
         raise HTTPException(status_code=500, detail=f"Failed to add lecture: {e}")
 
 @app.delete("/lectures/{lecture_id}")
-async def delete_lecture(lecture_id: int, instructor_id: int, db: pyodbc.Connection = Depends(get_db_connection)):
-    lecture_to_delete = get_lecture_by_id(db, lecture_id)
+async def delete_lecture(
+    lecture_id: int,
+    instructor: TokenClaims = Depends(require_instructor),
+    db: Database = Depends(get_db),
+    loaders: RequestLoaders = Depends(get_loaders)
+):
+    lecture_to_delete = await loaders.lectures.load(lecture_id)
     if not lecture_to_delete:
         raise HTTPException(status_code=404, detail="Lecture not found")
     
-    course_of_lecture = get_course_by_id(db, lecture_to_delete.course_id)
-    if not course_of_lecture or course_of_lecture.instructor_id != instructor_id:
+    course_of_lecture = await loaders.courses.load(lecture_to_delete.course_id)
+    if not course_of_lecture or course_of_lecture.instructor_id != instructor.user_id:
         raise HTTPException(status_code=403, detail="You are not authorized to delete this lecture.")
 
-    # --- BỔ SUNG LOGIC XÓA FILE VIDEO BÀI GIẢNG ---
-    if lecture_to_delete.video_url and lecture_to_delete.video_url.startswith(f"/{UPLOAD_FOLDER}/videos/"):
-        # Xây dựng đường dẫn vật lý đầy đủ đến file
-        relative_path = lecture_to_delete.video_url.lstrip('/')
-        file_to_delete_path = Path(__file__).parent / relative_path
-        
-        print(f"DEBUG: Attempting to delete lecture video file: {file_to_delete_path}")
-        try:
-            if file_to_delete_path.exists() and file_to_delete_path.is_file():
-                file_to_delete_path.unlink()
-                print(f"DEBUG: Successfully deleted file: {file_to_delete_path}")
-            else:
-                print(f"DEBUG: File not found or is not a regular file: {file_to_delete_path}")
-        except OSError as e:
-            print(f"ERROR: Failed to delete video file {file_to_delete_path}: {e}")
-            raise HTTPException(status_code=500, detail=f"Failed to delete associated video file: {e}. Please check server permissions.")
-    else:
-        print(f"DEBUG: No local video file to delete for lecture {lecture_id} (URL: {lecture_to_delete.video_url})")
-    # --- KẾT THÚC LOGIC XÓA FILE ---
-
-    cursor = db.cursor()
     try:
-        cursor.execute("DELETE FROM Lectures WHERE LectureID = ?", lecture_id)
-        db.commit()
-        return {"message": "Lecture deleted successfully"}
+        await db.run(crud.delete_lecture, lecture_id)
+        invalidate_lecture_cache(lecture_to_delete.course_id)
+        catalog_cache.invalidate(("lecture", lecture_id))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to delete lecture record from DB: {e}")
 
-# --- Enrollment Endpoints (giữ nguyên) ---
-@app.post("/enroll", response_model=EnrollmentOut, status_code=status.HTTP_201_CREATED)
-async def enroll_course(enrollment: EnrollmentCreate, db: pyodbc.Connection = Depends(get_db_connection)):
-    user_exists = get_user_by_id(db, enrollment.user_id)
-    if not user_exists:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    course_exists = get_course_by_id(db, enrollment.course_id)
-    if not course_exists:
-        raise HTTPException(status_code=404, detail="Course not found")
+    # --- XÓA FILE VIDEO: chỉ xoá khi không còn bài giảng nào dùng chung ---
+    try:
+        if await blob_store.release(db, lecture_to_delete.video_url):
+            log.info("media_file_deleted", url=lecture_to_delete.video_url)
+    except Exception as e:
+        log.error("media_release_failed", url=lecture_to_delete.video_url, error=str(e))
 
-    cursor = db.cursor()
+    return {"message": "Lecture deleted successfully"}
+
+# --- Lecture Progress Endpoints: heartbeat từ trình phát ghi vào bộ đệm, DB được ghi theo lô ---
+def progress_out(lecture_id: int, position, duration, completed, updated_at) -> LectureProgressOut:
+    return LectureProgressOut(
+        lecture_id=lecture_id,
+        position_seconds=position,
+        duration_seconds=duration,
+        completed=completed,
+        updated_at=updated_at.isoformat()
+    )
+
+@app.post("/lectures/{lecture_id}/progress", response_model=LectureProgressOut, status_code=status.HTTP_202_ACCEPTED)
+async def record_lecture_progress(
+    lecture_id: int,
+    body: LectureProgressUpdate,
+    current_user: TokenClaims = Depends(get_current_user),
+    db: Database = Depends(get_db),
+    loaders: RequestLoaders = Depends(get_loaders)
+):
+    # Bài giảng -> khoá học và việc đã đăng ký lấy từ cache: heartbeat bình thường không chạm DB.
+    # Bài giảng bị xoá cùng khoá học có thể còn trong cache tới hết TTL; upsert bỏ qua các dòng đó.
+    lecture = await catalog_cache.get_or_load(("lecture", lecture_id), lambda: loaders.lectures.load(lecture_id))
+    if not lecture:
+        raise HTTPException(status_code=404, detail="Lecture not found")
+    # Chỉ cache khi đã đăng ký (None không được cache): vừa đăng ký xong là ghi được tiến độ ngay
+    enrollment = await catalog_cache.get_or_load(
+        ("enrollment", current_user.user_id, lecture.course_id),
+        lambda: db.run(crud.get_enrollment, current_user.user_id, lecture.course_id)
+    )
+    if enrollment is None:
+        raise HTTPException(status_code=403, detail="You are not enrolled in this course.")
     try:
-        cursor.execute("INSERT INTO Enrollments (UserID, CourseID) VALUES (?, ?)", 
-                       enrollment.user_id, enrollment.course_id)
-        db.commit()
-        
-        cursor.execute("SELECT @@IDENTITY AS EnrollmentID")
-        new_enrollment_id = cursor.fetchone()[0]
-
-        return EnrollmentOut(
-            enrollment_id=new_enrollment_id,
-            user_id=enrollment.user_id,
-            course_id=enrollment.course_id,
-            enrollment_date=db.execute("SELECT EnrollmentDate FROM Enrollments WHERE EnrollmentID = ?", new_enrollment_id).fetchone()[0].isoformat()
+        entry = progress_buffer.record(
+            current_user.user_id, lecture_id, lecture.course_id,
+            body.position_seconds, body.duration_seconds, body.completed
         )
-    except pyodbc.IntegrityError:
+    except BufferFull:
+        raise HTTPException(status_code=503, detail="Progress buffer is full, please retry later.",
+                            headers={"Retry-After": str(int(progress_buffer.flush_interval) or 1)})
+    return progress_out(lecture_id, entry.position, entry.duration, entry.completed, entry.updated_at)
+
+@app.get("/users/{user_id}/courses/{course_id}/progress", response_model=CourseProgressOut)
+async def get_course_progress(
+    user_id: int,
+    course_id: int,
+    current_user: TokenClaims = Depends(get_current_user),
+    db: Database = Depends(get_db)
+):
+    if current_user.user_id != user_id:
+        raise HTTPException(status_code=403, detail="You can only view your own progress.")
+    # Đọc primary: dòng vừa ghi khỏi bộ đệm có thể chưa tới replica
+    lectures, stored = await asyncio.gather(
+        cached_course_lectures(db, course_id),
+        db.run(crud.list_course_progress, user_id, course_id),
+    )
+    items = []
+    for lecture in lectures:
+        buffered = progress_buffer.get(user_id, lecture.lecture_id)
+        saved = stored.get(lecture.lecture_id)
+        if buffered is not None:
+            # Heartbeat chưa ghi mới hơn DB; Completed đã lưu vẫn giữ (chỉ bật, không tắt)
+            completed = buffered.completed or (saved is not None and saved[2])
+            items.append(progress_out(lecture.lecture_id, buffered.position, buffered.duration or (saved and saved[1]),
+                                      completed, buffered.updated_at))
+        elif saved is not None:
+            items.append(progress_out(lecture.lecture_id, *saved))
+    return CourseProgressOut(
+        user_id=user_id,
+        course_id=course_id,
+        total_lectures=len(lectures),
+        completed_lectures=sum(1 for item in items if item.completed),
+        lectures=items
+    )
+
+# --- Resumable Upload Endpoints (upload video nhiều phần, có thể tiếp tục khi mất kết nối) ---
+def upload_status_headers(session):
+    return {
+        "Upload-Offset": str(session["offset"]),
+        "Upload-Length": str(session["size"]),
+        "Cache-Control": "no-store",
+    }
+
+# Phiên upload chỉ dành cho giảng viên và chỉ người tạo phiên được đọc / ghi / huỷ / hoàn tất
+@app.post("/upload-sessions", status_code=status.HTTP_201_CREATED)
+async def create_upload_session(
+    body: UploadSessionCreate,
+    response: Response,
+    instructor: TokenClaims = Depends(require_instructor)
+):
+    session = upload_sessions.create(body.filename, body.size, body.content_type, instructor.user_id)
+    response.headers.update(upload_status_headers(session))
+    response.headers["Location"] = f"/upload-sessions/{session['upload_id']}"
+    return session
+
+@app.api_route("/upload-sessions/{upload_id}", methods=["GET", "HEAD"])
+async def get_upload_session(upload_id: str, response: Response, instructor: TokenClaims = Depends(require_instructor)):
+    session = upload_sessions.status(upload_id, instructor.user_id)
+    response.headers.update(upload_status_headers(session))
+    return session
+
+@app.patch("/upload-sessions/{upload_id}")
+async def upload_chunk(
+    upload_id: str,
+    request: Request,
+    response: Response,
+    instructor: TokenClaims = Depends(require_instructor)
+):
+    offset_header = request.headers.get("upload-offset")
+    if offset_header is None or not offset_header.isdigit():
+        raise HTTPException(status_code=400, detail="Missing or invalid Upload-Offset header.")
+    session = await upload_sessions.append(upload_id, int(offset_header), request.stream(), instructor.user_id)
+    response.headers.update(upload_status_headers(session))
+    return session
+
+@app.delete("/upload-sessions/{upload_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def cancel_upload_session(upload_id: str, instructor: TokenClaims = Depends(require_instructor)):
+    upload_sessions.delete(upload_id, instructor.user_id)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+@app.post("/upload-sessions/{upload_id}/lecture", response_model=LectureOut, status_code=status.HTTP_201_CREATED)
+async def finalize_upload_as_lecture(
+    upload_id: str,
+    body: UploadFinalize,
+    instructor: TokenClaims = Depends(require_instructor),
+    db: Database = Depends(get_db),
+    loaders: RequestLoaders = Depends(get_loaders)
+):
+    course = await loaders.courses.load(body.course_id)
+    if not course:
+        raise HTTPException(status_code=404, detail="Course not found")
+    if course.instructor_id != instructor.user_id:
+        raise HTTPException(status_code=403, detail="You are not authorized to add lectures to this course.")
+
+    file_location = upload_sessions.finalize(upload_id, PARTIAL_UPLOADS_FOLDER, instructor.user_id)
+    video_path_to_save = await blob_store.store_file(db, file_location, "videos", file_location.suffix.lstrip("."))
+    try:
+        new_lecture = await db.run(crud.create_lecture, body.course_id, body.title, video_path_to_save, body.description)
+    except Exception as e:
+        await blob_store.release(db, video_path_to_save)
+        raise HTTPException(status_code=500, detail=f"Failed to add lecture: {e}")
+    invalidate_lecture_cache(body.course_id)
+    return new_lecture
+
+# --- Enrollment Endpoints (giữ nguyên) ---
+@app.post("/enroll", response_model=EnrollmentOut, status_code=status.HTTP_201_CREATED)
+async def enroll_course(enrollment: EnrollmentCreate, db: Database = Depends(get_db)):
+    try:
+        new_enrollment = await db.run(crud.create_enrollment, enrollment.user_id, enrollment.course_id)
+    except crud.EnrollmentError as ex:
+        if ex.reason == "user_not_found":
+            raise HTTPException(status_code=404, detail="User not found")
+        if ex.reason == "course_not_found":
+            raise HTTPException(status_code=404, detail="Course not found")
         raise HTTPException(status_code=400, detail="User already enrolled in this course.")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Enrollment failed: {e}")
+    read_router.mark_write(user_read_key(enrollment.user_id))
+    popularity.record(enrollment.course_id)
+    catalog_version.bump()
+    return new_enrollment
+
+@app.post("/enroll/bulk", response_model=BulkEnrollmentOut)
+async def bulk_enroll(
+    body: BulkEnrollmentCreate,
+    instructor: TokenClaims = Depends(require_instructor),
+    db: Database = Depends(get_db),
+    loaders: RequestLoaders = Depends(get_loaders)
+):
+    # Giảng viên chỉ đăng ký học viên vào khoá học của chính mình; khoá không tồn tại để DB báo course_not_found
+    courses = await loaders.courses.load_many({item.course_id for item in body.items})
+    forbidden = {course.course_id for course in courses if course and course.instructor_id != instructor.user_id}
+    pairs, seen = [], set()
+    for item in body.items:
+        key = (item.user_id, item.course_id)
+        if key not in seen and item.course_id not in forbidden:
+            seen.add(key)
+            pairs.append(key)
+    try:
+        outcomes = await db.run(crud.bulk_create_enrollments, pairs)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Bulk enrollment failed: {e}")
+    enrolled_pairs = [pair for pair, outcome in outcomes.items() if isinstance(outcome, EnrollmentOut)]
+    read_router.mark_write(*{user_read_key(user_id) for user_id, _ in enrolled_pairs})
+    for _, course_id in enrolled_pairs:
+        popularity.record(course_id)
+    if enrolled_pairs:
+        catalog_version.bump()
+
+    results, reported = [], set()
+    for item in body.items:
+        key = (item.user_id, item.course_id)
+        outcome = outcomes.get(key)
+        if item.course_id in forbidden:
+            results.append(BulkEnrollmentResult(user_id=item.user_id, course_id=item.course_id, status="forbidden"))
+        elif key in reported:
+            results.append(BulkEnrollmentResult(user_id=item.user_id, course_id=item.course_id, status="duplicate_in_request"))
+        elif isinstance(outcome, EnrollmentOut):
+            results.append(BulkEnrollmentResult(
+                user_id=item.user_id,
+                course_id=item.course_id,
+                status="enrolled",
+                enrollment_id=outcome.enrollment_id,
+                enrollment_date=outcome.enrollment_date
+            ))
+        else:
+            results.append(BulkEnrollmentResult(user_id=item.user_id, course_id=item.course_id, status=outcome or "already_enrolled"))
+        reported.add(key)
+    enrolled = sum(1 for result in results if result.status == "enrolled")
+    return BulkEnrollmentOut(enrolled=enrolled, failed=len(results) - enrolled, results=results)
 
-@app.get("/users/{user_id}/enrolled_courses", response_model=List[CourseOut])
-async def get_user_enrolled_courses(user_id: int, db: pyodbc.Connection = Depends(get_db_connection)):
-    user_exists = get_user_by_id(db, user_id)
+@app.get("/users/{user_id}/enrolled_courses", response_model=CoursePage)
+async def get_user_enrolled_courses(
+    user_id: int,
+    cursor: Optional[int] = None,
+    limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX),
+    fields: str = Query("full", regex="^(full|summary)$"),
+    db: Database = Depends(get_read_db),
+    loaders: RequestLoaders = Depends(get_read_loaders)
+):
+    user_exists, page = await asyncio.gather(
+        loaders.users.load(user_id),
+        db.run(encoded(crud.list_enrolled_courses), user_id, cursor=cursor, limit=limit, summary=fields == "summary"),
+    )
     if not user_exists:
         raise HTTPException(status_code=404, detail="User not found")
+    return json_response(page)
 
-    cursor = db.cursor()
-    cursor.execute("""
-        SELECT c.*, u.Username AS InstructorName
-        FROM Courses c
-        JOIN Enrollments e ON c.CourseID = e.CourseID
-        JOIN Users u ON c.InstructorID = u.UserID
-        WHERE e.UserID = ?
-        ORDER BY e.EnrollmentDate DESC
-    """, user_id)
-    courses_rows = cursor.fetchall()
-    return [CourseOut.from_row(row) for row in courses_rows]
-
-@app.get("/users/{user_id}/created_courses", response_model=List[CourseOut])
-async def get_user_created_courses(user_id: int, db: pyodbc.Connection = Depends(get_db_connection)):
-    user_exists = get_user_by_id(db, user_id)
+@app.get("/users/{user_id}/created_courses", response_model=CoursePage)
+async def get_user_created_courses(
+    user_id: int,
+    cursor: Optional[int] = None,
+    limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX),
+    fields: str = Query("full", regex="^(full|summary)$"),
+    db: Database = Depends(get_read_db),
+    loaders: RequestLoaders = Depends(get_read_loaders)
+):
+    user_exists, page = await asyncio.gather(
+        loaders.users.load(user_id),
+        db.run(encoded(crud.list_created_courses), user_id, cursor=cursor, limit=limit, summary=fields == "summary"),
+    )
     if not user_exists or user_exists.role != 'instructor':
         raise HTTPException(status_code=403, detail="User is not an instructor or not found.")
+    return json_response(page)
+
+# --- Media Endpoints: phát video/ảnh đã upload, hỗ trợ Range (tua video) và ETag ---
+MEDIA_FOLDERS = {
+    "images": IMAGES_FOLDER,
+    "videos": VIDEOS_FOLDER,
+}
+
+@app.api_route("/media/{kind}/{filename}", methods=["GET", "HEAD"])
+async def serve_media(kind: str, filename: str, request: Request):
+    folder = MEDIA_FOLDERS.get(kind)
+    if folder is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    path = resolve_media_path(folder, filename)
+    media_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    return media_response(
+        path,
+        media_type,
+        range_header=request.headers.get("range"),
+        if_none_match=request.headers.get("if-none-match"),
+        if_range=request.headers.get("if-range"),
+        send_body=request.method != "HEAD",
+    )
+
+@app.get("/health/db")
+async def database_pool_stats(db: Database = Depends(get_db)):
+    return {**db.stats(), "read_routing": read_router.stats(), "progress_buffer": progress_buffer.stats()}
+
+@app.get("/health/images")
+async def image_pipeline_stats():
+    return image_pipeline.stats()
+
+@app.get("/health/cache")
+async def catalog_cache_stats():
+    return {"catalog": catalog_cache.stats(), "singleflight": catalog_flights.stats(), "search_index": search_index.stats(),
+            "http": http_cache.stats(), "auth": token_signer.stats(), "ranking": popularity.stats(),
+            "admission": admission.stats()}
 
-    cursor = db.cursor()
-    cursor.execute("""
-        SELECT c.*, u.Username AS InstructorName
-        FROM Courses c
-        JOIN Users u ON c.InstructorID = u.UserID
-        WHERE c.InstructorID = ?
-        ORDER BY c.CourseID DESC
-    """, user_id)
-    courses_rows = cursor.fetchall()
-    return [CourseOut.from_row(row) for row in courses_rows]
+@app.get("/metrics")
+async def prometheus_metrics():
+    return Response(content=metrics_registry.render(), media_type=PROMETHEUS_CONTENT_TYPE)
 
 @app.get("/")
 async def root():
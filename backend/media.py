@@ -0,0 +1,130 @@
+import os
+import re
+from email.utils import formatdate
+from pathlib import Path
+
+import anyio
+from fastapi import HTTPException
+from starlette.responses import Response
+
+# File upload có tên UUID nên nội dung không bao giờ đổi -> cache lâu dài
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+CHUNK_SIZE = 1024 * 1024
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def resolve_media_path(folder: Path, filename: str) -> Path:
+    # Chặn path traversal: chỉ chấp nhận tên file nằm trực tiếp trong thư mục
+    if not filename or Path(filename).name != filename or filename.startswith("."):
+        raise HTTPException(status_code=404, detail="File not found")
+    path = folder / filename
+    if not path.is_file():
+        raise HTTPException(status_code=404, detail="File not found")
+    return path
+
+
+def make_etag(stat: os.stat_result) -> str:
+    return f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+
+def etag_matches(header_value: str, etag: str) -> bool:
+    if not header_value:
+        return False
+    if header_value.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in header_value.split(",")]
+    # So sánh yếu cho If-None-Match: bỏ tiền tố W/
+    return any(tag[2:] == etag if tag.startswith("W/") else tag == etag for tag in candidates)
+
+
+def parse_range(header_value: str, size: int):
+    """Trả về (start, end) bao gồm cả end, None nếu không hỗ trợ (trả 200 toàn bộ file).
+
+    Ném ValueError nếu range không thoả mãn được (416).
+    """
+    match = _RANGE_RE.match(header_value.strip())
+    if not match:
+        return None  # nhiều range hoặc sai cú pháp: bỏ qua Range theo RFC 7233
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # bytes=-N: N byte cuối
+        length = int(last)
+        if length == 0:
+            raise ValueError("empty suffix range")
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError("unsatisfiable range")
+    return start, min(end, size - 1)
+
+
+class RangeFileResponse(Response):
+    """Gửi một đoạn [start, end] của file theo các khối 1 MiB.
+
+    Mỗi lần đọc chạy trên thread của anyio (như FileResponse của Starlette): đọc đĩa khi
+    page cache nguội không chặn event loop. Luôn gửi `http.response.body` để đi được qua
+    các middleware dạng BaseHTTPMiddleware.
+    """
+
+    def __init__(self, path: Path, start: int, end: int, status_code: int, headers: dict, media_type: str,
+                 send_body: bool = True):
+        super().__init__(status_code=status_code, headers=headers, media_type=media_type)
+        self.path = path
+        self.start = start
+        self.end = end
+        self.send_body = send_body
+        self.headers["content-length"] = str(end - start + 1 if end >= start else 0)
+
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        count = self.end - self.start + 1
+        if not self.send_body or count <= 0:
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        async with await anyio.open_file(self.path, "rb") as f:
+            await f.seek(self.start)
+            remaining = count
+            while remaining > 0:
+                chunk = await f.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break  # file bị cắt ngắn giữa chừng
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0:
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+def media_response(path: Path, media_type: str, range_header: str = None, if_none_match: str = None,
+                   if_range: str = None, send_body: bool = True) -> Response:
+    stat = path.stat()
+    size = stat.st_size
+    etag = make_etag(stat)
+    headers = {
+        "accept-ranges": "bytes",
+        "etag": etag,
+        "last-modified": formatdate(stat.st_mtime, usegmt=True),
+        "cache-control": IMMUTABLE_CACHE_CONTROL,
+    }
+
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    byte_range = None
+    # If-Range: chỉ áp dụng Range khi client còn giữ đúng phiên bản file
+    if range_header and (not if_range or if_range.strip() == etag):
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            return Response(status_code=416, headers={**headers, "content-range": f"bytes */{size}"})
+
+    if byte_range is None or size == 0:
+        return RangeFileResponse(path, 0, size - 1, 200, headers, media_type, send_body)
+
+    start, end = byte_range
+    headers["content-range"] = f"bytes {start}-{end}/{size}"
+    return RangeFileResponse(path, start, end, 206, headers, media_type, send_body)
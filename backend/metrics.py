@@ -0,0 +1,184 @@
+import bisect
+import re
+import threading
+import time
+
+# Mốc histogram (giây) cho độ trễ request và câu SQL
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_labels(labelnames, values):
+    if not labelnames:
+        return ""
+    pairs = []
+    for name, value in zip(labelnames, values):
+        escaped = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        pairs.append(f'{name}="{escaped}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [đếm theo từng mốc..., tổng, số lần]
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        bucket_labels = self.labelnames + ("le",)
+        with self._lock:
+            for labels, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), series):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_format_labels(bucket_labels, labels + (_format_value(bound),))} {cumulative}")
+                label_text = _format_labels(self.labelnames, labels)
+                lines.append(f"{self.name}_sum{label_text} {_format_value(series[-2])}")
+                lines.append(f"{self.name}_count{label_text} {series[-1]}")
+        return lines
+
+
+class MetricsRegistry:
+    """Các metric trong bộ nhớ của tiến trình, xuất ra định dạng text của Prometheus.
+
+    `gauge(name, doc, fn)` đăng ký số liệu đọc tại thời điểm scrape (kích thước pool, hàng đợi, ...).
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._gauges = []
+
+    def counter(self, name, documentation, labelnames=()):
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def gauge(self, name, documentation, fn):
+        self._gauges.append((name, documentation, fn))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for name, documentation, fn in self._gauges:
+            try:
+                value = fn()
+            except Exception:
+                continue
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+# --- Chuẩn hoá câu SQL để dùng làm nhãn: bỏ giá trị cụ thể, gộp danh sách IN (...) ---
+_SQL_STRING = re.compile(r"N?'(?:[^']|'')*'")
+_SQL_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_SQL_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SQL_SPACES = re.compile(r"\s+")
+SQL_LABEL_MAX_LENGTH = 300
+
+
+def normalize_sql(sql: str) -> str:
+    sql = _SQL_STRING.sub("?", sql)
+    sql = _SQL_NUMBER.sub("?", sql)
+    sql = _SQL_SPACES.sub(" ", sql).strip()
+    sql = _SQL_IN_LIST.sub("(?...)", sql)
+    return sql[:SQL_LABEL_MAX_LENGTH]
+
+
+class RequestMetrics:
+    """Middleware HTTP: histogram độ trễ và bộ đếm status theo route (dùng mẫu đường dẫn, không dùng id)."""
+
+    def __init__(self, registry: MetricsRegistry):
+        self.latency = registry.histogram(
+            "http_request_duration_seconds", "HTTP request latency by route.", ("method", "route"))
+        self.responses = registry.counter(
+            "http_responses_total", "HTTP responses by route and status code.", ("method", "route", "status"))
+        self.in_flight = 0
+        registry.gauge("http_requests_in_flight", "HTTP requests currently being handled.", lambda: self.in_flight)
+
+    async def __call__(self, request, call_next):
+        started = time.perf_counter()
+        self.in_flight += 1
+        status_code = 500
+        try:
+            response = await call_next(request)
+            status_code = response.status_code
+            return response
+        finally:
+            self.in_flight -= 1
+            route = request.scope.get("route")
+            route_path = getattr(route, "path", "unmatched")
+            self.latency.observe((request.method, route_path), time.perf_counter() - started)
+            self.responses.inc((request.method, route_path, str(status_code)))
+
+
+class QueryMetrics:
+    """Nhận thời gian từng câu SQL (từ TracedConnection) và ghi histogram theo câu đã chuẩn hoá."""
+
+    def __init__(self, registry: MetricsRegistry, slow_query_seconds: float = 0.5, logger=None):
+        self.latency = registry.histogram(
+            "db_query_duration_seconds", "SQL statement execution time by normalized statement.", ("statement",))
+        self.errors = registry.counter(
+            "db_query_errors_total", "SQL statements that raised an error.", ("statement",))
+        self.slow_query_seconds = slow_query_seconds
+        self.logger = logger
+        self._normalized = {}
+
+    def __call__(self, sql: str, seconds: float, error: BaseException = None):
+        statement = self._normalized.get(sql)
+        if statement is None:
+            statement = normalize_sql(sql)
+            if len(self._normalized) < 10000:
+                self._normalized[sql] = statement
+        self.latency.observe((statement,), seconds)
+        if error is not None:
+            self.errors.inc((statement,))
+        if self.logger is not None and seconds >= self.slow_query_seconds:
+            self.logger.warning("slow_query", statement=statement, duration_ms=round(seconds * 1000, 2))
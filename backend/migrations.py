@@ -0,0 +1,232 @@
+from __future__ import annotations
+
+import argparse
+from typing import TYPE_CHECKING
+
+import db_errors
+
+if TYPE_CHECKING:
+    import pyodbc
+
+# Migration schema theo phiên bản. Mỗi migration chạy trong một giao dịch, bắt đầu bằng việc ghi
+# dòng SchemaVersions của nó: nhiều worker khởi động cùng lúc sẽ nối đuôi nhau trên khoá chính đó,
+# worker đến sau gặp IntegrityError và bỏ qua. Câu lệnh viết bằng T-SQL (sqlite_backend dịch cho
+# SQLite); câu dạng (backend, sql) chỉ chạy trên backend đó. Các bảng / chỉ mục có thể đã được tạo
+# tay trên DB cũ nên mọi câu CREATE đều kiểm tra tồn tại trước.
+# Không sửa migration đã phát hành, thêm migration mới với số phiên bản lớn hơn.
+
+
+class Migration:
+    def __init__(self, version: int, name: str, statements):
+        self.version = version
+        self.name = name
+        self.statements = statements
+
+    def statements_for(self, backend: str):
+        for statement in self.statements:
+            if isinstance(statement, tuple):
+                only, statement = statement
+                if only != backend:
+                    continue
+            yield statement
+
+
+def _create_index(name, table, columns):
+    return f"""
+        IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = '{name}' AND object_id = OBJECT_ID('dbo.{table}'))
+        CREATE INDEX {name} ON {table} ({columns})
+    """
+
+
+def _name_foreign_key(table, referenced_table):
+    # Khoá ngoại khai báo inline có tên tự sinh; đặt tên cố định để phân loại lỗi vi phạm (crud.py).
+    # SQLite không lưu tên ràng buộc, sqlite_backend suy ra cùng tên từ bảng con / bảng cha.
+    name = db_errors.foreign_key_name(table, referenced_table)
+    return ("mssql", f"""
+        DECLARE @current SYSNAME = (
+            SELECT TOP 1 name FROM sys.foreign_keys
+            WHERE parent_object_id = OBJECT_ID('dbo.{table}') AND referenced_object_id = OBJECT_ID('dbo.{referenced_table}')
+        );
+        IF @current IS NOT NULL AND @current <> N'{name}'
+        BEGIN
+            DECLARE @qualified NVARCHAR(300) = N'dbo.' + QUOTENAME(@current);
+            EXEC sp_rename @qualified, N'{name}', N'OBJECT';
+        END
+    """)
+
+
+MIGRATIONS = [
+    Migration(1, "initial_schema", [
+        """
+        IF OBJECT_ID('dbo.Users', 'U') IS NULL
+        CREATE TABLE Users (
+            UserID INT IDENTITY(1,1) PRIMARY KEY,
+            Username NVARCHAR(100) NOT NULL UNIQUE,
+            Email NVARCHAR(255) NOT NULL CONSTRAINT UQ_Users_Email UNIQUE,
+            Password NVARCHAR(255) NOT NULL,
+            Role NVARCHAR(20) NOT NULL DEFAULT 'student'
+        )
+        """,
+        """
+        IF OBJECT_ID('dbo.Courses', 'U') IS NULL
+        CREATE TABLE Courses (
+            CourseID INT IDENTITY(1,1) PRIMARY KEY,
+            Title NVARCHAR(255) NOT NULL,
+            ImageURL NVARCHAR(500) NULL,
+            ShortDescription NVARCHAR(500) NULL,
+            FullDescription NVARCHAR(MAX) NULL,
+            Price DECIMAL(18, 2) NOT NULL DEFAULT 0,
+            InstructorID INT NOT NULL REFERENCES Users(UserID),
+            InstructorBio NVARCHAR(MAX) NULL
+        )
+        """,
+        """
+        IF OBJECT_ID('dbo.Lectures', 'U') IS NULL
+        CREATE TABLE Lectures (
+            LectureID INT IDENTITY(1,1) PRIMARY KEY,
+            CourseID INT NOT NULL REFERENCES Courses(CourseID) ON DELETE CASCADE,
+            Title NVARCHAR(255) NOT NULL,
+            VideoURL NVARCHAR(500) NULL,
+            Description NVARCHAR(MAX) NULL,
+            LectureOrder INT NOT NULL
+        )
+        """,
+        """
+        IF OBJECT_ID('dbo.Enrollments', 'U') IS NULL
+        CREATE TABLE Enrollments (
+            EnrollmentID INT IDENTITY(1,1) PRIMARY KEY,
+            UserID INT NOT NULL REFERENCES Users(UserID) ON DELETE CASCADE,
+            CourseID INT NOT NULL REFERENCES Courses(CourseID) ON DELETE CASCADE,
+            EnrollmentDate DATETIME NOT NULL DEFAULT SYSUTCDATETIME(),
+            CONSTRAINT UQ_Enrollments_User_Course UNIQUE (UserID, CourseID)
+        )
+        """,
+    ]),
+    Migration(2, "media_blobs", [
+        """
+        IF OBJECT_ID('dbo.MediaBlobs', 'U') IS NULL
+        CREATE TABLE MediaBlobs (
+            Digest CHAR(64) NOT NULL PRIMARY KEY,
+            Url NVARCHAR(400) NOT NULL UNIQUE,
+            SizeBytes BIGINT NOT NULL,
+            RefCount INT NOT NULL,
+            CreatedAt DATETIME2 NOT NULL DEFAULT SYSUTCDATETIME()
+        )
+        """,
+    ]),
+    # Đường truy cập của các endpoint (xem benchmarks/check_plans.py)
+    Migration(3, "access_path_indexes", [
+        _create_index("IX_Courses_InstructorID", "Courses", "InstructorID"),              # created_courses
+        _create_index("IX_Lectures_CourseID", "Lectures", "CourseID, LectureOrder"),      # bài giảng theo thứ tự, MAX(LectureOrder)
+        _create_index("IX_Enrollments_CourseID", "Enrollments", "CourseID"),              # đếm đăng ký, xoá khoá học
+        # enrolled_courses: WHERE UserID = ? ORDER BY EnrollmentID DESC (keyset, cùng thứ tự EnrollmentDate)
+        _create_index("IX_Enrollments_UserID", "Enrollments", "UserID, EnrollmentID"),
+        _create_index("IX_Enrollments_EnrollmentDate", "Enrollments", "EnrollmentDate, CourseID"),  # trending
+        # Đăng nhập theo Email: DB tạo tay có thể thiếu ràng buộc UNIQUE (SQLite luôn có từ migration 1)
+        ("mssql", """
+            IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name IN ('UQ_Users_Email', 'IX_Users_Email')
+                           AND object_id = OBJECT_ID('dbo.Users'))
+            CREATE INDEX IX_Users_Email ON Users (Email)
+        """),
+    ]),
+    Migration(4, "lecture_progress", [
+        """
+        IF OBJECT_ID('dbo.LectureProgress', 'U') IS NULL
+        CREATE TABLE LectureProgress (
+            UserID INT NOT NULL REFERENCES Users(UserID),
+            LectureID INT NOT NULL REFERENCES Lectures(LectureID) ON DELETE CASCADE,
+            CourseID INT NOT NULL,
+            PositionSeconds FLOAT NOT NULL,
+            DurationSeconds FLOAT NULL,
+            Completed BIT NOT NULL DEFAULT 0,
+            UpdatedAt DATETIME2 NOT NULL,
+            PRIMARY KEY (UserID, LectureID)
+        )
+        """,
+        _create_index("IX_LectureProgress_LectureID", "LectureProgress", "LectureID"),  # xoá bài giảng (cascade)
+    ]),
+    Migration(5, "named_enrollment_foreign_keys", [
+        _name_foreign_key("Enrollments", "Users"),
+        _name_foreign_key("Enrollments", "Courses"),
+    ]),
+    Migration(6, "course_price_index", [
+        # list_courses lọc theo giá (is_free / min_price / max_price) rồi ORDER BY CourseID DESC:
+        # không có chỉ mục thì quét khoá chính tới khi đủ trang, có thể đọc gần hết bảng
+        _create_index("IX_Courses_Price", "Courses", "Price, CourseID"),
+    ]),
+]
+
+
+def ensure_versions_table(db: pyodbc.Connection):
+    cursor = db.cursor()
+    cursor.execute("""
+        IF OBJECT_ID('dbo.SchemaVersions', 'U') IS NULL
+        CREATE TABLE SchemaVersions (
+            Version INT NOT NULL PRIMARY KEY,
+            Name NVARCHAR(200) NOT NULL,
+            AppliedAt DATETIME2 NOT NULL DEFAULT SYSUTCDATETIME()
+        )
+    """)
+    db.commit()
+
+
+def applied_versions(db: pyodbc.Connection):
+    cursor = db.cursor()
+    cursor.execute("SELECT Version FROM SchemaVersions")
+    return {row.Version for row in cursor.fetchall()}
+
+
+def migrate(db: pyodbc.Connection, backend: str = "mssql", target: int = None):
+    """Áp dụng các migration chưa chạy (đến `target` nếu có), trả về danh sách phiên bản vừa áp dụng."""
+    ensure_versions_table(db)
+    applied = applied_versions(db)
+    cursor = db.cursor()
+    done = []
+    for migration in MIGRATIONS:
+        if migration.version in applied or (target is not None and migration.version > target):
+            continue
+        autocommit = db.autocommit
+        db.autocommit = False
+        try:
+            try:
+                # Ghi phiên bản trước: worker khác đang áp dụng cùng migration sẽ chờ khoá dòng này
+                cursor.execute("INSERT INTO SchemaVersions (Version, Name) VALUES (?, ?)", migration.version, migration.name)
+            except db_errors.IntegrityError:
+                db.rollback()  # worker khác vừa áp dụng migration này
+                continue
+            # Lỗi trong chính migration (kể cả IntegrityError, ví dụ dữ liệu trùng khi tạo UNIQUE) không được bỏ qua
+            for statement in migration.statements_for(backend):
+                cursor.execute(statement)
+            db.commit()
+            done.append(migration.version)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.autocommit = autocommit
+    return done
+
+
+def status(db: pyodbc.Connection):
+    ensure_versions_table(db)
+    applied = applied_versions(db)
+    return [{"version": m.version, "name": m.name, "applied": m.version in applied} for m in MIGRATIONS]
+
+
+def main():
+    import json
+    from database import DB_BACKEND, db_pool
+
+    parser = argparse.ArgumentParser(description="Tạo / cập nhật schema DB theo phiên bản.")
+    parser.add_argument("command", choices=["migrate", "status"])
+    parser.add_argument("--target", type=int, default=None, help="chỉ áp dụng đến phiên bản này")
+    args = parser.parse_args()
+
+    with db_pool.connection() as db:
+        if args.command == "migrate":
+            print(json.dumps({"applied": migrate(db, DB_BACKEND, args.target)}))
+        print(json.dumps(status(db), indent=2))
+
+
+if __name__ == "__main__":
+    main()
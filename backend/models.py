@@ -0,0 +1,152 @@
+from pydantic import BaseModel, confloat, conlist
+from typing import Dict, List, Optional
+
+from images import variant_urls
+from ranking import popularity
+
+# --- Pydantic Models (giữ nguyên) ---
+class UserBase(BaseModel):
+    username: str
+    email: str
+
+class UserCreate(UserBase):
+    password: str
+
+class UserLogin(BaseModel):
+    email: str
+    password: str
+
+class UserOut(UserBase):
+    user_id: int
+    role: str
+
+    class Config:
+        orm_mode = True
+
+# Kết quả đăng nhập: thông tin người dùng + token phiên (gửi lại qua header Authorization: Bearer)
+class SessionOut(UserOut):
+    access_token: str
+    token_type: str = "bearer"
+    expires_at: int
+
+class CourseBase(BaseModel):
+    title: str
+    image_url: Optional[str] = None
+    short_description: Optional[str] = None
+    full_description: Optional[str] = None
+    price: float
+    instructor_bio: Optional[str] = None
+
+class CourseOut(CourseBase):
+    course_id: int
+    instructor_id: int
+    instructor_name: Optional[str] = None
+    is_free: bool = False
+    image_variants: Optional[Dict[str, str]] = None  # card / hero (JPEG + WebP) nếu đã được tạo
+    enrollment_count: int = 0  # từ ranking.popularity (bộ nhớ), không đếm lại trong DB
+
+    @staticmethod
+    def from_row(row):
+        price = float(row.Price)
+        return CourseOut(
+            course_id=row.CourseID,
+            title=row.Title,
+            image_url=row.ImageURL,
+            short_description=row.ShortDescription,
+            full_description=getattr(row, 'FullDescription', None),
+            price=price,
+            instructor_id=row.InstructorID,
+            instructor_bio=getattr(row, 'InstructorBio', None),
+            instructor_name=getattr(row, 'InstructorName', None),
+            is_free=price == 0.0,
+            image_variants=variant_urls(row.ImageURL),
+            enrollment_count=popularity.count(row.CourseID)
+        )
+
+    class Config:
+        orm_mode = True
+
+# Một trang kết quả phân trang keyset: truyền next_cursor vào ?cursor= để lấy trang kế tiếp
+class CoursePage(BaseModel):
+    items: List[CourseOut]
+    next_cursor: Optional[int] = None
+
+class LectureBase(BaseModel):
+    title: str
+    video_url: Optional[str] = None
+    description: Optional[str] = None
+
+class LectureOut(LectureBase):
+    lecture_id: int
+    course_id: int
+    lecture_order: int
+
+    class Config:
+        orm_mode = True
+
+class EnrollmentCreate(BaseModel):
+    user_id: int
+    course_id: int
+
+class EnrollmentOut(BaseModel):
+    enrollment_id: int
+    user_id: int
+    course_id: int
+    enrollment_date: str
+    
+    class Config:
+        orm_mode = True
+
+# Trang chi tiết khoá học: khoá học + bài giảng + trạng thái đăng ký của người xem, trong một response
+class CourseDetailPage(BaseModel):
+    course: CourseOut
+    lectures: List[LectureOut]
+    is_enrolled: bool = False
+    enrollment: Optional[EnrollmentOut] = None
+
+BULK_ENROLL_MAX_ITEMS = 10000
+
+class BulkEnrollmentCreate(BaseModel):
+    items: conlist(EnrollmentCreate, min_items=1, max_items=BULK_ENROLL_MAX_ITEMS)
+
+class BulkEnrollmentResult(BaseModel):
+    user_id: int
+    course_id: int
+    status: str  # "enrolled" | "already_enrolled" | "user_not_found" | "course_not_found" | "duplicate_in_request" | "forbidden"
+    enrollment_id: Optional[int] = None
+    enrollment_date: Optional[str] = None
+
+class BulkEnrollmentOut(BaseModel):
+    enrolled: int
+    failed: int
+    results: List[BulkEnrollmentResult]
+
+class UploadSessionCreate(BaseModel):
+    filename: str
+    size: int
+    content_type: str
+
+class UploadFinalize(BaseModel):
+    course_id: int
+    title: str
+    description: Optional[str] = None
+
+# Heartbeat tiến độ từ trình phát (vị trí hiện tại, giây); completed=True khi học xong bài giảng
+class LectureProgressUpdate(BaseModel):
+    position_seconds: confloat(ge=0)
+    duration_seconds: Optional[confloat(gt=0)] = None
+    completed: bool = False
+
+class LectureProgressOut(BaseModel):
+    lecture_id: int
+    position_seconds: float
+    duration_seconds: Optional[float] = None
+    completed: bool
+    updated_at: str
+
+class CourseProgressOut(BaseModel):
+    user_id: int
+    course_id: int
+    total_lectures: int
+    completed_lectures: int
+    lectures: List[LectureProgressOut]  # chỉ các bài giảng đã có tiến độ, theo thứ tự bài giảng
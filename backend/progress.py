@@ -0,0 +1,151 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+
+import crud
+
+# Cấu hình ghi tiến độ học (write-behind): heartbeat từ trình phát gộp trong bộ nhớ rồi ghi DB theo lô
+PROGRESS_CONFIG = {
+    "flush_interval": 5.0,     # ghi DB ít nhất mỗi 5 giây (dữ liệu mất tối đa bấy nhiêu khi tiến trình chết)
+    "flush_size": 20000,       # hoặc sớm hơn khi có bấy nhiêu cặp (user, lecture) đang chờ
+    "batch_size": 1000,        # số dòng mỗi giao dịch upsert
+    "max_entries": 100000,     # trần bộ nhớ: vượt quá thì từ chối heartbeat của cặp mới (503)
+}
+
+
+class BufferFull(Exception):
+    pass
+
+
+class ProgressEntry:
+    __slots__ = ("course_id", "position", "duration", "completed", "updated_at")
+
+    def __init__(self, course_id, position, duration, completed, updated_at):
+        self.course_id = course_id
+        self.position = position
+        self.duration = duration
+        self.completed = completed
+        self.updated_at = updated_at
+
+    def row(self, user_id, lecture_id):
+        return (user_id, lecture_id, self.course_id, self.position, self.duration, self.completed, self.updated_at)
+
+
+class ProgressBuffer:
+    """Gộp heartbeat tiến độ học theo (user, lecture): chỉ giữ vị trí mới nhất, ghi DB theo lô.
+
+    `record` chỉ cập nhật dict trong bộ nhớ (không chạm DB); vòng `run` đổi dict đang chờ lấy dict
+    rỗng rồi upsert từng lô `batch_size` dòng mỗi `flush_interval` giây, hoặc sớm hơn khi đủ
+    `flush_size` cặp. Ghi lỗi thì đưa các dòng trở lại (trừ khi đã có heartbeat mới hơn) để lần sau
+    ghi tiếp. `completed` chỉ bật, không tắt. `close` ghi nốt khi tắt server.
+    """
+
+    def __init__(self, db, flush_interval=5.0, flush_size=20000, batch_size=1000, max_entries=100000, logger=None):
+        self.db = db
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self.batch_size = batch_size
+        self.max_entries = max_entries
+        self.logger = logger
+        self._pending = {}   # (user_id, lecture_id) -> ProgressEntry chưa ghi
+        self._flushing = {}  # lô đang ghi, vẫn đọc được qua `get`
+        self._lock = asyncio.Lock()
+        self._wakeup = None
+        self._task = None
+        self.heartbeats = 0
+        self.rejected = 0
+        self.flushes = 0
+        self.rows_written = 0
+        self.flush_failures = 0
+        self.last_flush_ms = None
+
+    def __len__(self):
+        return len(self._pending) + len(self._flushing)
+
+    def record(self, user_id, lecture_id, course_id, position, duration=None, completed=False):
+        key = (user_id, lecture_id)
+        previous = self._pending.get(key) or self._flushing.get(key)
+        if key not in self._pending and len(self) >= self.max_entries:
+            self.rejected += 1
+            raise BufferFull()
+        entry = ProgressEntry(
+            course_id,
+            position,
+            duration if duration is not None else (previous.duration if previous else None),
+            completed or (previous is not None and previous.completed),
+            datetime.now(timezone.utc).replace(tzinfo=None),
+        )
+        self._pending[key] = entry
+        self.heartbeats += 1
+        if len(self._pending) >= self.flush_size and self._wakeup is not None:
+            self._wakeup.set()
+        return entry
+
+    def get(self, user_id, lecture_id):
+        key = (user_id, lecture_id)
+        return self._pending.get(key) or self._flushing.get(key)
+
+    async def flush(self):
+        async with self._lock:
+            if not self._pending:
+                return 0
+            self._flushing, self._pending = self._pending, {}
+            rows = [entry.row(user_id, lecture_id) for (user_id, lecture_id), entry in self._flushing.items()]
+            started = time.perf_counter()
+            try:
+                for start in range(0, len(rows), self.batch_size):
+                    await self.db.run(crud.upsert_lecture_progress, rows[start:start + self.batch_size])
+            except BaseException:  # cả khi bị huỷ lúc tắt server
+                self.flush_failures += 1
+                # Upsert lặp lại được: đưa cả lô trở lại, heartbeat mới hơn (nếu có) được giữ
+                for key, entry in self._flushing.items():
+                    self._pending.setdefault(key, entry)
+                raise
+            finally:
+                self._flushing = {}
+            self.flushes += 1
+            self.rows_written += len(rows)
+            self.last_flush_ms = round((time.perf_counter() - started) * 1000, 1)
+            return len(rows)
+
+    async def run(self):
+        self._wakeup = asyncio.Event()
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                if self.logger is not None:
+                    self.logger.error("progress_flush_failed", pending=len(self._pending), error=str(e))
+                await asyncio.sleep(self.flush_interval)  # DB đang lỗi: không ghi dồn liên tục
+
+    def start(self):
+        self._task = asyncio.create_task(self.run())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def stats(self):
+        return {
+            "pending": len(self._pending),
+            "flushing": len(self._flushing),
+            "max_entries": self.max_entries,
+            "heartbeats": self.heartbeats,
+            "rows_written": self.rows_written,
+            "coalescing_ratio": round(self.heartbeats / self.rows_written, 2) if self.rows_written else None,
+            "flushes": self.flushes,
+            "flush_failures": self.flush_failures,
+            "rejected": self.rejected,
+            "last_flush_ms": self.last_flush_ms,
+        }
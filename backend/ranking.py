@@ -0,0 +1,177 @@
+import heapq
+import math
+import time
+from datetime import datetime, timedelta, timezone
+
+# Cấu hình xếp hạng khoá học nổi bật
+RANKING_CONFIG = {
+    "top_size": 100,                 # số khoá giữ sẵn thứ tự cho /courses/featured (limit tối đa)
+    "half_life": 7 * 24 * 3600.0,    # trending: một lượt đăng ký mất nửa trọng số sau 7 ngày
+    "rebuild_interval": 600.0,       # dựng lại từ DB định kỳ (đồng bộ giữa các worker)
+}
+# Đăng ký cũ hơn bấy nhiêu chu kỳ bán rã (< 1/16 trọng số) bỏ qua khi dựng lại điểm trending
+TRENDING_WINDOW_HALF_LIVES = 4
+# Số mũ tối đa trước khi đổi mốc thời gian của điểm trending (exp(700) gần tràn float)
+_MAX_EXPONENT = 500.0
+
+
+class TopK:
+    """Danh sách `size` khoá điểm cao nhất, sắp giảm dần, cập nhật tăng dần khi một điểm tăng.
+
+    Điểm chỉ tăng (trừ khi xoá khoá) nên một khoá ngoài danh sách chỉ có thể vào khi chính nó
+    được cập nhật: mỗi lần cập nhật tốn O(size), đọc top-n tốn O(n).
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.items = []
+        self._members = set()
+
+    def rebuild(self, scores):
+        self.assign(heapq.nlargest(self.size, scores, key=scores.__getitem__))
+
+    def assign(self, items):
+        self.items = list(items)
+        self._members = set(self.items)
+
+    def update(self, scores, key):
+        items = self.items
+        score = scores[key]
+        if key in self._members:
+            index = items.index(key)
+        elif len(items) < self.size:
+            items.append(key)
+            self._members.add(key)
+            index = len(items) - 1
+        elif score > scores[items[-1]]:
+            self._members.discard(items[-1])
+            items[-1] = key
+            self._members.add(key)
+            index = len(items) - 1
+        else:
+            return
+        while index > 0 and scores[items[index - 1]] < score:
+            items[index] = items[index - 1]
+            index -= 1
+        items[index] = key
+
+    def remove(self, scores, key):
+        if key in self._members:
+            self.rebuild(scores)
+
+    def top(self, limit):
+        return self.items[:limit]
+
+
+class PopularityRanking:
+    """Xếp hạng khoá học theo tổng lượt đăng ký ("popular") và theo lượt đăng ký gần đây ("trending").
+
+    Điểm trending suy giảm theo hàm mũ nhưng được lưu ở dạng đã nhân exp(λ·(t − mốc)): một lượt
+    đăng ký lúc t cộng thêm exp(λ·(t − mốc)), nên không phải giảm điểm mọi khoá theo thời gian
+    mà thứ tự vẫn đúng. `record` được gọi sau mỗi lần đăng ký thành công; `begin_rebuild` + `prepare` + `load`
+    dựng lại từ DB, các lượt record / remove trong lúc đọc DB được áp lại sau `load`.
+    """
+
+    def __init__(self, top_size=100, half_life=7 * 24 * 3600.0, rebuild_interval=600.0):
+        self.half_life = half_life
+        self.rebuild_interval = rebuild_interval
+        self._decay = math.log(2) / half_life
+        self._epoch = time.time()
+        self.counts = {}    # course_id -> tổng lượt đăng ký
+        self.trending = {}  # course_id -> điểm trending (đã nhân theo mốc _epoch)
+        self._top = {"popular": TopK(top_size), "trending": TopK(top_size)}
+        self.top_size = top_size
+        self.version = 0
+        self.rebuilt_at = None
+        self._changes_during_rebuild = None  # [(course_id, thời điểm đăng ký | None = đã xoá)]
+
+    def count(self, course_id) -> int:
+        return self.counts.get(course_id, 0)
+
+    def _weight(self, timestamp):
+        exponent = (timestamp - self._epoch) * self._decay
+        if exponent > _MAX_EXPONENT:
+            self._rebase(timestamp)
+            exponent = 0.0
+        return math.exp(exponent)
+
+    def _rebase(self, timestamp):
+        # Nhân mọi điểm cùng một hệ số: thứ tự không đổi, chỉ tránh tràn số
+        factor = math.exp(-(timestamp - self._epoch) * self._decay)
+        self.trending = {course_id: score * factor for course_id, score in self.trending.items()}
+        self._epoch = timestamp
+
+    def record(self, course_id, timestamp=None):
+        timestamp = time.time() if timestamp is None else timestamp
+        if self._changes_during_rebuild is not None:
+            self._changes_during_rebuild.append((course_id, timestamp))
+        self.counts[course_id] = self.counts.get(course_id, 0) + 1
+        weight = self._weight(timestamp)
+        self.trending[course_id] = self.trending.get(course_id, 0.0) + weight
+        self._top["popular"].update(self.counts, course_id)
+        self._top["trending"].update(self.trending, course_id)
+        self.version += 1
+
+    def remove(self, course_id):
+        if self._changes_during_rebuild is not None:
+            self._changes_during_rebuild.append((course_id, None))
+        self.counts.pop(course_id, None)
+        self.trending.pop(course_id, None)
+        self._top["popular"].remove(self.counts, course_id)
+        self._top["trending"].remove(self.trending, course_id)
+        self.version += 1
+
+    def top(self, by: str, limit: int):
+        return self._top[by].top(limit)
+
+    def prepare(self, counts, recent):
+        """Tính dữ liệu mới từ DB (chạy trên thread pool, không đụng trạng thái hiện tại).
+
+        `counts` [(course_id, tổng)], `recent` [(course_id, EnrollmentDate)]; kết quả đưa vào `load`.
+        """
+        epoch = time.time()
+        trending = {}
+        for course_id, enrolled_at in recent:
+            if enrolled_at.tzinfo is None:
+                enrolled_at = enrolled_at.replace(tzinfo=timezone.utc)
+            weight = math.exp((enrolled_at.timestamp() - epoch) * self._decay)
+            trending[course_id] = trending.get(course_id, 0.0) + weight
+        counts = dict(counts)
+        tops = {by: heapq.nlargest(self.top_size, scores, key=scores.__getitem__)
+                for by, scores in (("popular", counts), ("trending", trending))}
+        return epoch, counts, trending, tops
+
+    def begin_rebuild(self):
+        # Gọi trước khi đọc DB cho prepare(): lượt đăng ký / xoá nhận trong lúc đọc không bị load() làm mất
+        self._changes_during_rebuild = []
+
+    def load(self, prepared):
+        # Thay toàn bộ dữ liệu rồi áp lại thay đổi từ begin_rebuild(); gọi trên event loop như record/remove
+        self._epoch, self.counts, self.trending, tops = prepared
+        for by, items in tops.items():
+            self._top[by].assign(items)
+        changes, self._changes_during_rebuild = self._changes_during_rebuild, None
+        for course_id, timestamp in changes or ():
+            if timestamp is None:
+                self.remove(course_id)
+            else:
+                self.record(course_id, timestamp)
+        self.version += 1
+        self.rebuilt_at = time.time()
+
+    def trending_since(self) -> datetime:
+        # Mốc EnrollmentDate (UTC, không tz như cột DATETIME) cần đọc khi dựng lại điểm trending
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        return now - timedelta(seconds=TRENDING_WINDOW_HALF_LIVES * self.half_life)
+
+    def stats(self):
+        return {
+            "courses": len(self.counts),
+            "enrollments": sum(self.counts.values()),
+            "top_size": self.top_size,
+            "version": self.version,
+            "rebuilt_seconds_ago": round(time.time() - self.rebuilt_at, 1) if self.rebuilt_at else None,
+        }
+
+
+popularity = PopularityRanking(**RANKING_CONFIG)
@@ -0,0 +1,230 @@
+import bisect
+import heapq
+import math
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def normalize(text):
+    # Bỏ dấu tiếng Việt: "Lập trình Đà Nẵng" -> "lap trinh da nang"
+    text = text.lower().replace("đ", "d")
+    decomposed = unicodedata.normalize("NFD", text)
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def tokenize(text):
+    if not text:
+        return []
+    return _TOKEN_RE.findall(normalize(text))
+
+
+class CourseSearchIndex:
+    """Chỉ mục ngược trong bộ nhớ cho Title / ShortDescription / FullDescription, xếp hạng BM25.
+
+    Mỗi posting lưu sẵn phần "impact" của BM25 (tf đã chuẩn hoá theo độ dài), idf được
+    tính lúc truy vấn. Để giữ độ trễ ổn định với term phổ biến, truy vấn chỉ duyệt
+    `champion_size` posting có impact cao nhất của mỗi term (champion list).
+    Từ cuối cùng của truy vấn được khớp theo tiền tố (typeahead).
+    Mỗi worker có chỉ mục riêng: main.py dựng lại từ DB mỗi `rebuild_interval` giây để thấy
+    khoá học do worker khác tạo / xoá.
+    """
+
+    FIELD_WEIGHTS = {"title": 3.0, "short_description": 1.5, "full_description": 1.0}
+
+    def __init__(self, k1=1.2, b=0.75, champion_size=500, max_prefix_terms=16, min_prefix_length=2,
+                 rebuild_interval=600.0):
+        self.k1 = k1
+        self.b = b
+        self.champion_size = champion_size
+        self.max_prefix_terms = max_prefix_terms
+        self.min_prefix_length = min_prefix_length
+        self.rebuild_interval = rebuild_interval
+
+        self._lock = threading.RLock()
+        self._postings = {}                  # term -> {course_id: impact}
+        self._champions = {}                 # term -> [(impact, course_id)] giảm dần, tối đa champion_size
+        self._doc_terms = {}                 # course_id -> [term]
+        self._doc_length = {}                # course_id -> độ dài có trọng số
+        self._total_length = 0.0
+        self._sorted_terms = []              # danh sách term đã sắp xếp cho tra cứu tiền tố
+        self._changed_during_rebuild = None  # course_id -> (title, short, full) | None (đã xoá)
+
+    def __len__(self):
+        return len(self._doc_terms)
+
+    # --- Cập nhật chỉ mục ---
+    def _analyze(self, title, short_description, full_description):
+        fields = {"title": title, "short_description": short_description, "full_description": full_description}
+        terms = defaultdict(float)
+        for field, text in fields.items():
+            weight = self.FIELD_WEIGHTS[field]
+            for token in tokenize(text):
+                terms[token] += weight
+        return terms, sum(terms.values())
+
+    def add(self, course_id, title=None, short_description=None, full_description=None):
+        terms, length = self._analyze(title, short_description, full_description)
+        with self._lock:
+            if self._changed_during_rebuild is not None:
+                self._changed_during_rebuild[course_id] = (title, short_description, full_description)
+            self._remove_locked(course_id)
+            self._total_length += length
+            avg_length = self._total_length / (len(self._doc_terms) + 1) or 1.0
+            self._insert_locked(course_id, terms, length, avg_length)
+
+    def _insert_locked(self, course_id, terms, length, avg_length, sort_terms=True):
+        # Impact dùng độ dài trung bình tại thời điểm thêm; rebuild() chuẩn hoá lại toàn bộ
+        self._doc_terms[course_id] = list(terms)
+        self._doc_length[course_id] = length
+        norm = self.k1 * (1 - self.b + self.b * length / avg_length)
+        for term, tf in terms.items():
+            impact = tf * (self.k1 + 1) / (tf + norm)
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = {}
+                if sort_terms:
+                    bisect.insort(self._sorted_terms, term)
+            postings[course_id] = impact
+            self._offer_champion(term, impact, course_id)
+
+    def _offer_champion(self, term, impact, course_id):
+        champions = self._champions.get(term)
+        if champions is None:
+            return  # sẽ được tính lại khi cần
+        if len(champions) < self.champion_size:
+            bisect.insort(champions, (-impact, course_id))
+        elif -impact < champions[-1][0]:
+            bisect.insort(champions, (-impact, course_id))
+            champions.pop()
+
+    def remove(self, course_id):
+        with self._lock:
+            if self._changed_during_rebuild is not None:
+                self._changed_during_rebuild[course_id] = None
+            self._remove_locked(course_id)
+
+    def _remove_locked(self, course_id):
+        terms = self._doc_terms.pop(course_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            postings.pop(course_id, None)
+            # Champion list có thể thiếu phần tử thay thế -> tính lại lười
+            self._champions.pop(term, None)
+            if not postings:
+                del self._postings[term]
+                index = bisect.bisect_left(self._sorted_terms, term)
+                if index < len(self._sorted_terms) and self._sorted_terms[index] == term:
+                    del self._sorted_terms[index]
+        self._total_length -= self._doc_length.pop(course_id, 0.0)
+
+    def begin_rebuild(self):
+        # Gọi trước khi đọc DB cho rebuild(): add/remove trong lúc đọc được áp lại sau khi dựng
+        with self._lock:
+            self._changed_during_rebuild = {}
+
+    def rebuild(self, rows):
+        # Dựng chỉ mục mới ngoài khoá (search / add / remove vẫn chạy trên chỉ mục cũ), chỉ đổi tham chiếu trong khoá
+        fresh = CourseSearchIndex(self.k1, self.b, self.champion_size, self.max_prefix_terms,
+                                  self.min_prefix_length, self.rebuild_interval)
+        analyzed = [(row.CourseID, *self._analyze(row.Title, row.ShortDescription, row.FullDescription))
+                    for row in rows]
+        fresh._total_length = sum(length for _, _, length in analyzed)
+        avg_length = fresh._total_length / len(analyzed) if analyzed else 1.0
+        for course_id, terms, length in analyzed:
+            fresh._insert_locked(course_id, terms, length, avg_length or 1.0, sort_terms=False)
+        fresh._sorted_terms = sorted(fresh._postings)
+        # Tính sẵn champion list cho các term phổ biến để truy vấn đầu tiên không bị chậm
+        for term, postings in fresh._postings.items():
+            if len(postings) > self.champion_size:
+                fresh._champion_list(term)
+
+        with self._lock:
+            self._postings = fresh._postings
+            self._champions = fresh._champions
+            self._doc_terms = fresh._doc_terms
+            self._doc_length = fresh._doc_length
+            self._total_length = fresh._total_length
+            self._sorted_terms = fresh._sorted_terms
+            changed, self._changed_during_rebuild = self._changed_during_rebuild, None
+            for course_id, fields in (changed or {}).items():
+                if fields is None:
+                    self._remove_locked(course_id)
+                else:
+                    self.add(course_id, *fields)
+
+    # --- Truy vấn ---
+    def _expand_prefix(self, prefix):
+        start = bisect.bisect_left(self._sorted_terms, prefix)
+        matches = []
+        for term in self._sorted_terms[start:]:
+            if not term.startswith(prefix):
+                break
+            matches.append(term)
+        if len(matches) > self.max_prefix_terms:
+            # Giữ các term phổ biến nhất để giới hạn chi phí truy vấn
+            matches = heapq.nlargest(self.max_prefix_terms, matches, key=lambda t: len(self._postings[t]))
+        return matches
+
+    def _champion_list(self, term):
+        champions = self._champions.get(term)
+        if champions is None:
+            postings = self._postings[term]
+            champions = sorted((-impact, course_id) for course_id, impact in
+                               heapq.nlargest(self.champion_size, postings.items(), key=lambda item: item[1]))
+            self._champions[term] = champions
+        return champions
+
+    def search(self, query, limit=20, prefix=True):
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+
+        with self._lock:
+            n_docs = len(self._doc_terms)
+            if n_docs == 0:
+                return []
+
+            # Mỗi nhóm là các term thay thế cho một token của truy vấn
+            groups = [[token] for token in tokens[:-1]]
+            last = tokens[-1]
+            if prefix and len(last) >= self.min_prefix_length:
+                groups.append(self._expand_prefix(last) or [last])
+            else:
+                groups.append([last])
+
+            scores = defaultdict(float)
+            for group in groups:
+                group_scores = {}
+                # Chia ngân sách posting cho các term mở rộng từ tiền tố
+                depth = max(self.champion_size // len(group), 50)
+                for term in group:
+                    postings = self._postings.get(term)
+                    if not postings:
+                        continue
+                    df = len(postings)
+                    idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+                    for neg_impact, course_id in self._champion_list(term)[:depth]:
+                        score = -neg_impact * idf
+                        # Một token khớp nhiều term (tiền tố): lấy điểm cao nhất
+                        if score > group_scores.get(course_id, 0.0):
+                            group_scores[course_id] = score
+                for course_id, score in group_scores.items():
+                    scores[course_id] += score
+
+        return heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], item[0]))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "documents": len(self._doc_terms),
+                "terms": len(self._postings),
+                "champion_lists": len(self._champions),
+            }
@@ -0,0 +1,72 @@
+import json
+
+from starlette.responses import Response
+
+from images import variant_urls
+from ranking import popularity
+
+try:
+    import orjson
+except ImportError:  # orjson là tuỳ chọn: không có thì dùng json chuẩn
+    orjson = None
+
+
+def dumps(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def json_response(body: bytes, status_code: int = 200) -> Response:
+    # Trả thẳng bytes đã mã hoá: FastAPI bỏ qua bước validate lại theo response_model
+    return Response(content=body, status_code=status_code, media_type="application/json")
+
+
+class CourseRowSerializer:
+    """Chuyển dòng kết quả thành dict đúng dạng CourseOut mà không tạo model Pydantic.
+
+    Vị trí cột được tra một lần từ `cursor.description`; mỗi dòng chỉ còn là truy cập theo chỉ số.
+    Cột không có trong truy vấn (ví dụ FullDescription khi fields=summary) trả về None như CourseOut.
+    """
+
+    def __init__(self, description):
+        positions = {column[0]: index for index, column in enumerate(description)}
+        self.course_id = positions["CourseID"]
+        self.title = positions["Title"]
+        self.image_url = positions["ImageURL"]
+        self.short_description = positions["ShortDescription"]
+        self.price = positions["Price"]
+        self.instructor_id = positions["InstructorID"]
+        self.full_description = positions.get("FullDescription")
+        self.instructor_bio = positions.get("InstructorBio")
+        self.instructor_name = positions.get("InstructorName")
+
+    def to_dict(self, row):
+        price = float(row[self.price])
+        image_url = row[self.image_url]
+        course_id = row[self.course_id]
+        return {
+            "title": row[self.title],
+            "image_url": image_url,
+            "short_description": row[self.short_description],
+            "full_description": row[self.full_description] if self.full_description is not None else None,
+            "price": price,
+            "instructor_bio": row[self.instructor_bio] if self.instructor_bio is not None else None,
+            "course_id": course_id,
+            "instructor_id": row[self.instructor_id],
+            "instructor_name": row[self.instructor_name] if self.instructor_name is not None else None,
+            "is_free": price == 0.0,
+            "image_variants": variant_urls(image_url),
+            "enrollment_count": popularity.count(course_id),
+        }
+
+    def to_list(self, rows):
+        to_dict = self.to_dict
+        return [to_dict(row) for row in rows]
+
+
+def encoded(fn):
+    # Truy vấn và mã hoá JSON ngay trên thread DB: event loop (và cache) chỉ giữ bytes
+    def run(cnxn, *args, **kwargs):
+        return dumps(fn(cnxn, *args, **kwargs))
+    return run
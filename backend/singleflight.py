@@ -0,0 +1,71 @@
+import asyncio
+
+from admission import Overloaded
+
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Gộp các lần tải trùng khoá đang chạy đồng thời: một truy vấn, mọi người chờ cùng nhận kết quả.
+
+    Hàm tải chạy trong task riêng nên request dẫn đầu bị huỷ (client ngắt kết nối) không làm lỗi
+    các request đang chờ; mỗi người chờ chỉ huỷ phần chờ của chính mình. Mỗi khoá có tối đa
+    `max_waiters` người chờ, vượt quá -> Overloaded (503) thay vì dồn thêm vào một truy vấn chậm.
+    Kết quả không được giữ lại sau khi truy vấn xong (việc đó là của cache).
+    """
+
+    def __init__(self, max_waiters=1000):
+        self.max_waiters = max_waiters
+        self._flights = {}
+        self.leaders = 0
+        self.followers = 0
+        self.rejected = 0
+
+    def __len__(self):
+        return len(self._flights)
+
+    async def do(self, key, loader):
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = self._flights[key] = _Flight(asyncio.ensure_future(loader()))
+            flight.task.add_done_callback(lambda task, key=key: self._done(key, task))
+            self.leaders += 1
+        elif flight.waiters >= self.max_waiters:
+            self.rejected += 1
+            raise Overloaded("coalesce_waiters", 1)
+        else:
+            self.followers += 1
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+
+    def _done(self, key, task):
+        flight = self._flights.get(key)
+        if flight is not None and flight.task is task:
+            del self._flights[key]
+        if not task.cancelled():
+            task.exception()  # mọi người chờ đã huỷ: tránh cảnh báo "exception was never retrieved"
+
+    @property
+    def coalescing_ratio(self) -> float:
+        # Tỉ lệ lần tải được phục vụ bởi truy vấn của request khác
+        calls = self.leaders + self.followers
+        return round(self.followers / calls, 4) if calls else 0.0
+
+    def stats(self):
+        return {
+            "in_flight": len(self._flights),
+            "max_waiters": self.max_waiters,
+            "queries": self.leaders,
+            "coalesced": self.followers,
+            "coalescing_ratio": self.coalescing_ratio,
+            "rejected": self.rejected,
+        }
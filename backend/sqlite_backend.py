@@ -0,0 +1,243 @@
+import re
+import sqlite3
+from datetime import datetime
+
+import db_errors
+
+# SQLite thay SQL Server khi chạy local / benchmark. Schema do migrations.py tạo (T-SQL, dịch qua `translate`).
+sqlite3.register_converter("DATETIME", lambda value: datetime.fromisoformat(value.decode()))
+sqlite3.register_converter("DATETIME2", lambda value: datetime.fromisoformat(value.decode()))
+
+# --- Chuyển câu lệnh T-SQL trong crud.py sang SQLite (chỉ các cú pháp repo đang dùng) ---
+_TOP_PARAM = re.compile(r"^\s*SELECT\s+TOP\s*\(\?\)\s*", re.IGNORECASE)
+_TOP_LITERAL_SUBQUERY = re.compile(r"\(\s*SELECT\s+TOP\s+(\d+)\s+([^()]*)\)", re.IGNORECASE)
+_OUTPUT = re.compile(r"\s*OUTPUT\s+(INSERTED\.\w+(?:\s*,\s*INSERTED\.\w+)*)", re.IGNORECASE)
+_DROP_IF_EXISTS = re.compile(r"IF\s+OBJECT_ID\([^)]*\)\s+IS\s+NOT\s+NULL\s+DROP\s+TABLE\s+(\S+)", re.IGNORECASE)
+_CREATE_IF_MISSING = re.compile(r"IF\s+OBJECT_ID\([^)]*\)\s+IS\s+NULL\s+CREATE\s+TABLE", re.IGNORECASE)
+_INDEX_IF_MISSING = re.compile(
+    r"IF\s+NOT\s+EXISTS\s*\(\s*SELECT\s+1\s+FROM\s+sys\.indexes\b.*?\)\s*\)\s*CREATE\s+(UNIQUE\s+)?INDEX",
+    re.IGNORECASE | re.DOTALL)
+_IDENTITY_KEY = re.compile(r"\bINT\s+IDENTITY\s*\(\s*1\s*,\s*1\s*\)\s+PRIMARY\s+KEY", re.IGNORECASE)
+_TABLE_HINT = re.compile(r"\s+WITH\s*\(\s*(?:UPDLOCK|HOLDLOCK|ROWLOCK|NOLOCK)(?:\s*,\s*\w+)*\s*\)", re.IGNORECASE)
+_TEMP_TABLE = re.compile(r"#(\w+)")
+_EXPLAINABLE = re.compile(r"^\s*(SELECT|INSERT|UPDATE|DELETE|WITH)\b", re.IGNORECASE)
+_WRITE_TARGET = re.compile(r"^\s*(?:INSERT\s+INTO|UPDATE)\s+(\w+)", re.IGNORECASE)
+_REPLACEMENTS = (
+    (re.compile(r"@@IDENTITY", re.IGNORECASE), "last_insert_rowid()"),
+    (re.compile(r"\bISNULL\(", re.IGNORECASE), "IFNULL("),
+    (re.compile(r"\bSYSUTCDATETIME\(\)|\bGETDATE\(\)", re.IGNORECASE), "CURRENT_TIMESTAMP"),
+    (re.compile(r"\bNVARCHAR\s*\(\s*MAX\s*\)", re.IGNORECASE), "TEXT"),
+)
+
+
+def translate(sql: str):
+    """Trả về (câu SQLite, có chuyển tham số TOP (?) xuống LIMIT hay không); được cache theo câu gốc."""
+    move_top_param = False
+    if _TOP_PARAM.match(sql):
+        sql = _TOP_PARAM.sub("SELECT ", sql, count=1).rstrip() + " LIMIT ?"
+        move_top_param = True
+    sql = _TOP_LITERAL_SUBQUERY.sub(lambda m: f"(SELECT {m.group(2).strip()} LIMIT {m.group(1)})", sql)
+    output = _OUTPUT.search(sql)
+    if output:
+        columns = ", ".join(column.split(".", 1)[1] for column in re.split(r"\s*,\s*", output.group(1)))
+        sql = _OUTPUT.sub("", sql, count=1).rstrip() + f" RETURNING {columns}"
+    sql = _DROP_IF_EXISTS.sub(r"DROP TABLE IF EXISTS \1", sql)
+    sql = _CREATE_IF_MISSING.sub("CREATE TABLE IF NOT EXISTS", sql)
+    sql = _INDEX_IF_MISSING.sub(lambda m: f"CREATE {m.group(1) or ''}INDEX IF NOT EXISTS", sql)
+    sql = _IDENTITY_KEY.sub("INTEGER PRIMARY KEY AUTOINCREMENT", sql)
+    sql = _TABLE_HINT.sub("", sql)
+    sql = _TEMP_TABLE.sub(r"temp.\1", sql)
+    for pattern, replacement in _REPLACEMENTS:
+        sql = pattern.sub(replacement, sql)
+    return sql, move_top_param
+
+
+class Row:
+    """Dòng kết quả truy cập được theo chỉ số lẫn theo tên cột (giống pyodbc.Row)."""
+
+    __slots__ = ("_values", "_columns")
+
+    def __init__(self, values, columns):
+        self._values = values
+        self._columns = columns
+
+    def __getitem__(self, index):
+        return self._values[index]
+
+    def __getattr__(self, name):
+        try:
+            return self._values[self._columns[name]]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def __len__(self):
+        return len(self._values)
+
+    def __repr__(self):
+        return f"Row{self._values!r}"
+
+
+# Lỗi SQLite tương ứng với mất kết nối / máy chủ không dùng được (OperationalError, SQLSTATE 08)
+_UNAVAILABLE_MESSAGES = ("unable to open database file", "disk i/o error", "database is locked")
+
+
+def _wrap_error(ex, constraint=None):
+    # Như pyodbc: args = (SQLSTATE, thông báo); vi phạm khoá ngoại kèm tên ràng buộc giống SQL Server
+    if isinstance(ex, sqlite3.IntegrityError):
+        message = str(ex) if constraint is None else f'{ex}: FOREIGN KEY constraint "{constraint}"'
+        return db_errors.IntegrityError("23000", message)
+    if isinstance(ex, sqlite3.OperationalError) and str(ex).lower().startswith(_UNAVAILABLE_MESSAGES):
+        return db_errors.OperationalError("08S01", str(ex))
+    return db_errors.Error("HY000", str(ex))
+
+
+class SqliteCursor:
+    def __init__(self, cursor, translations, on_plan=None):
+        self._cursor = cursor
+        self._translations = translations
+        self._on_plan = on_plan
+        self._columns = None
+        self.fast_executemany = False  # pyodbc: không có ý nghĩa với SQLite
+
+    def _translate(self, sql):
+        translated = self._translations.get(sql)
+        if translated is None:
+            translated = self._translations[sql] = translate(sql)
+        return translated
+
+    def execute(self, sql, *params):
+        if len(params) == 1 and isinstance(params[0], (list, tuple)):
+            params = tuple(params[0])
+        original = sql
+        sql, move_top_param = self._translate(sql)
+        if move_top_param:
+            params = params[1:] + params[:1]
+        try:
+            if self._on_plan is not None and _EXPLAINABLE.match(sql):
+                plan = self._cursor.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+                self._on_plan(original, sql, [row[3] for row in plan])
+            self._cursor.execute(sql, params)
+        except sqlite3.Error as ex:
+            constraint = None
+            if isinstance(ex, sqlite3.IntegrityError) and "FOREIGN KEY" in str(ex):
+                constraint = self._violated_foreign_key(sql, params)
+            raise _wrap_error(ex, constraint) from ex
+        self._columns = None
+        return self
+
+    def _violated_foreign_key(self, sql, params):
+        # SQLite không cho biết khoá ngoại nào bị vi phạm: chạy lại câu lệnh trong savepoint với kiểm tra
+        # khoá ngoại hoãn lại, hỏi foreign_key_check rồi huỷ. Chỉ chạy trên đường lỗi.
+        target = _WRITE_TARGET.match(sql)
+        check = f"PRAGMA foreign_key_check({target.group(1)})" if target else "PRAGMA foreign_key_check"
+        cursor = self._cursor
+        violation = None
+        try:
+            cursor.execute("SAVEPOINT fk_diagnose")
+            try:
+                cursor.execute("PRAGMA defer_foreign_keys = ON")
+                cursor.execute(sql, params).fetchall()
+                violation = cursor.execute(check).fetchone()
+            finally:
+                cursor.execute("ROLLBACK TO fk_diagnose")
+                cursor.execute("RELEASE fk_diagnose")
+                cursor.execute("PRAGMA defer_foreign_keys = OFF")
+        except sqlite3.Error:
+            return None
+        return None if violation is None else db_errors.foreign_key_name(violation[0], violation[2])
+
+    def executemany(self, sql, seq_of_params):
+        sql, _ = self._translate(sql)
+        try:
+            self._cursor.executemany(sql, seq_of_params)
+        except sqlite3.Error as ex:
+            raise _wrap_error(ex) from ex
+        return self
+
+    def _row(self, values):
+        if self._columns is None:
+            columns = {}
+            for index, column in enumerate(self._cursor.description or ()):
+                columns.setdefault(column[0], index)
+            self._columns = columns
+        return Row(values, self._columns)
+
+    def fetchone(self):
+        values = self._cursor.fetchone()
+        return None if values is None else self._row(values)
+
+    def fetchall(self):
+        return [self._row(values) for values in self._cursor.fetchall()]
+
+    def fetchmany(self, size):
+        return [self._row(values) for values in self._cursor.fetchmany(size)]
+
+    def __iter__(self):
+        return (self._row(values) for values in self._cursor)
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def close(self):
+        self._cursor.close()
+
+
+class SqliteConnection:
+    """Kết nối SQLite với giao diện con mà crud.py dùng từ pyodbc (cursor / commit / autocommit)."""
+
+    _translations = {}  # dùng chung giữa các kết nối: câu T-SQL gốc -> câu SQLite
+
+    def __init__(self, cnxn):
+        self._cnxn = cnxn
+        self.on_plan = None  # on_plan(câu gốc, câu SQLite, [dòng EXPLAIN QUERY PLAN]) trước mỗi câu truy vấn
+
+    def cursor(self):
+        return SqliteCursor(self._cnxn.cursor(), self._translations, self.on_plan)
+
+    def execute(self, sql, *params):
+        return self.cursor().execute(sql, *params)
+
+    @property
+    def autocommit(self):
+        return self._cnxn.isolation_level is None
+
+    @autocommit.setter
+    def autocommit(self, value):
+        if value and self._cnxn.in_transaction:
+            self._cnxn.commit()
+        self._cnxn.isolation_level = None if value else "DEFERRED"
+
+    def commit(self):
+        self._cnxn.commit()
+
+    def rollback(self):
+        self._cnxn.rollback()
+
+    def close(self):
+        self._cnxn.close()
+
+
+def connect(path: str, busy_timeout: float = 5.0) -> SqliteConnection:
+    try:
+        cnxn = sqlite3.connect(
+            path,
+            timeout=busy_timeout,
+            isolation_level=None,             # autocommit giống pyodbc.connect(autocommit=True)
+            check_same_thread=False,          # pool chuyển kết nối giữa các luồng worker
+            detect_types=sqlite3.PARSE_DECLTYPES,
+        )
+        cnxn.execute("PRAGMA journal_mode=WAL")
+        cnxn.execute("PRAGMA synchronous=NORMAL")
+        cnxn.execute("PRAGMA foreign_keys=ON")
+    except sqlite3.Error as ex:
+        # Như pyodbc.connect khi không tới được server
+        raise db_errors.OperationalError("08001", str(ex)) from ex
+    return SqliteConnection(cnxn)
@@ -0,0 +1,150 @@
+import argparse
+import asyncio
+import hashlib
+import os
+import time
+import uuid
+from functools import partial
+from pathlib import Path
+
+import crud
+from uploads import save_upload_file
+
+HASH_BLOCK_SIZE = 8 * 1024 * 1024
+
+
+def hash_file(path: Path, block_size: int = HASH_BLOCK_SIZE):
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        while block := f.read(block_size):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+class BlobStore:
+    """Lưu file upload theo SHA-256 của nội dung, mỗi nội dung chỉ lưu một lần.
+
+    URL vẫn có dạng /uploads/<kind>/<digest>.<ext> nên mount /uploads và /media dùng được ngay.
+    Số tham chiếu nằm trong bảng MediaBlobs; file chỉ bị xoá khi RefCount về 0.
+    """
+
+    def __init__(self, upload_folder: Path, tmp_folder: Path, buffer_size: int):
+        self.upload_folder = Path(upload_folder)
+        self.tmp_folder = Path(tmp_folder)
+        self.tmp_folder.mkdir(parents=True, exist_ok=True)
+        self.buffer_size = buffer_size
+
+    def url_for(self, kind: str, digest: str, extension: str) -> str:
+        return f"/{self.upload_folder.name}/{kind}/{digest}.{extension.lower()}"
+
+    def path_for(self, url: str) -> Path:
+        # URL phải nằm trong upload_folder sau khi chuẩn hoá: chặn `/uploads/../main.py`
+        path = (self.upload_folder.parent / url.lstrip("/")).resolve()
+        if not path.is_relative_to(self.upload_folder.resolve()):
+            raise ValueError(f"Media URL outside upload folder: {url}")
+        return path
+
+    def is_local(self, url: str) -> bool:
+        return bool(url) and url.startswith(f"/{self.upload_folder.name}/")
+
+    async def store_upload(self, db, upload, kind: str, extension: str, max_size: int = None) -> str:
+        tmp_path = self.tmp_folder / f"{uuid.uuid4()}.tmp"
+        hasher = hashlib.sha256()
+        try:
+            size = await save_upload_file(upload, tmp_path, self.buffer_size, max_size, hasher=hasher)
+            return await self._commit(db, tmp_path, kind, extension, hasher.hexdigest(), size)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+
+    async def store_file(self, db, path: Path, kind: str, extension: str) -> str:
+        # File đã có sẵn trên đĩa (ví dụ upload nhiều phần): băm trên thread rồi đưa vào kho
+        loop = asyncio.get_running_loop()
+        try:
+            digest = await loop.run_in_executor(None, hash_file, path)
+            return await self._commit(db, path, kind, extension, digest, path.stat().st_size)
+        finally:
+            path.unlink(missing_ok=True)
+
+    async def _commit(self, db, tmp_path: Path, kind: str, extension: str, digest: str, size: int) -> str:
+        url = self.url_for(kind, digest, extension)
+        stored_url, created = await db.run(crud.acquire_media_blob, digest, url, size)
+        destination = self.path_for(stored_url)
+        if created or not destination.exists():
+            os.replace(tmp_path, destination)
+        return stored_url
+
+    async def acquire(self, db, url: str) -> bool:
+        # URL /uploads client gửi lại (thay vì upload file): chỉ nhận file kho đang quản lý và thêm một tham chiếu,
+        # để xoá khoá học / bài giảng dùng lại URL này không làm giảm tham chiếu của người khác
+        try:
+            self.path_for(url)
+        except ValueError:
+            return False
+        return await db.run(crud.acquire_media_url, url)
+
+    async def release(self, db, url: str) -> bool:
+        # Giảm tham chiếu; xoá file khi không còn khoá học / bài giảng nào dùng (trong giao dịch giảm tham chiếu)
+        if not self.is_local(url):
+            return False
+        try:
+            path = self.path_for(url)
+        except ValueError:
+            return False
+        return await db.run(crud.release_media_blob, url, partial(path.unlink, missing_ok=True))
+
+
+# --- Đối soát / dọn rác: python storage.py gc [--apply] ---
+def reconcile(db, store: BlobStore, kinds, grace_seconds: float, apply: bool):
+    references = crud.count_media_references(db)
+    blobs = crud.list_media_blobs(db)
+    tracked_urls = {row.Url for row in blobs}
+    report = {"refcount_fixed": [], "unreferenced_blobs": [], "missing_files": [], "orphan_files": []}
+
+    for row in blobs:
+        actual = references.get(row.Url, 0)
+        if not store.path_for(row.Url).is_file():
+            report["missing_files"].append(row.Url)
+        if actual == 0:
+            report["unreferenced_blobs"].append(row.Url)
+        elif actual != row.RefCount:
+            report["refcount_fixed"].append({"url": row.Url, "stored": row.RefCount, "actual": actual})
+        if apply and actual != row.RefCount:
+            crud.set_media_blob_refcount(db, row.Digest, row.RefCount, actual, partial(store.path_for(row.Url).unlink, missing_ok=True))
+
+    cutoff = time.time() - grace_seconds
+    for kind in kinds:
+        folder = store.upload_folder / kind
+        for path in folder.iterdir():
+            if not path.is_file():
+                continue
+            url = store.url_for(kind, path.stem, path.suffix.lstrip("."))
+            if url in tracked_urls or url in references:
+                continue
+            # Bỏ qua file mới ghi: có thể đang trong một request upload chưa commit
+            if path.stat().st_mtime > cutoff:
+                continue
+            report["orphan_files"].append(url)
+            if apply:
+                path.unlink(missing_ok=True)
+    return report
+
+
+def main():
+    import json
+    from database import db_pool
+
+    parser = argparse.ArgumentParser(description="Đối soát file trong uploads/ với bảng MediaBlobs.")
+    parser.add_argument("command", choices=["gc"])
+    parser.add_argument("--apply", action="store_true", help="sửa RefCount và xoá file mồ côi (mặc định chỉ báo cáo)")
+    parser.add_argument("--grace", type=float, default=3600.0, help="bỏ qua file mới hơn N giây")
+    parser.add_argument("--upload-folder", default="uploads")
+    args = parser.parse_args()
+
+    store = BlobStore(Path(args.upload_folder), Path(args.upload_folder) / "partial", HASH_BLOCK_SIZE)
+    with db_pool.connection() as db:
+        report = reconcile(db, store, ("images", "videos"), args.grace, args.apply)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
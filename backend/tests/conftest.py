@@ -0,0 +1,111 @@
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+# database.py / main.py đọc cấu hình từ biến môi trường lúc import: đặt trước mọi import backend
+APP_FOLDER = Path(tempfile.mkdtemp(prefix="elearning-test-"))
+os.environ.update(DB_BACKEND="sqlite", SQLITE_PATH=str(APP_FOLDER / "app.sqlite3"), AUTH_SECRET="test-secret",
+                  LOG_LEVEL="WARNING", RATE_LIMITS="off")
+
+# Các module backend import phẳng (`import crud`), như khi chạy uvicorn trong thư mục backend
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import migrations  # noqa: E402
+import sqlite_backend  # noqa: E402
+
+# Dữ liệu nhỏ cho các test gọi API: user 1-2 là giảng viên, mỗi khoá học có LECTURES_PER_COURSE bài giảng,
+# user 3 đăng ký mọi khoá học
+INSTRUCTORS = 2
+STUDENTS = 10
+COURSES = 30
+LECTURES_PER_COURSE = 5
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(APP_FOLDER, ignore_errors=True)
+
+
+@pytest.fixture
+def sqlite_path(tmp_path):
+    # File SQLite mới với schema đầy đủ từ migrations.py
+    path = str(tmp_path / "test.sqlite3")
+    cnxn = sqlite_backend.connect(path)
+    migrations.migrate(cnxn, "sqlite")
+    cnxn.close()
+    return path
+
+
+def seed_catalog(path):
+    cnxn = sqlite_backend.connect(path)
+    migrations.migrate(cnxn, "sqlite")
+    raw = cnxn._cnxn
+    raw.executemany(
+        "INSERT INTO Users (UserID, Username, Email, Password, Role) VALUES (?, ?, ?, 'x', ?)",
+        [(i, f"user{i}", f"user{i}@example.com", "instructor" if i <= INSTRUCTORS else "student")
+         for i in range(1, INSTRUCTORS + STUDENTS + 1)],
+    )
+    raw.executemany(
+        "INSERT INTO Courses (CourseID, Title, ShortDescription, Price, InstructorID) VALUES (?, ?, ?, ?, ?)",
+        [(i, f"Khoá học {i}", "Mô tả ngắn", i % 3 * 100, i % INSTRUCTORS + 1) for i in range(1, COURSES + 1)],
+    )
+    raw.executemany(
+        "INSERT INTO Lectures (CourseID, Title, VideoURL, LectureOrder) VALUES (?, ?, 'https://videos.example.com/v.mp4', ?)",
+        [(course, f"Bài {order}", order) for course in range(1, COURSES + 1) for order in range(1, LECTURES_PER_COURSE + 1)],
+    )
+    raw.executemany("INSERT INTO Enrollments (UserID, CourseID) VALUES (3, ?)", [(i,) for i in range(1, COURSES + 1)])
+    cnxn.close()
+
+
+@pytest.fixture(scope="session")
+def app_module():
+    # main.py tạo uploads/ theo thư mục hiện tại
+    seed_catalog(os.environ["SQLITE_PATH"])
+    cwd = os.getcwd()
+    os.chdir(APP_FOLDER)
+    try:
+        import main
+        yield main
+    finally:
+        os.chdir(cwd)
+
+
+@pytest.fixture(scope="session")
+def app_client(app_module):
+    # Một vòng startup/shutdown cho cả phiên test: shutdown đóng thread pool DB và luồng ghi log
+    from fastapi.testclient import TestClient
+
+    with TestClient(app_module.app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def client(app_module, app_client):
+    app_module.catalog_cache.clear()
+    app_module.catalog_version.bump()  # ETag mới: bản nén http_cache giữ từ test trước không còn dùng được
+    yield app_client
+    app_module.app.dependency_overrides.clear()
+
+
+@pytest.fixture
+def executed_sql(app_module):
+    # Ghi lại mọi câu SQL gửi tới DB (qua on_query của Database), vẫn chuyển tiếp cho metrics
+    statements = []
+    database = app_module.database
+    metrics = database.on_query
+
+    def on_query(sql, seconds, error):
+        statements.append(sql)
+        metrics(sql, seconds, error)
+
+    database.on_query = on_query
+    yield statements
+    database.on_query = metrics
+
+
+def instructor_headers(app_module, user_id=1):
+    token, _ = app_module.token_signer.issue(user_id, f"user{user_id}", "instructor")
+    return {"Authorization": f"Bearer {token}"}
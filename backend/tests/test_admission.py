@@ -0,0 +1,97 @@
+import asyncio
+import re
+import time
+
+import httpx
+from fastapi import FastAPI
+
+from admission import AdmissionControl, ConcurrencyLimiter, TokenBucket
+from metrics import MetricsRegistry
+
+SERVICE_TIME = 0.2           # giây, thời gian xử lý của endpoint chậm
+MAX_CONCURRENCY = 4
+MAX_QUEUE = 8
+QUEUE_TIMEOUT = 1.0
+BURST = 60                   # số request gửi cùng lúc, gấp nhiều lần sức chứa
+FAST_REJECT_BOUND = SERVICE_TIME / 2   # 503 / 429 trả ngay, không chờ tới khi có slot
+
+
+def make_app(rate_limits=None):
+    app = FastAPI()
+    admission = AdmissionControl(
+        MetricsRegistry(),
+        routes=[(None, r"^/", "read")],
+        limits={"read": {"max_concurrency": MAX_CONCURRENCY, "max_queue": MAX_QUEUE, "queue_timeout": QUEUE_TIMEOUT}},
+        rate_rules=[("POST", r"^/login$", "login")] if rate_limits else (),
+        rate_limits=rate_limits,
+    )
+    app.middleware("http")(admission)
+    in_flight = {"now": 0, "max": 0}
+
+    @app.get("/slow")
+    async def slow():
+        in_flight["now"] += 1
+        in_flight["max"] = max(in_flight["max"], in_flight["now"])
+        await asyncio.sleep(SERVICE_TIME)
+        in_flight["now"] -= 1
+        return {"ok": True}
+
+    @app.post("/login")
+    async def login():
+        return {"ok": True}
+
+    return app, in_flight
+
+
+async def timed(client, method, path):
+    started = time.perf_counter()
+    response = await client.request(method, path)
+    return response, time.perf_counter() - started
+
+
+async def burst(app, method, path, count):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        return await asyncio.gather(*(timed(client, method, path) for _ in range(count)))
+
+
+def test_overload_is_rejected_fast_and_admitted_latency_is_bounded():
+    app, in_flight = make_app()
+    results = asyncio.run(burst(app, "GET", "/slow", BURST))
+
+    admitted = [elapsed for response, elapsed in results if response.status_code == 200]
+    rejected = [(response, elapsed) for response, elapsed in results if response.status_code == 503]
+    assert len(admitted) + len(rejected) == BURST
+    # Chỉ đúng số slot + chỗ trong hàng đợi được nhận, phần còn lại bị từ chối
+    assert len(admitted) == MAX_CONCURRENCY + MAX_QUEUE
+    assert in_flight["max"] == MAX_CONCURRENCY
+    assert all(response.headers["Retry-After"] == "1" for response, _ in rejected)
+    assert max(elapsed for _, elapsed in rejected) < FAST_REJECT_BOUND
+    # Request được nhận chờ tối đa (hàng đợi / đồng thời) lượt phục vụ: đuôi độ trễ có chặn trên
+    waves = 1 + MAX_QUEUE // MAX_CONCURRENCY
+    assert max(admitted) < waves * SERVICE_TIME + 0.1, f"p100 {max(admitted):.3f}s"
+
+
+def test_rate_limit_returns_429_without_waiting():
+    app, _ = make_app(rate_limits={"login": {"rate": 0.1, "burst": 3}})
+    results = asyncio.run(burst(app, "POST", "/login", 10))
+    statuses = sorted(response.status_code for response, _ in results)
+    assert statuses == [200] * 3 + [429] * 7
+    limited = [(response, elapsed) for response, elapsed in results if response.status_code == 429]
+    assert all(int(response.headers["Retry-After"]) >= 1 for response, _ in limited)
+    assert max(elapsed for _, elapsed in limited) < FAST_REJECT_BOUND
+
+
+def test_rejections_from_the_app_carry_cors_headers(client, app_module, monkeypatch):
+    # Trình duyệt chỉ đọc được status / Retry-After của 503 / 429 khi response có Access-Control-Allow-Origin
+    admission = app_module.admission
+    origin = app_module.origins[0]
+    monkeypatch.setitem(admission.limiters, "read", ConcurrencyLimiter(max_concurrency=0, max_queue=0, queue_timeout=1.0))
+    monkeypatch.setattr(admission, "rate_rules", [("POST", re.compile(r"^/login$"), "login")])
+    monkeypatch.setitem(admission.buckets, "login", TokenBucket(rate=0.1, burst=0))
+
+    overloaded = client.get("/courses", headers={"Origin": origin})
+    limited = client.post("/login", json={"username": "user3", "password": "x"}, headers={"Origin": origin})
+    assert (overloaded.status_code, limited.status_code) == (503, 429)
+    for response in (overloaded, limited):
+        assert response.headers["access-control-allow-origin"] == origin
+        assert "Retry-After" in response.headers
@@ -0,0 +1,78 @@
+import asyncio
+import time
+
+import crud
+import sqlite_backend
+from database import Database
+from db_pool import ConnectionPool
+
+# Câu SQL chậm thật (SQLite nhả GIL khi chạy), không phải time.sleep
+SLOW_SQL = """
+    WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n WHERE x < ?)
+    SELECT COUNT(*) FROM n
+"""
+SLOW_ROWS = 3_000_000
+FAST_QUERIES = 50
+FAST_LATENCY_BOUND = 0.2     # giây, cho mỗi truy vấn nhanh
+LOOP_LAG_BOUND = 0.1         # giây, độ trễ tối đa của event loop
+
+
+def slow_query(db, rows):
+    cursor = db.cursor()
+    cursor.execute(SLOW_SQL, rows)
+    return cursor.fetchone()[0]
+
+
+def seed_user(path):
+    cnxn = sqlite_backend.connect(path)
+    cnxn.execute("INSERT INTO Users (Username, Email, Password) VALUES ('fast', 'fast@example.com', 'x')")
+    cnxn.close()
+
+
+async def measure_loop_lag(stop, interval=0.01):
+    lag = 0.0
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lag = max(lag, time.perf_counter() - started - interval)
+    return lag
+
+
+async def run_slow_and_fast(database):
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(measure_loop_lag(stop))
+    slow_started = time.perf_counter()
+    slow_task = asyncio.create_task(database.run(slow_query, SLOW_ROWS))
+    await asyncio.sleep(0.05)  # câu chậm đã chiếm một luồng DB
+
+    async def fast():
+        started = time.perf_counter()
+        user = await database.run(crud.get_user_by_id, 1)
+        return time.perf_counter() - started, user
+
+    fast_results = []
+    for _ in range(FAST_QUERIES // 10):
+        fast_results += await asyncio.gather(*(fast() for _ in range(10)))
+    slow_pending_after_fast = not slow_task.done()
+
+    assert await slow_task == SLOW_ROWS
+    slow_seconds = time.perf_counter() - slow_started
+    stop.set()
+    return fast_results, slow_pending_after_fast, slow_seconds, await lag_task
+
+
+def test_slow_query_does_not_delay_other_queries(sqlite_path):
+    seed_user(sqlite_path)
+    database = Database(ConnectionPool(lambda: sqlite_backend.connect(sqlite_path), max_size=4), 4)
+    try:
+        fast_results, slow_pending, slow_seconds, loop_lag = asyncio.run(run_slow_and_fast(database))
+    finally:
+        database.close()
+
+    latencies = [latency for latency, _ in fast_results]
+    assert all(user is not None and user.username == "fast" for _, user in fast_results)
+    # Các truy vấn nhanh xong trong khi câu chậm vẫn đang chạy, mỗi câu không phải chờ câu chậm
+    assert slow_pending, f"câu chậm xong quá sớm ({slow_seconds:.2f}s), tăng SLOW_ROWS"
+    assert max(latencies) < FAST_LATENCY_BOUND, f"truy vấn nhanh chậm nhất {max(latencies):.3f}s"
+    assert max(latencies) < slow_seconds / 2
+    assert loop_lag < LOOP_LAG_BOUND, f"event loop bị chặn {loop_lag:.3f}s"
@@ -0,0 +1,65 @@
+from conftest import COURSES
+
+
+def test_compressed_body_reused_for_same_etag(client, app_module, executed_sql):
+    http_cache = app_module.http_cache
+    params = {"limit": COURSES}
+    first = client.get("/courses", params=params, headers={"Accept-Encoding": "gzip"})
+    assert first.headers["content-encoding"] == "gzip"
+    hits, compressed = http_cache.compressed_hits, http_cache.compressed
+
+    executed_sql.clear()
+    second = client.get("/courses", params=params, headers={"Accept-Encoding": "gzip"})
+    assert second.headers["etag"] == first.headers["etag"]
+    assert second.json() == first.json()
+    # Cùng phiên bản danh mục: bản nén lấy lại, không chạy handler và không nén lại
+    assert (http_cache.compressed_hits, http_cache.compressed) == (hits + 1, compressed)
+    assert executed_sql == []
+
+    identity = client.get("/courses", params=params, headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in identity.headers
+    assert identity.json() == first.json()
+
+
+def test_enroll_changes_catalog_etag(client):
+    before = client.get("/courses/featured").headers["etag"]
+    assert client.post("/enroll", json={"user_id": 6, "course_id": 7}).status_code == 201
+    after = client.get("/courses/featured")
+    assert after.headers["etag"] != before
+    assert client.get("/courses/featured", headers={"If-None-Match": before}).status_code == 200
+
+
+def test_cached_and_not_modified_responses_carry_cors_for_each_origin(client, app_module):
+    params = {"limit": COURSES}
+    headers = {"Accept-Encoding": "gzip"}
+    origins = list(app_module.origins)
+    first = client.get("/courses", params=params, headers={**headers, "Origin": origins[0]})
+    assert first.headers["access-control-allow-origin"] == origins[0]
+
+    # Bản nén lấy từ cache vẫn mang Origin của request hiện tại, không phải của request đầu tiên
+    hits = app_module.http_cache.compressed_hits
+    second = client.get("/courses", params=params, headers={**headers, "Origin": origins[1]})
+    assert app_module.http_cache.compressed_hits == hits + 1
+    assert second.headers["access-control-allow-origin"] == origins[1]
+    assert "origin" in second.headers["vary"].lower()
+    assert "access-control-allow-origin" not in client.get("/courses", params=params, headers=headers).headers
+
+    not_modified = client.get("/courses", params=params,
+                              headers={**headers, "Origin": origins[1], "If-None-Match": first.headers["etag"]})
+    assert not_modified.status_code == 304
+    assert not_modified.headers["access-control-allow-origin"] == origins[1]
+
+
+def test_cached_catalog_reports_current_enrollment_count(client):
+    params = {"limit": COURSES}
+    counts = {course["course_id"]: course["enrollment_count"] for course in client.get("/courses", params=params).json()["items"]}
+    detail = client.get("/courses/11").json()
+    page = client.get("/courses/11/page").json()
+    assert detail["enrollment_count"] == page["course"]["enrollment_count"] == counts[11]
+
+    assert client.post("/enroll", json={"user_id": 8, "course_id": 11}).status_code == 201
+    # Bản cache catalog vẫn dùng được, số lượt đăng ký lấy theo bảng xếp hạng lúc trả về
+    items = client.get("/courses", params=params).json()["items"]
+    assert {course["course_id"]: course["enrollment_count"] for course in items} == {**counts, 11: counts[11] + 1}
+    assert client.get("/courses/11").json()["enrollment_count"] == counts[11] + 1
+    assert client.get("/courses/11/page").json()["course"]["enrollment_count"] == counts[11] + 1
@@ -0,0 +1,46 @@
+from cache import MISSING
+from images import IMAGE_VARIANTS, VariantIndex, variant_filename
+from models import CourseOut
+
+
+def test_variant_index_scans_once_and_follows_pipeline(tmp_path):
+    (tmp_path / variant_filename("done", "card")).touch()
+    index = VariantIndex(tmp_path, rescan_interval=3600)
+
+    assert set(index.get("done")) == set(IMAGE_VARIANTS)
+    for _ in range(100):
+        assert index.get("pending") is None
+    assert index.scans == 1  # tra cứu không chạm hệ thống file cho từng dòng
+
+    index.add("pending")      # pipeline vừa tạo xong biến thể
+    assert index.get("pending")["card"].endswith(variant_filename("pending", "card"))
+    index.discard("done")     # ảnh của khoá học bị xoá
+    assert index.get("done") is None
+
+
+def test_variant_index_rescan_sees_other_workers(tmp_path):
+    index = VariantIndex(tmp_path, rescan_interval=0)
+    assert index.get("other") is None
+    (tmp_path / variant_filename("other", "card")).touch()
+    assert index.get("other") is not None
+
+
+def test_finished_variants_invalidate_only_courses_using_the_image(client, app_module):
+    cache = app_module.catalog_cache
+    image_url, other_url = "/uploads/images/ready.png", "/uploads/images/other.png"
+    entries = {
+        ("course", 1): CourseOut(course_id=1, title="A", image_url=image_url, price=0, instructor_id=1),
+        ("course", 2): CourseOut(course_id=2, title="B", image_url=other_url, price=0, instructor_id=1),
+        ("courses", "list", None, 20): {"items": [{"course_id": 1, "image_url": image_url}], "next_cursor": None},
+        ("courses", "featured"): [{"course_id": 2, "image_url": other_url}],
+        ("lectures", 1): [],
+    }
+    for key, value in entries.items():
+        cache.set(key, value)
+    version = app_module.catalog_version.version
+
+    app_module.image_pipeline.on_complete(image_url)
+    stale = {key for key in entries if cache.get(key) is MISSING}
+    assert stale == {("course", 1), ("courses", "list", None, 20)}
+    # ETag của client không đổi vì một ảnh xong biến thể
+    assert app_module.catalog_version.version == version
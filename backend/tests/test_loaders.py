@@ -0,0 +1,77 @@
+from fastapi import Depends
+
+from conftest import COURSES, LECTURES_PER_COURSE, instructor_headers
+from loaders import RequestLoaders
+
+
+def record_loaders(app_module):
+    # Thay dependency bằng bản ghi lại RequestLoaders của từng request để đọc query_count
+    created = []
+
+    def loaders_for(db):
+        loaders = RequestLoaders(db)
+        created.append(loaders)
+        return loaders
+
+    app_module.app.dependency_overrides[app_module.get_loaders] = lambda db=Depends(app_module.get_db): loaders_for(db)
+    app_module.app.dependency_overrides[app_module.get_read_loaders] = lambda db=Depends(app_module.get_read_db): loaders_for(db)
+    return created
+
+
+def test_course_list_query_count_does_not_grow_with_page_size(client, executed_sql):
+    small = client.get("/courses", params={"limit": 2})
+    small_queries = len(executed_sql)
+    executed_sql.clear()
+    large = client.get("/courses", params={"limit": COURSES})
+    assert small.status_code == large.status_code == 200
+    assert len(large.json()["items"]) == COURSES
+    assert len(executed_sql) == small_queries == 1
+
+    executed_sql.clear()
+    assert client.get("/courses", params={"limit": COURSES}).json() == large.json()
+    assert executed_sql == []  # lần hai lấy từ cache catalog
+
+
+def test_course_page_query_count_is_fixed(client, executed_sql):
+    page = client.get("/courses/4/page", params={"user_id": 3}).json()
+    assert len(page["lectures"]) == LECTURES_PER_COURSE
+    assert page["is_enrolled"]
+    assert len(executed_sql) == 2  # khoá học kèm bài giảng, đăng ký của người xem
+
+    # Khoá học / bài giảng đã trong cache: chỉ còn truy vấn trạng thái đăng ký của người xem
+    executed_sql.clear()
+    page = client.get("/courses/4/page", params={"user_id": 5}).json()
+    assert not page["is_enrolled"]
+    assert len(executed_sql) == 1
+
+
+def test_enrolled_courses_loads_user_in_one_batch(client, app_module, executed_sql):
+    created = record_loaders(app_module)
+    body = client.get("/users/3/enrolled_courses", params={"limit": COURSES}).json()
+    assert len(body["items"]) == COURSES
+    assert [loaders.query_count for loaders in created] == [1]
+    assert len(executed_sql) == 2  # user + trang khoá học, không phụ thuộc số khoá học
+
+    assert client.get("/users/999/enrolled_courses").status_code == 404
+    assert created[-1].query_count == 1
+
+
+def test_bulk_enroll_loads_all_courses_in_one_batch(client, app_module):
+    created = record_loaders(app_module)
+    items = [{"user_id": user_id, "course_id": course_id} for user_id in (4, 5) for course_id in range(1, 11)]
+    response = client.post("/enroll/bulk", json={"items": items}, headers=instructor_headers(app_module, 1))
+    assert response.status_code == 200
+    statuses = {(r["course_id"], r["status"]) for r in response.json()["results"]}
+    # Giảng viên 1 sở hữu các khoá học số chẵn
+    assert statuses == {(c, "enrolled" if c % 2 == 0 else "forbidden") for c in range(1, 11)}
+    assert created[-1].query_count == 1
+
+
+def test_bulk_enroll_with_every_item_forbidden_skips_the_insert(client, app_module, executed_sql):
+    items = [{"user_id": 4, "course_id": course_id} for course_id in (1, 3, 5)]
+    response = client.post("/enroll/bulk", json={"items": items}, headers=instructor_headers(app_module, 1))
+    assert response.status_code == 200
+    assert response.json()["enrolled"] == 0
+    assert {r["status"] for r in response.json()["results"]} == {"forbidden"}
+    # Không có cặp nào hợp lệ: không gửi executemany rỗng (pyodbc báo lỗi với SQL Server)
+    assert not any("BulkEnroll" in sql for sql in executed_sql)
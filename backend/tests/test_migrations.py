@@ -0,0 +1,44 @@
+import json
+
+import pytest
+
+import db_errors
+import migrations
+import sqlite_backend
+from benchmarks import check_plans
+
+
+def test_version_applied_by_another_worker_is_skipped(sqlite_path, monkeypatch):
+    cnxn = sqlite_backend.connect(sqlite_path)
+    # Đọc danh sách phiên bản trước khi worker khác ghi xong: mọi INSERT phiên bản đều trùng khoá
+    monkeypatch.setattr(migrations, "applied_versions", lambda db: set())
+    assert migrations.migrate(cnxn, "sqlite") == []
+    cnxn.close()
+
+
+def test_integrity_error_inside_migration_is_raised(sqlite_path, monkeypatch):
+    cnxn = sqlite_backend.connect(sqlite_path)
+    broken = migrations.Migration(99, "duplicate_rows", [
+        "INSERT INTO Users (Username, Email, Password) VALUES ('dup', 'dup@example.com', 'x')",
+        "INSERT INTO Users (Username, Email, Password) VALUES ('dup', 'dup@example.com', 'x')",
+    ])
+    monkeypatch.setattr(migrations, "MIGRATIONS", migrations.MIGRATIONS + [broken])
+    with pytest.raises(db_errors.IntegrityError):
+        migrations.migrate(cnxn, "sqlite")
+    assert 99 not in migrations.applied_versions(cnxn)
+    assert cnxn.execute("SELECT COUNT(*) FROM Users WHERE Username = 'dup'").fetchone()[0] == 0
+    cnxn.close()
+
+
+def test_every_query_uses_an_index():
+    report, violations = check_plans.collect()
+    assert report["statements"] > 0
+    assert violations == [], json.dumps(violations, indent=2, ensure_ascii=False)
+
+
+def test_price_filter_without_index_is_reported(monkeypatch):
+    # Bỏ IX_Courses_Price: list_courses lọc theo giá quay lại quét CourseID theo thứ tự -> bị báo lỗi
+    monkeypatch.setattr(migrations, "MIGRATIONS", [m for m in migrations.MIGRATIONS if m.name != "course_price_index"])
+    report, violations = check_plans.collect()
+    assert {plan["function"] for plan in report["full_scans"]} == {"list_courses"}
+    assert all("Price" in plan["filters"] for plan in report["full_scans"])
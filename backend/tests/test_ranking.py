@@ -0,0 +1,21 @@
+import time
+
+from ranking import PopularityRanking
+
+
+def test_enrollments_recorded_while_rebuilding_are_kept():
+    ranking = PopularityRanking(top_size=3)
+    ranking.begin_rebuild()
+    prepared = ranking.prepare([(1, 5), (2, 3)], [])   # ảnh chụp DB đọc trước các thay đổi dưới đây
+    ranking.record(2, time.time())                     # đăng ký nhận trong lúc đọc DB
+    ranking.record(3)
+    ranking.remove(1)                                  # khoá học vừa xoá
+    ranking.load(prepared)
+    assert (ranking.count(1), ranking.count(2), ranking.count(3)) == (0, 4, 1)
+    assert ranking.top("popular", 3) == [2, 3]
+    assert set(ranking.trending) == {2, 3}
+
+    # Lần load sau không áp lại các thay đổi cũ
+    ranking.begin_rebuild()
+    ranking.load(ranking.prepare([(2, 4)], []))
+    assert (ranking.count(2), ranking.count(3)) == (4, 0)
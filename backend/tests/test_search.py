@@ -0,0 +1,80 @@
+import threading
+from collections import namedtuple
+
+import models
+from search import CourseSearchIndex
+
+Row = namedtuple("Row", "CourseID Title ShortDescription FullDescription")
+
+ROWS = [
+    Row(1, "Python cơ bản", "Lập trình Python", None),
+    Row(2, "Pandas nâng cao", "Phân tích dữ liệu", None),
+    Row(3, "Java Spring", "Backend", None),
+]
+
+
+def ids(results):
+    return [course_id for course_id, _ in results]
+
+
+def test_prefix_vocabulary_stays_sorted_on_add_and_remove():
+    index = CourseSearchIndex()
+    index.rebuild(ROWS)
+    index.add(4, "Pytorch thực hành")
+    index.add(5, "Kotlin")
+    index.remove(3)
+    assert index._sorted_terms == sorted(index._postings)
+    assert set(ids(index.search("py"))) == {1, 4}
+    assert ids(index.search("spring")) == []
+
+
+def test_rebuild_keeps_local_changes_made_while_reading_db():
+    index = CourseSearchIndex()
+    index.rebuild(ROWS)
+    index.begin_rebuild()
+    rows = list(ROWS)                  # ảnh chụp DB đọc trước khi có thay đổi dưới đây
+    index.add(4, "Rust hệ thống")      # khoá học vừa tạo trên worker này
+    index.remove(2)                    # khoá học vừa xoá
+    index.rebuild(rows)
+    assert ids(index.search("rust")) == [4]
+    assert ids(index.search("pandas")) == []
+    # Rebuild sau đó chỉ theo DB
+    index.rebuild(ROWS[:1])
+    assert ids(index.search("rust")) == []
+    assert len(index) == 1
+
+
+def test_search_is_served_from_old_index_while_rebuilding(monkeypatch):
+    index = CourseSearchIndex()
+    index.rebuild(ROWS)
+    insert = CourseSearchIndex._insert_locked
+    probed = []
+
+    def insert_and_probe(self, *args, **kwargs):
+        if not probed:
+            # Truy vấn từ thread khác trong lúc đang dựng: không phải chờ rebuild xong
+            result = []
+            searcher = threading.Thread(target=lambda: result.append(ids(index.search("pandas"))))
+            searcher.start()
+            searcher.join(timeout=1.0)
+            probed.append(result)
+        return insert(self, *args, **kwargs)
+
+    monkeypatch.setattr(CourseSearchIndex, "_insert_locked", insert_and_probe)
+    index.rebuild(ROWS[:1])
+    assert probed == [[[2]]]
+    assert ids(index.search("pandas")) == []
+
+
+def test_search_endpoint_serializes_rows_without_pydantic(client, app_module, monkeypatch):
+    def from_row(row):
+        raise AssertionError("CourseOut.from_row trên đường tìm kiếm")
+
+    monkeypatch.setattr(models.CourseOut, "from_row", staticmethod(from_row))
+    expected = [course_id for course_id, _ in app_module.search_index.search("khoá học 1", limit=5)]
+    assert expected
+    response = client.get("/courses/search", params={"q": "khoá học 1", "limit": 5})
+    assert response.status_code == 200
+    results = response.json()
+    assert [course["course_id"] for course in results] == expected
+    assert all(course["full_description"] is None and "enrollment_count" in course for course in results)
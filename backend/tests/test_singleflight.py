@@ -0,0 +1,102 @@
+import asyncio
+
+import httpx
+
+from admission import Overloaded
+from cache import TTLCache
+from singleflight import SingleFlight
+
+VIEWERS = 20
+
+
+class CountingLoader:
+    def __init__(self, value="v", delay=0.05, error=None):
+        self.value = value
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+def test_concurrent_loads_of_one_key_run_once():
+    async def scenario():
+        flights = SingleFlight()
+        loader, other = CountingLoader("a"), CountingLoader("b")
+        results = await asyncio.gather(*(flights.do("a", loader) for _ in range(50)), flights.do("b", other))
+        assert results == ["a"] * 50 + ["b"]
+        assert (loader.calls, other.calls) == (1, 1)
+        assert flights.stats()["coalesced"] == 49
+        # Không giữ kết quả sau khi xong: lần sau tải lại
+        assert await flights.do("a", loader) == "a" and loader.calls == 2
+        assert len(flights) == 0
+
+    asyncio.run(scenario())
+
+
+def test_error_reaches_every_waiter_and_leader_cancel_does_not():
+    async def scenario():
+        flights = SingleFlight()
+        failing = CountingLoader(error=RuntimeError("db down"))
+        results = await asyncio.gather(*(flights.do("k", failing) for _ in range(10)), return_exceptions=True)
+        assert failing.calls == 1
+        assert all(isinstance(result, RuntimeError) for result in results)
+
+        loader = CountingLoader("ok")
+        leader = asyncio.ensure_future(flights.do("k", loader))
+        await asyncio.sleep(0)
+        followers = [asyncio.ensure_future(flights.do("k", loader)) for _ in range(5)]
+        await asyncio.sleep(0)
+        leader.cancel()   # client của request dẫn đầu ngắt kết nối
+        assert await asyncio.gather(*followers) == ["ok"] * 5
+        assert loader.calls == 1
+
+    asyncio.run(scenario())
+
+
+def test_too_many_waiters_is_overloaded():
+    async def scenario():
+        flights = SingleFlight(max_waiters=3)
+        loader = CountingLoader()
+        results = await asyncio.gather(*(flights.do("k", loader) for _ in range(5)), return_exceptions=True)
+        assert results[:3] == ["v"] * 3
+        assert all(isinstance(result, Overloaded) for result in results[3:])
+
+    asyncio.run(scenario())
+
+
+def test_cache_miss_storm_loads_once_and_invalidate_starts_new_load():
+    async def scenario():
+        cache = TTLCache(flights=SingleFlight())
+        loader = CountingLoader("old", delay=0.05)
+        storm = [asyncio.ensure_future(cache.get_or_load("k", loader)) for _ in range(20)]
+        await asyncio.sleep(0.01)
+        cache.invalidate("k")   # dữ liệu đổi trong lúc đang tải
+        fresh = CountingLoader("new")
+        assert await cache.get_or_load("k", fresh) == "new"
+        assert await asyncio.gather(*storm) == ["old"] * 20
+        assert (loader.calls, fresh.calls) == (1, 1)
+        # Kết quả tải trước lần invalidate không ghi đè bản mới
+        assert await cache.get_or_load("k", CountingLoader("again")) == "new"
+
+    asyncio.run(scenario())
+
+
+def test_course_page_cold_cache_loads_course_once(client, app_module, executed_sql):
+    async def scenario():
+        transport = httpx.ASGITransport(app=app_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            return await asyncio.gather(*(
+                http.get("/courses/9/page", params={"user_id": user_id}) for user_id in range(3, 3 + VIEWERS)))
+
+    responses = asyncio.run(scenario())
+    assert {response.status_code for response in responses} == {200}
+    assert [response.json()["is_enrolled"] for response in responses] == [True] + [False] * (VIEWERS - 1)
+    page_queries = [sql for sql in executed_sql if "JOIN Lectures" in sql]
+    assert len(page_queries) == 1
+    assert len(executed_sql) == 1 + VIEWERS  # khoá học kèm bài giảng một lần, đăng ký theo từng người xem
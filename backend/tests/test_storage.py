@@ -0,0 +1,45 @@
+import asyncio
+
+import pytest
+
+import crud
+import sqlite_backend
+from database import Database
+from db_pool import ConnectionPool
+from storage import BlobStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    upload_folder = tmp_path / "uploads"
+    (upload_folder / "images").mkdir(parents=True)
+    return BlobStore(upload_folder, upload_folder / "partial", 1024)
+
+
+def test_path_for_rejects_traversal(store):
+    assert store.path_for("/uploads/images/a.png") == (store.upload_folder / "images" / "a.png").resolve()
+    for url in ("/uploads/../main.py", "/uploads/images/../../secret"):
+        with pytest.raises(ValueError):
+            store.path_for(url)
+
+
+def test_file_removed_only_with_last_reference(store, sqlite_path):
+    database = Database(ConnectionPool(lambda: sqlite_backend.connect(sqlite_path), max_size=2), 2)
+    url = store.url_for("images", "a" * 64, "png")
+    path = store.path_for(url)
+
+    async def scenario():
+        path.write_bytes(b"png")
+        await database.run(crud.acquire_media_blob, "a" * 64, url, 3)
+        assert await store.acquire(database, url)               # khoá học thứ hai dùng lại URL
+        assert not await store.acquire(database, "/uploads/images/unknown.png")
+        assert not await store.acquire(database, "/uploads/../storage.py")
+        assert not await store.release(database, url)
+        assert path.exists()
+        assert await store.release(database, url)
+        assert not path.exists()
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        database.close()
@@ -0,0 +1,237 @@
+import asyncio
+import json
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+import aiofiles
+from fastapi import HTTPException
+
+from logs import get_logger
+
+# Chữ ký đầu file (magic bytes) của các định dạng video được chấp nhận -> phần mở rộng khi lưu.
+# Phần mở rộng lấy theo nội dung, không theo tên file client gửi: file đa định dạng (polyglot) tên
+# .html / .svg không được phục vụ như nội dung chủ động từ /uploads.
+VIDEO_SIGNATURES = (
+    (((4, b"ftypqt"),), "mov"),
+    (((4, b"ftyp"),), "mp4"),  # mp4 / m4v
+    (((0, b"\x1a\x45\xdf\xa3"),), "webm"),  # webm / mkv (EBML)
+    (((0, b"OggS"),), "ogv"),
+    (((0, b"RIFF"), (8, b"AVI ")), "avi"),
+)
+IMAGE_SIGNATURES = (
+    (((0, b"\xff\xd8\xff"),), "jpg"),
+    (((0, b"\x89PNG\r\n\x1a\n"),), "png"),
+    (((0, b"GIF8"),), "gif"),
+    (((0, b"RIFF"), (8, b"WEBP")), "webp"),
+)
+SNIFF_BYTES = 12
+
+log = get_logger("uploads")
+
+
+def sniff_extension(head: bytes, signatures=VIDEO_SIGNATURES):
+    # Phần mở rộng theo chữ ký đầu file, None nếu không phải định dạng được chấp nhận
+    for parts, extension in signatures:
+        if all(head[offset:offset + len(sig)] == sig for offset, sig in parts):
+            return extension
+    return None
+
+
+def looks_like_video(head: bytes) -> bool:
+    return sniff_extension(head) is not None
+
+
+@contextmanager
+def exclusive_lock(path: Path):
+    # Khoá của hệ điều hành (giữa các process worker), không chờ: đang bị giữ -> 409
+    try:
+        f = open(path, "r+b")
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    try:
+        try:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            raise HTTPException(status_code=409, detail="Another request is writing to this upload session.")
+        try:
+            yield
+        finally:
+            if fcntl is None:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+    finally:
+        f.close()
+
+
+async def save_upload_file(upload, destination: Path, buffer_size: int, max_size: int = None, hasher=None):
+    # Ghi UploadFile ra đĩa theo khối lớn thay vì 1024 byte mỗi lần; băm nội dung song song nếu cần
+    loop = asyncio.get_running_loop()
+    written = 0
+    async with aiofiles.open(destination, "wb") as f:
+        while content := await upload.read(buffer_size):
+            written += len(content)
+            if max_size is not None and written > max_size:
+                raise HTTPException(status_code=413, detail="Uploaded file is too large.")
+            if hasher is not None:
+                # hashlib nhả GIL với khối lớn -> băm trên thread, không chặn event loop
+                await asyncio.gather(f.write(content), loop.run_in_executor(None, hasher.update, content))
+            else:
+                await f.write(content)
+    return written
+
+
+class UploadSessionStore:
+    """Upload nhiều phần, có thể tiếp tục (kiểu tus).
+
+    Mỗi phiên gồm `<id>.part` (dữ liệu) và `<id>.json` (metadata) trong thư mục tạm;
+    offset hiện tại chính là kích thước file `.part`, nên nhiều worker dùng chung được.
+    Ghi / huỷ / hoàn tất giữ khoá file trên `.json` nên hai PATCH cùng phiên (kể cả ở hai worker)
+    không ghi chồng lên nhau. Mỗi phiên thuộc về người tạo (`owner_id`).
+    """
+
+    def __init__(self, folder: Path, max_size: int, buffer_size: int, expire_after: float):
+        self.folder = Path(folder)
+        self.folder.mkdir(parents=True, exist_ok=True)
+        self.max_size = max_size
+        self.buffer_size = buffer_size
+        self.expire_after = expire_after
+
+    def _paths(self, upload_id: str):
+        try:
+            uuid.UUID(upload_id)
+        except ValueError:
+            raise HTTPException(status_code=404, detail="Upload session not found")
+        return self.folder / f"{upload_id}.part", self.folder / f"{upload_id}.json"
+
+    def create(self, filename: str, size: int, content_type: str, owner_id: int):
+        if not content_type or not content_type.startswith("video/"):
+            raise HTTPException(status_code=400, detail="Uploaded file is not a video.")
+        if size <= 0 or size > self.max_size:
+            raise HTTPException(status_code=413, detail=f"Upload size must be between 1 and {self.max_size} bytes.")
+        upload_id = str(uuid.uuid4())
+        part_path, meta_path = self._paths(upload_id)
+        meta = {
+            "upload_id": upload_id,
+            "filename": filename,
+            "owner_id": owner_id,
+            "size": size,
+            "content_type": content_type,
+            "created_at": time.time(),
+        }
+        part_path.touch()
+        meta_path.write_text(json.dumps(meta))
+        return self.status(upload_id, owner_id)
+
+    def status(self, upload_id: str, owner_id: int):
+        part_path, meta_path = self._paths(upload_id)
+        try:
+            meta = json.loads(meta_path.read_text())
+            offset = part_path.stat().st_size
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail="Upload session not found")
+        if meta.get("owner_id") != owner_id:
+            raise HTTPException(status_code=403, detail="You are not authorized to use this upload session.")
+        meta["offset"] = offset
+        meta["complete"] = offset == meta["size"]
+        return meta
+
+    async def append(self, upload_id: str, offset: int, stream, owner_id: int):
+        part_path, meta_path = self._paths(upload_id)
+        self.status(upload_id, owner_id)
+        with exclusive_lock(meta_path):
+            meta = self.status(upload_id, owner_id)
+            if offset != meta["offset"]:
+                raise HTTPException(status_code=409, detail=f"Upload offset mismatch: expected {meta['offset']}.")
+            position = offset
+            buffer = bytearray()
+            sniffed = offset > 0
+            async with aiofiles.open(part_path, "r+b") as f:
+                await f.seek(offset)
+                try:
+                    async for chunk in stream:
+                        if position + len(buffer) + len(chunk) > meta["size"]:
+                            raise HTTPException(status_code=413, detail="Chunk exceeds declared upload size.")
+                        buffer += chunk
+                        if not sniffed and len(buffer) >= SNIFF_BYTES:
+                            if not looks_like_video(buffer):
+                                raise HTTPException(status_code=415, detail="Uploaded content is not a supported video format.")
+                            sniffed = True
+                        if len(buffer) >= self.buffer_size:
+                            await f.write(buffer)
+                            position += len(buffer)
+                            buffer.clear()
+                except HTTPException:
+                    raise
+                except Exception:
+                    # Mất kết nối giữa chừng: giữ phần đã nhận để client tiếp tục từ offset mới
+                    await f.write(buffer)
+                    raise
+                await f.write(buffer)
+            os.utime(meta_path)  # gia hạn phiên đang hoạt động
+            return self.status(upload_id, owner_id)
+
+    def finalize(self, upload_id: str, destination_folder: Path, owner_id: int):
+        part_path, meta_path = self._paths(upload_id)
+        self.status(upload_id, owner_id)
+        with exclusive_lock(meta_path):
+            meta = self.status(upload_id, owner_id)
+            if not meta["complete"]:
+                raise HTTPException(status_code=409, detail=f"Upload incomplete: {meta['offset']}/{meta['size']} bytes.")
+            with open(part_path, "rb") as f:
+                extension = sniff_extension(f.read(SNIFF_BYTES))
+            if extension is None:
+                raise HTTPException(status_code=415, detail="Uploaded content is not a supported video format.")
+            destination = Path(destination_folder) / f"{uuid.uuid4()}.{extension}"
+            os.replace(part_path, destination)
+        meta_path.unlink(missing_ok=True)
+        return destination
+
+    def delete(self, upload_id: str, owner_id: int):
+        part_path, meta_path = self._paths(upload_id)
+        self.status(upload_id, owner_id)
+        with exclusive_lock(meta_path):
+            part_path.unlink(missing_ok=True)
+        meta_path.unlink(missing_ok=True)
+
+    def cleanup_expired(self):
+        # Xoá các phiên bị bỏ dở: metadata không được cập nhật trong `expire_after` giây
+        cutoff = time.time() - self.expire_after
+        removed = 0
+        for meta_path in self.folder.glob("*.json"):
+            try:
+                if meta_path.stat().st_mtime < cutoff:
+                    meta_path.with_suffix(".part").unlink(missing_ok=True)
+                    meta_path.unlink(missing_ok=True)
+                    removed += 1
+            except FileNotFoundError:
+                continue
+        for part_path in self.folder.glob("*.part"):
+            try:
+                if not part_path.with_suffix(".json").exists() and part_path.stat().st_mtime < cutoff:
+                    part_path.unlink(missing_ok=True)
+                    removed += 1
+            except FileNotFoundError:
+                continue
+        return removed
+
+    async def cleanup_loop(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                removed = await asyncio.get_running_loop().run_in_executor(None, self.cleanup_expired)
+                if removed:
+                    log.info("upload_sessions_expired", removed=removed)
+            except Exception as e:
+                log.error("upload_session_cleanup_failed", error=str(e))
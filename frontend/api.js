@@ -2,10 +2,22 @@
 
 export const API_BASE_URL = 'http://127.0.0.1:8000';
 
+// Token phiên nhận từ /login, gửi kèm mọi request qua header Authorization
+let authToken = null;
+
+export function setAuthToken(token) {
+    authToken = token || null;
+}
+
+function authHeaders() {
+    return authToken ? { 'Authorization': `Bearer ${authToken}` } : {};
+}
+
 // Hàm cũ để xử lý JSON (giữ nguyên, không cần sửa đổi)
 async function callApi(endpoint, method = 'GET', body = null) {
     const headers = {
         'Content-Type': 'application/json',
+        ...authHeaders(),
     };
 
     const config = {
@@ -38,6 +50,7 @@ async function callApiFormData(endpoint, method = 'POST', formData = null) {
     const config = {
         method: method,
         body: formData,
+        headers: authHeaders(),
         // Khi gửi FormData, KHÔNG set Content-Type header. Trình duyệt sẽ tự động đặt
         // Content-Type: multipart/form-data với boundary phù hợp.
     };
@@ -95,6 +108,38 @@ async function callApiFormData(endpoint, method = 'POST', formData = null) {
 }
 
 
+// File upload (/uploads/images|videos/...) được phục vụ qua /media để hỗ trợ Range và cache dài hạn
+export function mediaUrl(path) {
+    if (path && path.startsWith('/uploads/')) {
+        return API_BASE_URL + path.replace(/^\/uploads\//, '/media/');
+    }
+    return path;
+}
+
+// Tạo query string từ object, bỏ qua các giá trị null/undefined/rỗng
+function buildQuery(params = {}) {
+    const query = new URLSearchParams();
+    Object.entries(params).forEach(([key, value]) => {
+        if (value !== null && value !== undefined && value !== '') {
+            query.append(key, value);
+        }
+    });
+    const queryString = query.toString();
+    return queryString ? `?${queryString}` : '';
+}
+
+// Duyệt hết các trang (keyset pagination) của một endpoint trả về { items, next_cursor }
+async function fetchAllPages(endpoint, params = {}) {
+    const items = [];
+    let cursor = null;
+    do {
+        const page = await callApi(`${endpoint}${buildQuery({ ...params, cursor, limit: 100 })}`);
+        items.push(...page.items);
+        cursor = page.next_cursor;
+    } while (cursor !== null && cursor !== undefined);
+    return items;
+}
+
 // --- Auth APIs ---
 export async function registerUser(username, email, password) {
     return callApi('/register', 'POST', { username, email, password });
@@ -105,24 +150,36 @@ export async function loginUser(email, password) {
 }
 
 // --- Course APIs ---
-export async function getAllCourses() {
-    return callApi('/courses');
+// Trả về một trang { items, next_cursor }; truyền next_cursor vào options.cursor để lấy trang tiếp
+// options: { cursor, limit, fields: 'summary' | 'full', is_free, min_price, max_price, instructor_id }
+export async function getAllCourses(options = {}) {
+    return callApi(`/courses${buildQuery({ fields: 'summary', ...options })}`);
+}
+
+export async function searchCourses(query, limit = 20) {
+    return callApi(`/courses/search${buildQuery({ q: query, limit })}`);
 }
 
-export async function getFeaturedCourses() {
-    return callApi('/courses/featured');
+// by: 'popular' (nhiều học viên nhất) hoặc 'trending' (đăng ký nhiều gần đây)
+export async function getFeaturedCourses(by = 'popular', limit = 12) {
+    return callApi(`/courses/featured?by=${by}&limit=${limit}`);
 }
 
 export async function getCourseDetails(courseId) {
     return callApi(`/courses/${courseId}`);
 }
 
+// Trang chi tiết: khoá học + bài giảng + trạng thái đăng ký của người dùng trong một request
+export async function getCoursePage(courseId, userId = null) {
+    return callApi(`/courses/${courseId}/page${buildQuery({ user_id: userId })}`);
+}
+
 export async function createCourse(formData) {
     return callApiFormData('/courses', 'POST', formData);
 }
 
-export async function deleteCourse(courseId, userId) {
-    return callApi(`/courses/${courseId}?user_id=${userId}`, 'DELETE');
+export async function deleteCourse(courseId) {
+    return callApi(`/courses/${courseId}`, 'DELETE');
 }
 
 // --- Lecture APIs ---
@@ -131,13 +188,75 @@ export async function getLecturesForCourse(courseId) {
 }
 
 export async function addLectureToCourse(courseId, formData) {
-    // instructor_id đã được thêm vào formData ở frontend
-    // main.py đã được sửa để nhận instructor_id từ Form data
+    // Giảng viên được xác định từ token (header Authorization), không gửi instructor_id
     return callApiFormData(`/courses/${courseId}/lectures`, 'POST', formData);
 }
 
-export async function deleteLecture(lectureId, instructorId) {
-    return callApi(`/lectures/${lectureId}?instructor_id=${instructorId}`, 'DELETE');
+// Upload video theo từng phần (có thể tiếp tục): tạo phiên, PATCH từng khối tại offset, rồi tạo bài giảng
+const UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024;
+const UPLOAD_MAX_RETRIES = 5;
+
+export async function uploadLectureVideo(courseId, file, title, description, onProgress = null) {
+    const session = await callApi('/upload-sessions', 'POST', {
+        filename: file.name,
+        size: file.size,
+        content_type: file.type || 'video/mp4',
+    });
+    const uploadUrl = `${API_BASE_URL}/upload-sessions/${session.upload_id}`;
+    let offset = session.offset;
+    let retries = 0;
+
+    while (offset < file.size) {
+        const chunk = file.slice(offset, offset + UPLOAD_CHUNK_SIZE);
+        try {
+            const response = await fetch(uploadUrl, {
+                method: 'PATCH',
+                headers: {
+                    'Content-Type': 'application/offset+octet-stream',
+                    'Upload-Offset': String(offset),
+                    ...authHeaders(),
+                },
+                body: chunk,
+            });
+            const data = await response.json();
+            if (!response.ok && response.status !== 409) {
+                const error = new Error(data.detail || 'Upload failed');
+                error.status = response.status;
+                throw error;
+            }
+            // 409: offset lệch (ví dụ sau khi mất kết nối) -> hỏi lại server offset hiện tại
+            offset = response.ok ? data.offset : (await callApi(`/upload-sessions/${session.upload_id}`)).offset;
+            retries = 0;
+        } catch (error) {
+            if (error.status || ++retries > UPLOAD_MAX_RETRIES) {
+                throw error;
+            }
+            await new Promise(resolve => setTimeout(resolve, 1000 * retries));
+            offset = (await callApi(`/upload-sessions/${session.upload_id}`)).offset;
+        }
+        if (onProgress) {
+            onProgress(offset, file.size);
+        }
+    }
+
+    return callApi(`/upload-sessions/${session.upload_id}/lecture`, 'POST', {
+        course_id: Number(courseId),
+        title,
+        description,
+    });
+}
+
+export async function deleteLecture(lectureId) {
+    return callApi(`/lectures/${lectureId}`, 'DELETE');
+}
+
+// --- Lecture Progress APIs ---
+export async function saveLectureProgress(lectureId, positionSeconds, completed = false) {
+    return callApi(`/lectures/${lectureId}/progress`, 'POST', { position_seconds: positionSeconds, completed });
+}
+
+export async function getCourseProgress(userId, courseId) {
+    return callApi(`/users/${userId}/courses/${courseId}/progress`);
 }
 
 // --- Enrollment APIs ---
@@ -146,11 +265,11 @@ export async function enrollCourse(userId, courseId) {
 }
 
 export async function getUserEnrolledCourses(userId) {
-    return callApi(`/users/${userId}/enrolled_courses`);
+    return fetchAllPages(`/users/${userId}/enrolled_courses`, { fields: 'summary' });
 }
 
 export async function getUserCreatedCourses(userId) {
-    return callApi(`/users/${userId}/created_courses`);
+    return fetchAllPages(`/users/${userId}/created_courses`, { fields: 'summary' });
 }
 
 export async function upgradeUserToInstructor(userId) {
@@ -76,6 +76,29 @@ document.addEventListener('DOMContentLoaded', () => {
 
     // --- Data (Backend-driven now) ---
     let currentUser = null; // Sẽ được lưu từ localStorage
+    // Heartbeat tiến độ học: video nằm trong iframe nên ước lượng vị trí bằng thời gian xem bài giảng hiện tại
+    const PROGRESS_HEARTBEAT_MS = 15000;
+    let progressTimer = null;
+    let watchedSeconds = 0;
+
+    function stopProgressHeartbeat() {
+        clearInterval(progressTimer);
+        progressTimer = null;
+    }
+
+    function startProgressHeartbeat(lectureId) {
+        stopProgressHeartbeat();
+        watchedSeconds = 0;
+        progressTimer = setInterval(() => {
+            if (learningPage.classList.contains('hidden')) {
+                stopProgressHeartbeat();
+                return;
+            }
+            if (document.hidden) return;
+            watchedSeconds += PROGRESS_HEARTBEAT_MS / 1000;
+            api.saveLectureProgress(lectureId, watchedSeconds).catch(error => console.warn('Progress not saved:', error));
+        }, PROGRESS_HEARTBEAT_MS);
+    }
 
     // --- Helper Functions ---
 
@@ -113,9 +136,11 @@ document.addEventListener('DOMContentLoaded', () => {
         window.scrollTo({ top: 0, behavior: 'smooth' });
     }
 
-    async function renderCourseCards(targetElement, courseArray, showEditButton = false) {
-        targetElement.innerHTML = '';
-        if (!courseArray || courseArray.length === 0) {
+    async function renderCourseCards(targetElement, courseArray, showEditButton = false, append = false) {
+        if (!append) {
+            targetElement.innerHTML = '';
+        }
+        if ((!courseArray || courseArray.length === 0) && !append) {
             targetElement.innerHTML = '<p class="no-content">Chưa có khóa học nào tại đây.</p>';
             return;
         }
@@ -124,7 +149,8 @@ document.addEventListener('DOMContentLoaded', () => {
             courseCard.classList.add('course-card');
             const priceDisplay = course.is_free ? 'Miễn phí' : `${course.price.toLocaleString('vi-VN')} VNĐ`;
 
-            let imageUrl = course.image_url;
+            // Ưu tiên ảnh thu nhỏ (WebP) do backend tạo sẵn, nếu chưa có thì dùng ảnh gốc
+            let imageUrl = course.image_variants ? course.image_variants.card_webp : course.image_url;
             if (imageUrl && imageUrl.startsWith('/uploads/')) {
                 imageUrl = api.API_BASE_URL + imageUrl;
             }
@@ -138,6 +164,7 @@ document.addEventListener('DOMContentLoaded', () => {
                 <div class="course-card-content">
                     <h3>${course.title}</h3>
                     <p class="instructor">Giảng viên: ${course.instructor_name || 'Đang cập nhật'}</p>
+                    ${course.enrollment_count ? `<p class="enrollment-count"><i class="fas fa-user-graduate"></i> ${course.enrollment_count.toLocaleString('vi-VN')} học viên</p>` : ''}
                     <p class="short-description">${course.short_description}</p>
                     <p class="price">${priceDisplay}</p>
                     ${showEditButton ?
@@ -152,7 +179,8 @@ document.addEventListener('DOMContentLoaded', () => {
             targetElement.appendChild(courseCard);
         });
 
-        targetElement.querySelectorAll('.view-details-btn').forEach(button => {
+        targetElement.querySelectorAll('.view-details-btn:not([data-bound])').forEach(button => {
+            button.dataset.bound = 'true';
             button.addEventListener('click', (e) => {
                 const courseId = e.target.dataset.courseId;
                 displayCourseDetail(courseId);
@@ -174,12 +202,38 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
 
+    // --- Trang "Tất cả khóa học": tải theo trang (keyset), nút "Xem thêm" lấy trang kế tiếp ---
+    async function loadAllCoursesPage(cursor = null) {
+        const page = await api.getAllCourses({ cursor });
+        const existingLoadMore = document.getElementById('load-more-courses-btn');
+        if (existingLoadMore) {
+            existingLoadMore.remove();
+        }
+        renderCourseCards(allCoursesGrid, page.items, false, cursor !== null);
+
+        if (page.next_cursor !== null && page.next_cursor !== undefined) {
+            const loadMoreBtn = document.createElement('button');
+            loadMoreBtn.id = 'load-more-courses-btn';
+            loadMoreBtn.classList.add('btn', 'btn-secondary');
+            loadMoreBtn.textContent = 'Xem thêm';
+            loadMoreBtn.addEventListener('click', async () => {
+                loadMoreBtn.disabled = true;
+                try {
+                    await loadAllCoursesPage(page.next_cursor);
+                } catch (error) {
+                    console.error('Error fetching more courses:', error);
+                    loadMoreBtn.disabled = false;
+                }
+            });
+            allCoursesGrid.insertAdjacentElement('afterend', loadMoreBtn);
+        }
+    }
+
     async function displayCourseDetail(courseId) {
         try {
-            const course = await api.getCourseDetails(courseId);
-            const lectures = await api.getLecturesForCourse(courseId);
+            const { course, lectures, is_enrolled: isEnrolled } = await api.getCoursePage(courseId, currentUser ? currentUser.user_id : null);
 
-            let courseDetailImgUrl = course.image_url;
+            let courseDetailImgUrl = course.image_variants ? course.image_variants.hero_webp : course.image_url;
             if (courseDetailImgUrl && courseDetailImgUrl.startsWith('/uploads/')) {
                 courseDetailImgUrl = api.API_BASE_URL + courseDetailImgUrl;
             }
@@ -209,7 +263,7 @@ document.addEventListener('DOMContentLoaded', () => {
 
                     const li = document.createElement('li');
                     li.innerHTML = `Bài ${lecture.lecture_order}: ${lecture.title} <span>${lectureType}</span>`;
-                    if (currentUser && userEnrolledCourses.some(c => c.course_id == course.course_id)) {
+                    if (isEnrolled) {
                         li.classList.add('clickable');
                         li.addEventListener('click', () => displayLearningPage(course.course_id, index));
                     }
@@ -221,8 +275,6 @@ document.addEventListener('DOMContentLoaded', () => {
             instructorName.textContent = course.instructor_name;
             instructorBio.textContent = course.instructor_bio || 'Thông tin giảng viên đang được cập nhật.';
 
-            const isEnrolled = currentUser && userEnrolledCourses.some(c => c.course_id == course.course_id);
-
             if (isEnrolled) {
                 enrollCourseBtn.textContent = 'Tiếp tục học';
                 enrollCourseBtn.classList.remove('btn-primary');
@@ -279,10 +331,9 @@ document.addEventListener('DOMContentLoaded', () => {
         }
 
         try {
-            const course = await api.getCourseDetails(courseId);
-            const lectures = await api.getLecturesForCourse(courseId);
+            const { course, lectures, is_enrolled: isEnrolled } = await api.getCoursePage(courseId, currentUser ? currentUser.user_id : null);
 
-            if (!userEnrolledCourses.some(c => c.course_id == courseId)) {
+            if (!isEnrolled) {
                 alert('Bạn chưa đăng ký khóa học này!');
                 displayCourseDetail(courseId);
                 return;
@@ -296,19 +347,30 @@ document.addEventListener('DOMContentLoaded', () => {
 
             learningCourseTitle.textContent = course.title;
             let currentLectureIdx = lectureIndex;
+            const progress = await api.getCourseProgress(currentUser.user_id, courseId).catch(() => null);
+            const completedLectureIds = new Set(
+                (progress ? progress.lectures : []).filter(item => item.completed).map(item => item.lecture_id)
+            );
+
+            function markCurrentLectureCompleted() {
+                const lecture = lectures[currentLectureIdx];
+                if (completedLectureIds.has(lecture.lecture_id)) return;
+                completedLectureIds.add(lecture.lecture_id);
+                api.saveLectureProgress(lecture.lecture_id, watchedSeconds, true).catch(error => console.warn('Progress not saved:', error));
+            }
 
             function renderLectures() {
                 learningLectureList.innerHTML = '';
                 lectures.forEach((lecture, index) => {
                     const li = document.createElement('li');
-                    li.textContent = `Bài ${lecture.lecture_order}: ${lecture.title}`;
+                    li.textContent = `${completedLectureIds.has(lecture.lecture_id) ? '✓ ' : ''}Bài ${lecture.lecture_order}: ${lecture.title}`;
                     if (index === currentLectureIdx) {
                         li.classList.add('active');
                         
                         let videoSrc = lecture.video_url;
                         if (videoSrc) {
                             if (videoSrc.startsWith('/uploads/')) {
-                                videoSrc = api.API_BASE_URL + videoSrc;
+                                videoSrc = api.mediaUrl(videoSrc);
                             } 
                             else if (videoSrc.includes('youtube.com/watch?v=')) {
                                 videoSrc = videoSrc.replace('watch?v=', 'embed/');
@@ -318,6 +380,7 @@ document.addEventListener('DOMContentLoaded', () => {
                         }
                         
                         videoPlayer.src = videoSrc;
+                        startProgressHeartbeat(lecture.lecture_id);
                         currentLectureTitle.textContent = `Bài ${lecture.lecture_order}: ${lecture.title}`;
                     }
                     li.addEventListener('click', () => {
@@ -340,6 +403,7 @@ document.addEventListener('DOMContentLoaded', () => {
 
             nextLectureBtn.onclick = () => {
                 if (currentLectureIdx < lectures.length - 1) {
+                    markCurrentLectureCompleted();
                     currentLectureIdx++;
                     renderLectures();
                 }
@@ -383,7 +447,6 @@ document.addEventListener('DOMContentLoaded', () => {
         formData.append('title', document.getElementById('course-title').value);
         formData.append('short_description', document.getElementById('course-short-desc').value);
         formData.append('full_description', document.getElementById('course-full-desc').value);
-        formData.append('instructor_id', currentUser.user_id);
         formData.append('price', isFree ? 0 : priceValue);
         formData.append('instructor_bio', 'Thông tin giảng viên đang được cập nhật.');
 
@@ -473,7 +536,7 @@ document.addEventListener('DOMContentLoaded', () => {
                         const lectureId = e.target.dataset.lectureId;
                         if (confirm('Bạn có chắc chắn muốn xóa bài giảng này?')) {
                             try {
-                                await api.deleteLecture(lectureId, currentUser.user_id);
+                                await api.deleteLecture(lectureId);
                                 alert('Bài giảng đã được xóa.');
                                 refreshLectureList(courseId); // Chỉ làm mới danh sách
                             } catch (error) {
@@ -538,7 +601,6 @@ document.addEventListener('DOMContentLoaded', () => {
         const formData = new FormData();
         formData.append('title', document.getElementById('lecture-title').value);
         formData.append('description', document.getElementById('lecture-description').value);
-        formData.append('instructor_id', currentUser.user_id);
 
         if (lectureVideoFileInput.files.length > 0) {
             formData.append('video_file', lectureVideoFileInput.files[0]);
@@ -547,7 +609,20 @@ document.addEventListener('DOMContentLoaded', () => {
         }
 
         try {
-            await api.addLectureToCourse(courseId, formData);
+            if (lectureVideoFileInput.files.length > 0) {
+                const videoFile = lectureVideoFileInput.files[0];
+                await api.uploadLectureVideo(
+                    courseId,
+                    videoFile,
+                    formData.get('title'),
+                    formData.get('description'),
+                    (uploaded, total) => {
+                        lectureVideoFileNameSpan.textContent = `Đang tải lên ${videoFile.name}: ${Math.floor(uploaded * 100 / total)}%`;
+                    }
+                );
+            } else {
+                await api.addLectureToCourse(courseId, formData);
+            }
             alert('Bài giảng đã được thêm thành công!');
             // CHỈ CẦN GỌI HÀM NÀY ĐỂ CẬP NHẬT GIAO DIỆN MÀ KHÔNG CHUYỂN TRANG
             await refreshLectureList(courseId); 
@@ -585,7 +660,7 @@ document.addEventListener('DOMContentLoaded', () => {
         }
 
         try {
-            await api.deleteCourse(courseId, currentUser.user_id);
+            await api.deleteCourse(courseId);
             alert('Khóa học đã được xóa thành công!');
             await renderMyCreatedCourses();
         } catch (error) {
@@ -599,6 +674,7 @@ document.addEventListener('DOMContentLoaded', () => {
     async function login(user) {
         console.log("Logged in user:", user);
         currentUser = user;
+        api.setAuthToken(user.access_token);
         localStorage.setItem('currentUser', JSON.stringify(currentUser));
         await updateUIForLoggedInUser();
         showPage('dashboard');
@@ -608,6 +684,7 @@ document.addEventListener('DOMContentLoaded', () => {
     async function logout() {
         console.log("Logging out user:", currentUser ? currentUser.username : "N/A");
         currentUser = null;
+        api.setAuthToken(null);
         localStorage.removeItem('currentUser');
         userEnrolledCourses = [];
         await updateUIForLoggedInUser();
@@ -708,7 +785,9 @@ document.addEventListener('DOMContentLoaded', () => {
                     const updatedUser = await api.upgradeUserToInstructor(currentUser.user_id);
                     alert('Chúc mừng! Tài khoản của bạn đã được nâng cấp lên giảng viên thành công.');
                     
+                    // Token cũ bị thu hồi khi đổi role: dùng token mới trả về
                     currentUser = updatedUser;
+                    api.setAuthToken(updatedUser.access_token);
                     localStorage.setItem('currentUser', JSON.stringify(currentUser));
                     
                     await updateUIForLoggedInUser();
@@ -811,8 +890,7 @@ document.addEventListener('DOMContentLoaded', () => {
                 showPage(targetPage);
             } else if (targetPage === 'browse-courses') {
                 try {
-                    const allCourses = await api.getAllCourses();
-                    renderCourseCards(allCoursesGrid, allCourses);
+                    await loadAllCoursesPage();
                     showPage(targetPage);
                 } catch (error) {
                     console.error('Error fetching all courses:', error);
@@ -858,8 +936,13 @@ document.addEventListener('DOMContentLoaded', () => {
     // --- Initial Load ---
     async function init() {
         const savedUser = localStorage.getItem('currentUser');
-        if (savedUser) {
-            currentUser = JSON.parse(savedUser);
+        const parsedUser = savedUser ? JSON.parse(savedUser) : null;
+        // Phiên cũ (chưa có token) hoặc token đã hết hạn: yêu cầu đăng nhập lại
+        if (parsedUser && (!parsedUser.access_token || parsedUser.expires_at * 1000 <= Date.now())) {
+            localStorage.removeItem('currentUser');
+        } else if (parsedUser) {
+            currentUser = parsedUser;
+            api.setAuthToken(currentUser.access_token);
             await updateUIForLoggedInUser();
         } else {
             document.querySelector('[data-target="create-course-page"]').style.display = 'none';